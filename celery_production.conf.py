@@ -55,6 +55,10 @@ app.conf.update(
             'task': 'fitness_management.tasks.optimize_database',
             'schedule': 604800.0,  # 7 days
         },
+        'export-analytics-weekly': {
+            'task': 'fitness_management.tasks.export_test_results_parquet',
+            'schedule': 604800.0,  # 7 days
+        },
     },
     
     # Task routing
@@ -1,7 +1,8 @@
 from django.contrib import admin
 from .models import (
     AcademicYear, Region, Department, Institute, Student, 
-    Test, StudentTest, News, Event, Video, TrainingUnit, ExternalLink
+    Test, StudentTest, News, Event, Video, TrainingUnit, ExternalLink, ArchivedNews, ArchivedEvent,
+    Notification, NotificationDelivery
 )
 
 @admin.register(AcademicYear)
@@ -30,7 +31,7 @@ class InstituteAdmin(admin.ModelAdmin):
 @admin.register(Student)
 class StudentAdmin(admin.ModelAdmin):
     list_display = ['name', 'national_id', 'gender', 'education_level', 'grade', 'institute', 'academic_year']
-    list_filter = ['gender', 'education_level', 'academic_year', 'institute__department__region']
+    list_filter = ['gender', 'education_level', 'academic_year', 'region']
     search_fields = ['name', 'national_id']
     readonly_fields = ['created_at', 'updated_at']
 
@@ -74,4 +75,37 @@ class TrainingUnitAdmin(admin.ModelAdmin):
 @admin.register(ExternalLink)
 class ExternalLinkAdmin(admin.ModelAdmin):
     list_display = ['title', 'url', 'created_at']
-    search_fields = ['title', 'description'] 
\ No newline at end of file
+    search_fields = ['title', 'description']
+
+@admin.register(ArchivedNews)
+class ArchivedNewsAdmin(admin.ModelAdmin):
+    list_display = ['title', 'created_at', 'archived_at']
+    search_fields = ['title', 'content']
+    readonly_fields = ['original_id', 'archived_at']
+
+@admin.register(ArchivedEvent)
+class ArchivedEventAdmin(admin.ModelAdmin):
+    list_display = ['title', 'start_date', 'end_date', 'location', 'archived_at']
+    search_fields = ['title', 'location']
+    readonly_fields = ['original_id', 'archived_at'] 
+
+class NotificationDeliveryInline(admin.TabularInline):
+    model = NotificationDelivery
+    extra = 0
+    fields = ['recipient', 'name', 'status', 'attempts', 'error', 'sent_at']
+    readonly_fields = fields
+    can_delete = False
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'created_by', 'created_at']
+    search_fields = ['subject']
+    readonly_fields = ['created_at']
+    inlines = [NotificationDeliveryInline]
+
+@admin.register(NotificationDelivery)
+class NotificationDeliveryAdmin(admin.ModelAdmin):
+    list_display = ['recipient', 'notification', 'status', 'attempts', 'sent_at']
+    list_filter = ['status']
+    search_fields = ['recipient', 'name']
+    list_select_related = ['notification']
\ No newline at end of file
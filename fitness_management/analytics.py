@@ -0,0 +1,338 @@
+"""
+Columnar (Parquet) export of test results for analytics.
+
+Test results joined with their student, test, institute and region are written
+as a Hive-partitioned Parquet dataset (``academic_year_id=<id>/region_id=<id>``)
+in record batches. Low-cardinality text columns are dictionary encoded and
+scores keep their exact decimal type. A watermark file in the dataset root
+stores the last exported result ID and the last ``ChangeLog`` ID. Later runs
+append new results and rewrite the files holding results that were edited or
+deleted since, or whose student, test, institute, department, region or
+academic year was edited (their names are exported with every result).
+
+``ChangeLog`` rows are purged after each full backup, so when the changes
+since the last export are no longer all there the run rebuilds the dataset
+in full instead.
+
+pyarrow is an optional dependency; ``ParquetUnavailable`` is raised when it is
+not installed.
+"""
+
+import json
+import os
+import shutil
+import uuid
+from django.conf import settings
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+from .models import AcademicYear, ChangeLog, Department, Institute, Region, Student, StudentTest, Test
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pc = pq = None
+
+ANALYTICS_BATCH_SIZE = 50000
+WATERMARK_FILE = '_watermark.json'
+PARTITION_COLUMNS = ('academic_year_id', 'region_id')
+
+# (اسم العمود، الحقل في الاستعلام، نوع العمود)
+RESULT_COLUMNS = (
+    ('id', 'id', 'int64'),
+    ('student_id', 'student_id', 'int64'),
+    ('national_id', 'student__national_id', 'string'),
+    ('gender', 'student__gender', 'category'),
+    ('education_level', 'student__education_level', 'category'),
+    ('grade', 'student__grade', 'category'),
+    ('test_id', 'test_id', 'int64'),
+    ('test', 'test__name', 'category'),
+    ('max_score', 'test__max_score', 'int32'),
+    ('score', 'score', 'decimal'),
+    ('test_date', 'test_date', 'date'),
+    ('institute_id', 'student__institute_id', 'int64'),
+    ('institute', 'student__institute__name', 'category'),
+    ('department_id', 'department_id', 'int64'),
+    ('department', 'department__name', 'category'),
+    ('region', 'region__name', 'category'),
+    ('academic_year', 'student__academic_year__name', 'category'),
+    ('academic_year_id', 'student__academic_year_id', 'int64'),
+    ('region_id', 'region_id', 'int64'),
+)
+
+# النماذج التي يغير حفظها أعمدة النتائج المصدرة (النموذج، الحقل الذي يربطها بالنتيجة)
+DEPENDENT_MODELS = (
+    (StudentTest, 'id'),
+    (Student, 'student_id'),
+    (Test, 'test_id'),
+    (Institute, 'student__institute_id'),
+    (Department, 'department_id'),
+    (Region, 'region_id'),
+    (AcademicYear, 'student__academic_year_id'),
+)
+
+
+class ParquetUnavailable(Exception):
+    """مكتبة pyarrow غير مثبتة"""
+
+
+def default_output_dir():
+    return getattr(settings, 'ANALYTICS_EXPORT_DIR', None) or os.path.join(settings.BACKUP_DIR, 'analytics')
+
+
+def _arrow_type(kind):
+    if kind == 'category':
+        return pa.dictionary(pa.int32(), pa.string())
+    if kind == 'decimal':
+        field = StudentTest._meta.get_field('score')
+        return pa.decimal128(field.max_digits, field.decimal_places)
+    if kind == 'date':
+        return pa.date32()
+    return getattr(pa, kind)()
+
+
+def result_schema():
+    """مخطط الملفات دون أعمدة التقسيم التي تُحفظ في أسماء المجلدات"""
+    return pa.schema([
+        (name, _arrow_type(kind)) for name, _, kind in RESULT_COLUMNS if name not in PARTITION_COLUMNS
+    ])
+
+
+def read_watermark(output_dir):
+    path = os.path.join(output_dir, WATERMARK_FILE)
+    if not os.path.exists(path):
+        return {'last_id': 0}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def changes_available(since):
+    """
+    سجل التغييرات يحتوي كل ما بعد العلامة since
+
+    الحذف بعد النسخة الكاملة يزيل أقدم الصفوف فقط، فإذا بدأ السجل بعد العلامة
+    (أو كان فارغاً) فقد تكون تغييرات بعدها حُذفت.
+    """
+    if since is None:
+        return False
+    oldest = ChangeLog.objects.aggregate(oldest=Min('id'))['oldest']
+    return oldest is not None and oldest <= since + 1
+
+
+def write_watermark(output_dir, watermark):
+    path = os.path.join(output_dir, WATERMARK_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(watermark, f, ensure_ascii=False, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+class ParquetExporter:
+    """
+    كتابة نتائج الاختبارات على دفعات في ملف لكل قسم (عام دراسي، منطقة)
+
+    كل تشغيل يضيف ملفات جديدة باسم فريد، وتُحذف ملفات التشغيل إذا فشل قبل
+    تحديث العلامة حتى لا تتكرر الصفوف عند إعادة المحاولة. الملفات التي تحتوي
+    نتائج تغيرت تُكتب صفوفها الباقية في ملفات التشغيل ولا تُحذف إلا بعد نجاحه.
+    التصدير الكامل يُكتب في مجلد مؤقت بجوار المجموعة ولا يحل محلها إلا بعد نجاحه.
+    """
+
+    def __init__(self, output_dir=None, batch_size=ANALYTICS_BATCH_SIZE):
+        if pa is None:
+            raise ParquetUnavailable('pyarrow is required for Parquet exports (pip install pyarrow)')
+        self.output_dir = output_dir or default_output_dir()
+        self.batch_size = batch_size
+        self.schema = result_schema()
+        self.run_id = f'{timezone.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}'
+        self._writers = {}
+        self._target_dir = self.output_dir
+
+    def queryset(self, last_id=0):
+        return StudentTest.objects.filter(id__gt=last_id).order_by('id')
+
+    def changed_queryset(self, since, until, last_id):
+        """النتائج المصدرة سابقاً التي تغيرت هي أو ما يُصدَّر معها بين علامتي سجل التغييرات"""
+        changes = ChangeLog.objects.filter(id__gt=since, id__lte=until, action='save')
+        changed = Q()
+        for model, lookup in DEPENDENT_MODELS:
+            changed |= Q(**{f'{lookup}__in': changes.filter(model=model._meta.label_lower).values('object_id')})
+        return StudentTest.objects.filter(changed, id__lte=last_id).order_by('id')
+
+    def deleted_ids(self, since, until, last_id):
+        return set(ChangeLog.objects.filter(
+            id__gt=since, id__lte=until, action='delete', model=StudentTest._meta.label_lower, object_id__lte=last_id,
+        ).values_list('object_id', flat=True))
+
+    def run(self, full=False, progress=None):
+        """تصدير النتائج الجديدة والمعدلة وإرجاع (عدد الصفوف، آخر معرف)"""
+        watermark = read_watermark(self.output_dir)
+        if not full and watermark.get('last_id') and not changes_available(watermark.get('changelog_id')):
+            full = True
+        if full:
+            self._target_dir = self.output_dir + '.part'
+            shutil.rmtree(self._target_dir, ignore_errors=True)
+            watermark = {'last_id': 0}
+        os.makedirs(self._target_dir, exist_ok=True)
+        last_id = watermark.get('last_id', 0)
+        # العلامة تُقرأ قبل الصفوف، فالتغيير الذي يحدث أثناء التصدير يُعاد في التشغيل التالي
+        changelog_id = ChangeLog.objects.aggregate(last=Max('id'))['last'] or 0
+
+        exported = 0
+        replaced = []
+        try:
+            exported, new_last_id = self._export(self.queryset(last_id), progress)
+            if last_id:
+                # الصفوف المعدلة تُكتب أولاً ثم تُحذف نسخها القديمة بمعرفات ما كُتب فعلاً
+                since = watermark['changelog_id']
+                rewritten = set()
+                changed, _ = self._export(self.changed_queryset(since, changelog_id, last_id), progress, exported, rewritten)
+                exported += changed
+                replaced = self._rewrite_files(rewritten | self.deleted_ids(since, changelog_id, last_id))
+            last_id = max(last_id, new_last_id)
+            self._close()
+        except BaseException:
+            self._abort()
+            if full:
+                shutil.rmtree(self._target_dir, ignore_errors=True)
+                self._target_dir = self.output_dir
+            raise
+
+        for path in replaced:
+            os.remove(path)
+        write_watermark(self._target_dir, {
+            'last_id': last_id,
+            'changelog_id': changelog_id,
+            'exported_at': timezone.now().isoformat(),
+            'last_run': self.run_id,
+            'last_run_rows': exported,
+            'last_run_replaced_files': len(replaced),
+        })
+        if full:
+            self._swap()
+        if progress:
+            progress(exported)
+        return exported, last_id
+
+    def _export(self, queryset, progress=None, done=0, written_ids=None):
+        """كتابة صفوف الاستعلام على دفعات وإرجاع (عدد الصفوف، أكبر معرف)"""
+        lookups = [lookup for _, lookup, _ in RESULT_COLUMNS]
+        exported = last_id = 0
+        batch = []
+        for row in queryset.values_list(*lookups).iterator(chunk_size=self.batch_size):
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                exported, last_id = self._flush(batch, exported, written_ids)
+                batch = []
+                if progress:
+                    progress(done + exported)
+        if batch:
+            exported, last_id = self._flush(batch, exported, written_ids)
+        return exported, last_id
+
+    def _flush(self, batch, exported, written_ids):
+        self._write_batch(batch)
+        if written_ids is not None:
+            written_ids.update(row[0] for row in batch)
+        return exported + len(batch), batch[-1][0]
+
+    def _rewrite_files(self, result_ids):
+        """
+        نسخ الصفوف الباقية من الملفات التي تحتوي النتائج result_ids إلى ملفات التشغيل
+
+        تُقرأ أعمدة المعرفات فقط لمعرفة الملفات المتأثرة، وتُرجع مسارات الملفات
+        القديمة لحذفها بعد نجاح التشغيل.
+        """
+        if not result_ids:
+            return []
+        value_set = pa.array(sorted(result_ids), type=pa.int64())
+        replaced = []
+        for directory, _, filenames in os.walk(self._target_dir):
+            for filename in sorted(filenames):
+                if not filename.endswith('.parquet') or self.run_id in filename:
+                    continue
+                path = os.path.join(directory, filename)
+                parquet_file = pq.ParquetFile(path)
+                if not pc.any(pc.is_in(parquet_file.read(columns=['id']).column('id'), value_set=value_set)).as_py():
+                    continue
+                table = parquet_file.read()
+                kept = table.filter(pc.invert(pc.is_in(table.column('id'), value_set=value_set)))
+                if kept.num_rows:
+                    self._writer(self._partition_of(directory)).write_table(kept)
+                replaced.append(path)
+        return replaced
+
+    def _write_batch(self, batch):
+        """تقسيم الدفعة حسب القسم وكتابة كل جزء كدفعة أعمدة"""
+        names = [name for name, _, _ in RESULT_COLUMNS]
+        year_index = names.index('academic_year_id')
+        region_index = names.index('region_id')
+        partitions = {}
+        for row in batch:
+            partitions.setdefault((row[year_index], row[region_index]), []).append(row)
+
+        gender_labels = dict(Student.GENDER_CHOICES)
+        level_labels = dict(Student.EDUCATION_LEVELS)
+        for partition, partition_rows in partitions.items():
+            arrays = []
+            for index, (name, _, kind) in enumerate(RESULT_COLUMNS):
+                if name in PARTITION_COLUMNS:
+                    continue
+                values = [row[index] for row in partition_rows]
+                if name == 'gender':
+                    values = [gender_labels.get(value, value) for value in values]
+                elif name == 'education_level':
+                    values = [level_labels.get(value, value) for value in values]
+                if kind == 'category':
+                    arrays.append(pa.array(values, type=pa.string()).dictionary_encode())
+                else:
+                    arrays.append(pa.array(values, type=_arrow_type(kind)))
+            self._writer(partition).write_batch(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+
+    def _swap(self):
+        """استبدال المجموعة بالتصدير الكامل المكتمل"""
+        previous_dir = self.output_dir + '.old'
+        shutil.rmtree(previous_dir, ignore_errors=True)
+        if os.path.isdir(self.output_dir):
+            os.replace(self.output_dir, previous_dir)
+        os.replace(self._target_dir, self.output_dir)
+        shutil.rmtree(previous_dir, ignore_errors=True)
+        self._target_dir = self.output_dir
+
+    def _partition_dir(self, partition):
+        year_id, region_id = partition
+        return os.path.join(
+            self._target_dir,
+            f'academic_year_id={year_id}',
+            f'region_id={region_id if region_id is not None else "__HIVE_DEFAULT_PARTITION__"}',
+        )
+
+    def _partition_of(self, directory):
+        """(العام الدراسي، المنطقة) من أسماء مجلدي القسم"""
+        values = [name.split('=', 1)[1] for name in os.path.relpath(directory, self._target_dir).split(os.sep)]
+        return tuple(None if value == '__HIVE_DEFAULT_PARTITION__' else int(value) for value in values)
+
+    def _writer(self, partition):
+        writer = self._writers.get(partition)
+        if writer is None:
+            directory = self._partition_dir(partition)
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f'part-{self.run_id}.parquet')
+            writer = pq.ParquetWriter(path, self.schema, compression='zstd')
+            self._writers[partition] = writer
+        return writer
+
+    def _close(self):
+        for writer in self._writers.values():
+            writer.close()
+
+    def _abort(self):
+        """إغلاق وحذف ملفات هذا التشغيل"""
+        for partition, writer in self._writers.items():
+            try:
+                writer.close()
+            except Exception:
+                pass
+            path = os.path.join(self._partition_dir(partition), f'part-{self.run_id}.parquet')
+            if os.path.exists(path):
+                os.remove(path)
+        self._writers = {}
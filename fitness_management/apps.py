@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class FitnessManagementConfig(AppConfig):
+    name = 'fitness_management'
+    verbose_name = 'إدارة اللياقة البدنية'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,41 @@
+"""
+Arabic text normalization helpers.
+"""
+
+import re
+from django.db import connection
+from django.db.models import Q
+
+# التشكيل والتطويل وعلامات القرآن
+_DIACRITICS_RE = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+_LETTER_MAP = str.maketrans({
+    '\u0623': '\u0627',  # أ
+    '\u0625': '\u0627',  # إ
+    '\u0622': '\u0627',  # آ
+    '\u0671': '\u0627',  # ٱ
+    '\u0629': '\u0647',  # ة
+    '\u0649': '\u064a',  # ى
+})
+
+
+def normalize_arabic(text):
+    """توحيد أشكال الحروف وحذف التشكيل لاستخدامها في البحث والترتيب"""
+    if not text:
+        return ''
+    text = _DIACRITICS_RE.sub('', text)
+    text = text.translate(_LETTER_MAP)
+    return _WHITESPACE_RE.sub(' ', text).strip().casefold()
+
+
+def prefix_q(field, prefix):
+    """
+    شرط البحث عن بداية النص بحيث يستخدم الفهرس
+
+    في SQLite يكون LIKE غير حساس لحالة الأحرف فلا يستخدم الفهرس، لذلك يتم
+    التعبير عن البداية كنطاق مغلق من الأسفل ومفتوح من الأعلى.
+    """
+    if connection.vendor == 'sqlite':
+        return Q(**{f'{field}__gte': prefix, f'{field}__lt': prefix + '\uffff'})
+    return Q(**{f'{field}__startswith': prefix})
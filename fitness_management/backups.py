@@ -0,0 +1,518 @@
+"""
+Streaming database backups.
+
+Each backup is a directory ``backup_<timestamp>`` under ``BACKUP_DIR`` holding
+one compressed file per model and a ``manifest.json`` with the row count, size
+and SHA-256 checksum of every file. Rows are serialized one model at a time
+with ``queryset.iterator()`` straight into a gzip (or zstd, when the optional
+``zstandard`` package is installed) stream, so no uncompressed copy of the
+database is ever written and memory stays constant.
+
+The per-model files use Django's ``jsonl`` serializer; gzip files can still be
+loaded with ``manage.py loaddata`` if needed.
+
+On PostgreSQL, when ``pg_dump`` is available, the whole database is dumped in
+custom format and piped through the same compressor instead. Row counts for
+the manifest are read in the exported snapshot that ``pg_dump`` uses, so they
+match the dump exactly.
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+import django
+from django.apps import apps
+from django.conf import settings
+from django.core import serializers
+from django.db import connection, transaction
+from django.db.models import Max, Q
+from django.db.migrations.recorder import MigrationRecorder
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import ChangeLog
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+BACKUP_PREFIX = 'backup_'
+MANIFEST_FILE = 'manifest.json'
+MANIFEST_VERSION = 2
+DELETIONS_FILE = 'deletions.jsonl'
+# يُنشأ بعد الاستعادة حتى تكون النسخة التالية كاملة
+RESTORE_MARKER = '.restored'
+BACKUP_CHUNK_SIZE = 2000
+PIPE_BUFFER_SIZE = 1024 * 1024
+
+# نفس الاستثناءات التي كانت تمرر لأمر dumpdata مع سجل التغييرات
+BACKUP_EXCLUDE = ('contenttypes', 'auth.permission', 'fitness_management.changelog')
+
+# نماذج لا تدخل في النسخ التزايدية: الجلسات والبيانات المحسوبة وسجلات الإرسال
+UNTRACKED_MODELS = (
+    'fitness_management.statisticsrollup',
+    'fitness_management.notification',
+    'fitness_management.notificationdelivery',
+    'sessions.session',
+)
+
+COMPRESSION_EXTENSIONS = {
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+
+class BackupError(Exception):
+    """فشل إنشاء أو قراءة النسخة الاحتياطية"""
+
+
+def backup_root():
+    return getattr(settings, 'BACKUP_DIR', None) or os.path.join(settings.BASE_DIR, 'backups')
+
+
+def default_compression():
+    """ضغط zstd إذا كان مطلوباً ومتاحاً وإلا gzip"""
+    compression = getattr(settings, 'BACKUP_COMPRESSION', 'gzip')
+    if compression == 'zstd' and zstandard is None:
+        return 'gzip'
+    return compression
+
+
+def model_label(model):
+    return model._meta.label_lower
+
+
+def backup_models(exclude=BACKUP_EXCLUDE):
+    """النماذج المشمولة بالنسخة الاحتياطية مرتبة بحيث تسبق الجداول المرجعية ما يعتمد عليها"""
+    models = [
+        model for model in apps.get_models()
+        if model._meta.app_label not in exclude
+        and model_label(model) not in exclude
+        and not model._meta.proxy
+        and model._meta.managed
+    ]
+    return models_in_dependency_order(models)
+
+
+def models_in_dependency_order(models):
+    """ترتيب النماذج حسب العلاقات الخارجية مع تجاهل الحلقات"""
+    included = set(models)
+    ordered = []
+    visiting = set()
+
+    def visit(model):
+        if model in ordered or model in visiting:
+            return
+        visiting.add(model)
+        for field in model._meta.get_fields():
+            related = getattr(field, 'related_model', None)
+            if related is None or related is model or related not in included:
+                continue
+            if field.concrete and (field.many_to_one or field.one_to_one or field.many_to_many):
+                visit(related)
+        visiting.discard(model)
+        ordered.append(model)
+
+    for model in sorted(models, key=model_label):
+        visit(model)
+    return ordered
+
+
+class ChecksumWriter:
+    """ملف ثنائي يحسب البصمة والحجم لما يُكتب فيه"""
+
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+        self.sha256 = hashlib.sha256()
+        self.bytes = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.bytes += len(data)
+        return self.file.write(data)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    @property
+    def hexdigest(self):
+        return self.sha256.hexdigest()
+
+
+def compressor(sink, compression):
+    """تدفق ثنائي يضغط ما يُكتب فيه إلى sink"""
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=sink, mode='wb', compresslevel=6)
+    if compression == 'zstd':
+        if zstandard is None:
+            raise BackupError('zstandard is required for zstd compression (pip install zstandard)')
+        return zstandard.ZstdCompressor(level=3).stream_writer(sink, closefd=False)
+    raise BackupError(f'Unsupported compression: {compression}')
+
+
+def decompressor(fileobj, compression):
+    """تدفق ثنائي يقرأ البيانات بعد فك ضغطها"""
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=fileobj, mode='rb')
+    if compression == 'zstd':
+        if zstandard is None:
+            raise BackupError('zstandard is required for zstd compression (pip install zstandard)')
+        return zstandard.ZstdDecompressor().stream_reader(fileobj, closefd=False)
+    raise BackupError(f'Unsupported compression: {compression}')
+
+
+def file_checksum(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(PIPE_BUFFER_SIZE), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def read_manifest(backup_path):
+    with open(os.path.join(backup_path, MANIFEST_FILE), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def applied_migrations(using=None):
+    """آخر ترحيل مطبق لكل تطبيق لمعرفة توافق النسخة عند الاستعادة"""
+    latest = {}
+    for app_label, name in MigrationRecorder(using or connection).applied_migrations():
+        if name > latest.get(app_label, ''):
+            latest[app_label] = name
+    return latest
+
+
+def _counted(iterable, counter):
+    for item in iterable:
+        counter['rows'] += 1
+        yield item
+
+
+def change_tracked_models():
+    """النماذج التي تُسجل تغييراتها في ChangeLog"""
+    return [model for model in backup_models() if model_label(model) not in UNTRACKED_MODELS]
+
+
+def list_backups(root=None):
+    """النسخ المكتملة مرتبة من الأقدم للأحدث كقائمة (المسار، البيان)"""
+    root = root or backup_root()
+    if not os.path.isdir(root):
+        return []
+    backups = []
+    for name in sorted(os.listdir(root)):
+        path = os.path.join(root, name)
+        if not name.startswith(BACKUP_PREFIX) or name.endswith('.part'):
+            continue
+        if os.path.isfile(os.path.join(path, MANIFEST_FILE)):
+            backups.append((path, read_manifest(path)))
+    return backups
+
+
+def backup_chain(name, root=None):
+    """مسارات النسخ اللازمة لاستعادة النسخة name بدءاً من النسخة الكاملة"""
+    backups = dict((manifest['name'], path) for path, manifest in list_backups(root))
+    if name not in backups:
+        raise BackupError(f'Backup not found: {name}')
+    manifest = read_manifest(backups[name])
+    missing = [member for member in manifest.get('chain', [name]) if member not in backups]
+    if missing:
+        raise BackupError(f'Backup chain of {name} is incomplete, missing: {", ".join(missing)}')
+    return [backups[member] for member in manifest.get('chain', [name])]
+
+
+def expired_backups(cutoff, root=None):
+    """
+    النسخ التي انتهت مدة الاحتفاظ بها
+
+    تُحذف السلسلة كاملة فقط عندما تكون أحدث نسخة فيها أقدم من cutoff حتى لا
+    تفقد النسخ التزايدية المحتفظ بها النسخة الكاملة التي تعتمد عليها.
+    """
+    chains = {}
+    for path, manifest in list_backups(root):
+        chains.setdefault(manifest.get('chain', [manifest['name']])[0], []).append((path, manifest))
+    expired = []
+    for members in chains.values():
+        newest = max(parse_datetime(manifest['created_at']) for _, manifest in members)
+        if newest < cutoff:
+            expired.extend(path for path, _ in members)
+    return expired
+
+
+@contextmanager
+def consistent_snapshot(conn):
+    """معاملة واحدة تُقرأ فيها كل الجداول من نفس اللحظة"""
+    with transaction.atomic(using=conn.alias):
+        if conn.vendor == 'postgresql':
+            with conn.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        yield
+
+
+def _last_change_id():
+    return ChangeLog.objects.aggregate(last=Max('id'))['last'] or 0
+
+
+class BackupEngine:
+    """
+    إنشاء نسخة احتياطية كاملة أو تزايدية في مجلد جديد داخل مجلد النسخ
+
+    النسخة التزايدية تحتوي الصفوف التي تغيرت منذ النسخة السابقة في السلسلة
+    (حسب updated_at وسجل التغييرات) ومعرفات الصفوف المحذوفة. يُكتب المجلد
+    باسم مؤقت ثم يُعاد تسميته بعد كتابة البيان حتى لا تظهر نسخة ناقصة.
+    """
+
+    def __init__(self, output_dir=None, compression=None, engine=None, chunk_size=BACKUP_CHUNK_SIZE, using=None):
+        self.output_dir = output_dir or backup_root()
+        self.compression = compression or default_compression()
+        if self.compression not in COMPRESSION_EXTENSIONS:
+            raise BackupError(f'Unsupported compression: {self.compression}')
+        self.connection = using or connection
+        self.engine = engine or getattr(settings, 'BACKUP_ENGINE', 'auto')
+        if self.engine == 'auto':
+            self.engine = 'pg_dump' if self.pg_dump_available() else 'json'
+        self.chunk_size = chunk_size
+
+    def pg_dump_available(self):
+        return self.connection.vendor == 'postgresql' and shutil.which('pg_dump') is not None
+
+    def plan(self, kind='auto'):
+        """
+        تحديد نوع النسخة والنسخة السابقة في السلسلة
+
+        في الوضع auto تُنشأ نسخة كاملة إذا لم توجد نسخة سابقة أو مضى على آخر
+        نسخة كاملة BACKUP_FULL_INTERVAL_DAYS يوماً أو تغيرت الترحيلات.
+        """
+        if kind == 'full':
+            return 'full', None
+        if os.path.exists(os.path.join(self.output_dir, RESTORE_MARKER)):
+            # سجل التغييرات لا يصف الفرق بين البيانات المستعادة وآخر نسخة
+            if kind == 'incremental':
+                raise BackupError('The database was restored since the last backup, a full backup is required')
+            return 'full', None
+        backups = list_backups(self.output_dir)
+        parent = backups[-1][1] if backups else None
+        if parent is None or 'changelog_id' not in parent:
+            if kind == 'incremental':
+                raise BackupError('An incremental backup needs a previous backup with a change log watermark')
+            return 'full', None
+        if kind == 'incremental':
+            return 'incremental', parent
+
+        base = dict((manifest['name'], manifest) for _, manifest in backups).get(parent['chain'][0])
+        interval = timedelta(days=getattr(settings, 'BACKUP_FULL_INTERVAL_DAYS', 7))
+        if base is None or parse_datetime(base['created_at']) + interval <= timezone.now():
+            return 'full', None
+        if parent['migrations'] != applied_migrations(self.connection):
+            return 'full', None
+        return 'incremental', parent
+
+    def run(self, kind='full', models=None, progress=None):
+        """إنشاء النسخة وإرجاع (مسار المجلد، البيان)"""
+        kind, parent = self.plan(kind)
+        models = models or backup_models()
+        name = f'{BACKUP_PREFIX}{timezone.now():%Y%m%d_%H%M%S}'
+        path = os.path.join(self.output_dir, name)
+        partial_path = path + '.part'
+        if os.path.exists(path):
+            raise BackupError(f'Backup {name} already exists')
+        os.makedirs(partial_path)
+        started = time.monotonic()
+
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'name': name,
+            'kind': kind,
+            'chain': (parent['chain'] if parent else []) + [name],
+            'parent': parent['name'] if parent else None,
+            'engine': 'json' if parent else self.engine,
+            'compression': self.compression,
+            'vendor': self.connection.vendor,
+            'django': django.get_version(),
+            'created_at': timezone.now().isoformat(),
+            'migrations': applied_migrations(self.connection),
+            'models': [],
+            'files': {},
+        }
+        try:
+            if parent:
+                self._dump_incremental(partial_path, models, manifest, parent, progress)
+            elif self.engine == 'pg_dump':
+                self._dump_postgres(partial_path, models, manifest, progress)
+            else:
+                self._dump_json(partial_path, models, manifest, progress)
+            manifest['duration'] = round(time.monotonic() - started, 3)
+            manifest['total_rows'] = sum(entry['rows'] for entry in manifest['models'])
+            manifest['total_bytes'] = sum(entry['bytes'] for entry in manifest['files'].values())
+            with open(os.path.join(partial_path, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+            os.replace(partial_path, path)
+        except BaseException:
+            shutil.rmtree(partial_path, ignore_errors=True)
+            raise
+
+        if kind == 'full':
+            self._purge_changes(manifest)
+            marker = os.path.join(self.output_dir, RESTORE_MARKER)
+            if os.path.exists(marker):
+                os.remove(marker)
+        return path, manifest
+
+    def _purge_changes(self, manifest):
+        """
+        حذف التغييرات التي لم تعد لازمة لأي نسخة تزايدية قادمة بعد نسخة كاملة
+
+        النسخة التزايدية التالية في كل مجلد تبدأ من آخر نسخة فيه، لذلك لا يُحذف
+        ما بعد علامة آخر نسخة في مجلد النسخ الافتراضي حتى لو كُتبت النسخة الكاملة
+        في مجلد آخر.
+        """
+        limit = manifest['changelog_id']
+        for root in {self.output_dir, backup_root()}:
+            backups = list_backups(root)
+            if backups:
+                limit = min(limit, backups[-1][1].get('changelog_id', 0))
+        ChangeLog.objects.filter(id__lte=limit).delete()
+
+    def _start_snapshot(self, manifest):
+        """تسجيل علامة التغييرات ووقت النسخة داخل المعاملة"""
+        manifest['changelog_id'] = _last_change_id()
+        manifest['watermark'] = timezone.now().isoformat()
+
+    def _write_file(self, directory, filename, manifest, write):
+        """كتابة ملف مضغوط عبر الدالة write وتسجيل بصمته في البيان"""
+        sink = ChecksumWriter(os.path.join(directory, filename))
+        try:
+            with compressor(sink, self.compression) as stream:
+                write(stream)
+        finally:
+            sink.close()
+        manifest['files'][filename] = {'bytes': sink.bytes, 'sha256': sink.hexdigest}
+
+    def _write_model(self, directory, model, queryset, manifest):
+        """تسلسل صفوف الاستعلام في ملف النموذج وإرجاع عددها"""
+        label = model_label(model)
+        filename = f'{label}.jsonl{COMPRESSION_EXTENSIONS[self.compression]}'
+        counter = {'rows': 0}
+        m2m = [
+            field.name for field in model._meta.many_to_many
+            if field.remote_field.through._meta.auto_created
+        ]
+        if m2m:
+            queryset = queryset.prefetch_related(*m2m)
+
+        def write(stream):
+            objects = _counted(queryset.order_by('pk').iterator(chunk_size=self.chunk_size), counter)
+            with io.TextIOWrapper(stream, encoding='utf-8') as text:
+                serializers.serialize('jsonl', objects, stream=text, ensure_ascii=False)
+
+        self._write_file(directory, filename, manifest, write)
+        entry = {'model': label, 'rows': counter['rows'], 'file': filename}
+        manifest['models'].append(entry)
+        return entry
+
+    def _dump_json(self, directory, models, manifest, progress):
+        with consistent_snapshot(self.connection):
+            self._start_snapshot(manifest)
+            for model in models:
+                entry = self._write_model(directory, model, model._base_manager.using(self.connection.alias), manifest)
+                if progress:
+                    progress(entry['model'], entry['rows'])
+
+    def _dump_incremental(self, directory, models, manifest, parent, progress):
+        """الصفوف المعدلة والمحذوفة منذ النسخة السابقة"""
+        tracked = set(change_tracked_models())
+        # هامش لتغطية الصفوف التي حُفظت قبل وقت النسخة السابقة ولم تُعتمد إلا بعدها
+        overlap = timedelta(seconds=getattr(settings, 'BACKUP_WATERMARK_OVERLAP', 300))
+        since = parse_datetime(parent['watermark']) - overlap
+        manifest['since_changelog_id'] = parent['changelog_id']
+        deletions = []
+
+        with consistent_snapshot(self.connection):
+            self._start_snapshot(manifest)
+            for model in models:
+                if model not in tracked:
+                    continue
+                label = model_label(model)
+                changes = ChangeLog.objects.filter(
+                    model=label, id__gt=parent['changelog_id'], id__lte=manifest['changelog_id']
+                )
+                manager = model._base_manager.using(self.connection.alias)
+                changed = Q(pk__in=changes.filter(action='save').values('object_id'))
+                if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+                    changed |= Q(updated_at__gte=since)
+                entry = self._write_model(directory, model, manager.filter(changed), manifest)
+
+                deleted = list(
+                    changes.filter(action='delete')
+                    .exclude(object_id__in=manager.values('pk'))
+                    .values_list('object_id', flat=True).distinct()
+                )
+                entry['deleted'] = len(deleted)
+                deletions.extend({'model': label, 'pk': pk} for pk in deleted)
+                if progress:
+                    progress(label, entry['rows'])
+
+        def write(stream):
+            with io.TextIOWrapper(stream, encoding='utf-8') as text:
+                for deletion in deletions:
+                    text.write(json.dumps(deletion) + '\n')
+
+        self._write_file(directory, DELETIONS_FILE + COMPRESSION_EXTENSIONS[self.compression], manifest, write)
+
+    def _dump_postgres(self, directory, models, manifest, progress):
+        filename = f'database.dump{COMPRESSION_EXTENSIONS[self.compression]}'
+        command, env = pg_command(self.connection, 'pg_dump', ['--format=custom', '--compress=0', '--no-owner'])
+
+        with consistent_snapshot(self.connection):
+            with self.connection.cursor() as cursor:
+                cursor.execute('SELECT pg_export_snapshot()')
+                snapshot = cursor.fetchone()[0]
+            self._start_snapshot(manifest)
+            for model in models:
+                rows = model._base_manager.using(self.connection.alias).count()
+                manifest['models'].append({'model': model_label(model), 'rows': rows, 'file': filename})
+
+            with tempfile.TemporaryFile() as stderr:
+                process = subprocess.Popen(command + [f'--snapshot={snapshot}'], stdout=subprocess.PIPE, stderr=stderr, env=env)
+
+                def write(stream):
+                    for chunk in iter(lambda: process.stdout.read(PIPE_BUFFER_SIZE), b''):
+                        stream.write(chunk)
+
+                try:
+                    self._write_file(directory, filename, manifest, write)
+                finally:
+                    process.stdout.close()
+                    returncode = process.wait()
+                if returncode != 0:
+                    stderr.seek(0)
+                    raise BackupError(f'pg_dump failed: {stderr.read().decode(errors="replace").strip()}')
+        if progress:
+            progress(filename, sum(entry['rows'] for entry in manifest['models']))
+
+
+def pg_command(conn, program, arguments):
+    """أمر أداة PostgreSQL مع بيانات الاتصال من الإعدادات"""
+    settings_dict = conn.settings_dict
+    command = [program, *arguments, '--dbname', settings_dict['NAME']]
+    if settings_dict.get('HOST'):
+        command += ['--host', settings_dict['HOST']]
+    if settings_dict.get('PORT'):
+        command += ['--port', str(settings_dict['PORT'])]
+    if settings_dict.get('USER'):
+        command += ['--username', settings_dict['USER']]
+    env = os.environ.copy()
+    if settings_dict.get('PASSWORD'):
+        env['PGPASSWORD'] = settings_dict['PASSWORD']
+    return command, env
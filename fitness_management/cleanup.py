@@ -0,0 +1,106 @@
+"""
+Chunked purge of old rows.
+
+Rows are deleted in bounded batches selected by primary key, each batch in its
+own short transaction, so no statement loads the whole set into memory or
+holds locks for long. Deleted rows can be copied first into a compact archive
+table, their files are removed from storage once the batch has committed, and
+the deletions are written to the change log for incremental backups.
+"""
+
+import time
+from django.conf import settings
+from django.db import transaction
+from .models import ArchivedEvent, ArchivedNews, ChangeLog
+
+CLEANUP_BATCH_SIZE = 500
+
+
+class PurgeResult:
+    """إحصائيات حذف نموذج واحد"""
+
+    def __init__(self, label):
+        self.label = label
+        self.deleted = 0
+        self.archived = 0
+        self.files = 0
+        self.batches = 0
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.deleted / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (
+            f"{self.label}: {self.deleted} deleted, {self.archived} archived, {self.files} files "
+            f"in {self.batches} batches ({self.elapsed:.2f}s, {self.rows_per_second:.0f} rows/s)"
+        )
+
+
+def purge(queryset, archive=None, file_fields=(), batch_size=None, pause=None, progress=None):
+    """
+    حذف صفوف الاستعلام على دفعات وإرجاع PurgeResult
+
+    archive دالة تحول قاموس قيم الصف إلى كائن أرشيف غير محفوظ، وfile_fields
+    أسماء حقول الملفات التي تُحذف ملفاتها بعد حذف الصفوف.
+    """
+    model = queryset.model
+    batch_size = batch_size or getattr(settings, 'CLEANUP_BATCH_SIZE', CLEANUP_BATCH_SIZE)
+    pause = pause if pause is not None else getattr(settings, 'CLEANUP_BATCH_PAUSE', 0)
+    result = PurgeResult(model._meta.label_lower)
+    started = time.monotonic()
+    pk_name = model._meta.pk.attname
+    last_pk = None
+
+    while True:
+        batch = queryset.order_by('pk')
+        if last_pk is not None:
+            batch = batch.filter(pk__gt=last_pk)
+        rows = list(batch.values()[:batch_size])
+        if not rows:
+            break
+        pks = [row[pk_name] for row in rows]
+        last_pk = pks[-1]
+
+        with transaction.atomic():
+            if archive is not None:
+                archived = [archive(row) for row in rows]
+                archive_model = type(archived[0])
+                archive_model.objects.bulk_create(archived)
+                ChangeLog.record_queryset(archive_model.objects.filter(original_id__in=pks))
+                result.archived += len(archived)
+            ChangeLog.record(model, pks, action='delete')
+            # حذف مباشر دون تحميل الكائنات لأن الجدول لا تشير إليه علاقات
+            result.deleted += model._base_manager.filter(pk__in=pks)._raw_delete(model._base_manager.db)
+
+        # الملفات تُحذف بعد اعتماد الحذف حتى لا يبقى صف يشير لملف محذوف
+        for field_name in file_fields:
+            storage = model._meta.get_field(field_name).storage
+            for row in rows:
+                if row[field_name]:
+                    storage.delete(row[field_name])
+                    result.files += 1
+
+        result.batches += 1
+        result.elapsed = time.monotonic() - started
+        if progress:
+            progress(result)
+        if pause:
+            time.sleep(pause)
+
+    result.elapsed = time.monotonic() - started
+    return result
+
+
+def archive_news(row):
+    return ArchivedNews(
+        original_id=row['id'], title=row['title'], content=row['content'], created_at=row['created_at'],
+    )
+
+
+def archive_event(row):
+    return ArchivedEvent(
+        original_id=row['id'], title=row['title'], start_date=row['start_date'],
+        end_date=row['end_date'], location=row['location'],
+    )
@@ -0,0 +1,87 @@
+"""
+Precomputed dashboard summary.
+
+The summary for a scope (national, one region, one department or one
+institute) is built from a single rollup aggregate, the in-memory hierarchy
+and one indexed query for the latest students, then cached for a short time
+and shared by every user of that scope.
+"""
+
+import logging
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from django.utils import timezone
+from .hierarchy import get_hierarchy
+from .instrumentation import QueryCounter
+from .models import StatisticsRollup, Student
+
+logger = logging.getLogger(__name__)
+
+LATEST_STUDENTS = 5
+
+
+def scope_cache_key(user_profile):
+    """مفتاح التخزين المؤقت حسب نطاق المستخدم وليس المستخدم نفسه"""
+    user_type = user_profile.user_type
+    scope_id = {
+        'region_admin': user_profile.region_id,
+        'department_admin': user_profile.department_id,
+        'institute_admin': user_profile.institute_id,
+    }.get(user_type)
+    return f'fitness_management:dashboard:{user_type}:{scope_id}'
+
+
+def build_dashboard_summary(user_profile, hierarchy=None):
+    """حساب ملخص لوحة التحكم بعدد ثابت من الاستعلامات"""
+    hierarchy = hierarchy or get_hierarchy()
+    totals = StatisticsRollup.objects.for_profile(user_profile).aggregate(
+        total_students=Sum('student_count'), total_tests=Sum('test_count')
+    )
+    latest = (
+        Student.objects.for_profile(user_profile)
+        .select_related('institute')
+        .only('id', 'name', 'education_level', 'created_at', 'institute__name')
+        .order_by('-created_at', '-id')[:LATEST_STUDENTS]
+    )
+    return {
+        'stats': {
+            'total_students': totals['total_students'] or 0,
+            'total_tests': totals['total_tests'] or 0,
+            'total_regions': len(hierarchy.regions_for_profile(user_profile)),
+            'total_departments': len(hierarchy.departments_for_profile(user_profile)),
+            'total_institutes': len(hierarchy.institutes_for_profile(user_profile)),
+        },
+        'latest_students': [
+            {
+                'id': student.id,
+                'name': student.name,
+                'education_level': student.get_education_level_display(),
+                'institute_name': student.institute.name,
+                'created_at': student.created_at,
+            }
+            for student in latest
+        ],
+        'generated_at': timezone.now(),
+    }
+
+
+def get_dashboard_summary(user_profile):
+    """ملخص لوحة التحكم من التخزين المؤقت أو بحسابه وتسجيل عدد استعلاماته"""
+    key = scope_cache_key(user_profile)
+    summary = cache.get(key)
+    if summary is not None:
+        return summary
+
+    # تحميل الهيكل الإداري خارج العداد حتى لا يظهر في عدد استعلامات الملخص
+    hierarchy = get_hierarchy()
+    with QueryCounter() as counter:
+        summary = build_dashboard_summary(user_profile, hierarchy)
+    summary['query_count'] = counter.count
+    summary['build_time'] = counter.elapsed
+    logger.info(
+        'Dashboard summary for %s built with %d queries in %.1f ms',
+        key, counter.count, counter.elapsed * 1000
+    )
+    cache.set(key, summary, getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 60))
+    return summary
@@ -0,0 +1,205 @@
+"""
+Streaming exports of student data.
+
+Rows are read with ``values_list(...).iterator(chunk_size=...)`` so related
+names come from the same query and memory stays constant regardless of the
+export size. The same row and line generators are used for files written by
+Celery tasks and for HTTP downloads.
+"""
+
+import csv
+import json
+import os
+from django.core import serializers
+from .models import Student, StudentTest
+from .search import search_students
+
+EXPORT_CHUNK_SIZE = 2000
+
+# (المفتاح، العنوان، الحقل في الاستعلام)
+STUDENT_EXPORT_COLUMNS = (
+    ('id', 'ID', 'id'),
+    ('name', 'Name', 'name'),
+    ('national_id', 'National ID', 'national_id'),
+    ('gender', 'Gender', 'gender'),
+    ('education_level', 'Education Level', 'education_level'),
+    ('grade', 'Grade', 'grade'),
+    ('institute', 'Institute', 'institute__name'),
+    ('department', 'Department', 'department__name'),
+    ('region', 'Region', 'region__name'),
+    ('academic_year', 'Academic Year', 'academic_year__name'),
+)
+
+TEST_EXPORT_COLUMNS = (
+    ('id', 'ID', 'id'),
+    ('student_id', 'Student ID', 'student_id'),
+    ('student', 'Student', 'student__name'),
+    ('national_id', 'National ID', 'student__national_id'),
+    ('gender', 'Gender', 'student__gender'),
+    ('education_level', 'Education Level', 'student__education_level'),
+    ('institute', 'Institute', 'student__institute__name'),
+    ('region', 'Region', 'region__name'),
+    ('test', 'Test', 'test__name'),
+    ('max_score', 'Max Score', 'test__max_score'),
+    ('score', 'Score', 'score'),
+    ('test_date', 'Test Date', 'test_date'),
+)
+
+# الحقول التي تُصدَّر بأسمائها المعروضة
+DISPLAY_VALUES = {
+    'gender': dict(Student.GENDER_CHOICES),
+    'education_level': dict(Student.EDUCATION_LEVELS),
+}
+
+# مواصفات التصفية المقبولة وما يقابلها في جدول الطلاب
+SPEC_LOOKUPS = {
+    'region': 'region_id',
+    'department': 'department_id',
+    'institute': 'institute_id',
+    'gender': 'gender',
+    'education_level': 'education_level',
+    'academic_year': 'academic_year_id',
+}
+
+# نفس المواصفات مطبقة على نتائج الاختبارات
+TEST_SPEC_LOOKUPS = {
+    'region': 'region_id',
+    'department': 'department_id',
+    'institute': 'student__institute_id',
+    'gender': 'student__gender',
+    'education_level': 'student__education_level',
+    'academic_year': 'student__academic_year_id',
+}
+
+EXPORT_FORMATS = ('csv', 'ndjson', 'json')
+
+
+def student_queryset(spec=None, user_profile=None):
+    """
+    الطلاب المطابقون لمواصفات التصفية
+
+    المواصفات قاموس بسيط يمكن تمريره لمهام Celery، مثل
+    {'region': 3, 'gender': 'male', 'academic_year': 2}.
+    """
+    spec = spec or {}
+    if user_profile is None and spec.get('user_profile'):
+        from accounts.models import UserProfile
+        user_profile = UserProfile.objects.get(pk=spec['user_profile'])
+    students = Student.objects.for_profile(user_profile) if user_profile else Student.objects.all()
+
+    for key, lookup in SPEC_LOOKUPS.items():
+        value = spec.get(key)
+        if value not in (None, ''):
+            students = students.filter(**{lookup: value})
+    if spec.get('ids'):
+        students = students.filter(id__in=spec['ids'])
+    if spec.get('search'):
+        students, _ = search_students(students, spec['search'])
+    return students.order_by('id')
+
+
+def student_test_queryset(spec=None, user_profile=None):
+    """نتائج الاختبارات لطلاب مواصفات التصفية نفسها"""
+    spec = spec or {}
+    if user_profile is None and spec.get('user_profile'):
+        from accounts.models import UserProfile
+        user_profile = UserProfile.objects.get(pk=spec['user_profile'])
+    tests = StudentTest.objects.for_profile(user_profile) if user_profile else StudentTest.objects.all()
+
+    for key, lookup in TEST_SPEC_LOOKUPS.items():
+        value = spec.get(key)
+        if value not in (None, ''):
+            tests = tests.filter(**{lookup: value})
+    if spec.get('ids'):
+        tests = tests.filter(student_id__in=spec['ids'])
+    if spec.get('search'):
+        matches, _ = search_students(Student.objects.all(), spec['search'])
+        tests = tests.filter(student_id__in=matches.values('id'))
+    return tests.order_by('id')
+
+
+def iter_rows(queryset, columns, chunk_size=EXPORT_CHUNK_SIZE):
+    """قراءة الصفوف على دفعات مع تحويل القيم المختارة لأسمائها المعروضة"""
+    keys = [key for key, _, _ in columns]
+    lookups = [lookup for _, _, lookup in columns]
+    for row in queryset.values_list(*lookups).iterator(chunk_size=chunk_size):
+        yield [
+            DISPLAY_VALUES[key].get(value, value) if key in DISPLAY_VALUES else value
+            for key, value in zip(keys, row)
+        ]
+
+
+class _Echo:
+    """كائن كتابة يعيد السطر بدلاً من تخزينه لاستخدامه مع csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows, columns):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([header for _, header, _ in columns])
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def ndjson_lines(rows, columns):
+    keys = [key for key, _, _ in columns]
+    for row in rows:
+        yield json.dumps(dict(zip(keys, row)), ensure_ascii=False, default=str) + '\n'
+
+
+def format_lines(rows, columns, format):
+    """أسطر ملف التصدير بالصيغة المطلوبة دون تحميل النتائج في الذاكرة"""
+    if format == 'csv':
+        return csv_lines(rows, columns)
+    if format == 'ndjson':
+        return ndjson_lines(rows, columns)
+    raise ValueError(f"Unsupported format: {format}")
+
+
+def _counted(iterable, progress, every):
+    """تمرير العناصر مع استدعاء دالة التقدم كل عدد محدد منها"""
+    done = 0
+    for item in iterable:
+        yield item
+        done += 1
+        if progress and done % every == 0:
+            progress(done)
+    if progress:
+        progress(done)
+
+
+def export_students(queryset, format, path, chunk_size=EXPORT_CHUNK_SIZE, progress=None):
+    """
+    كتابة ملف التصدير تدريجياً وإرجاع عدد الطلاب
+
+    يُكتب الملف باسم مؤقت ثم يُعاد تسميته عند الاكتمال حتى لا يظهر ملف ناقص.
+    """
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported format: {format}")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial_path = path + '.part'
+    counter = {'done': 0}
+
+    def track(done):
+        counter['done'] = done
+        if progress:
+            progress(done)
+
+    try:
+        with open(partial_path, 'w', encoding='utf-8', newline='') as f:
+            if format == 'json':
+                # نفس صيغة serialize('json') السابقة لكن بالكتابة المتتابعة
+                students = _counted(queryset.iterator(chunk_size=chunk_size), track, chunk_size)
+                serializers.serialize('json', students, stream=f)
+            else:
+                rows = _counted(iter_rows(queryset, STUDENT_EXPORT_COLUMNS, chunk_size), track, chunk_size)
+                for line in format_lines(rows, STUDENT_EXPORT_COLUMNS, format):
+                    f.write(line)
+        os.replace(partial_path, path)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    return counter['done']
@@ -0,0 +1,100 @@
+"""
+Fan-out/fan-in helpers for large exports and report jobs.
+
+A region- or nation-wide job is split into one sub-specification per
+institute (or department) in scope. Each slice runs as its own Celery task
+inside a chord and writes its own part file, so the work spreads over all
+available workers and a failed slice is retried alone. The chord callback then
+merges the parts: export files are concatenated in slice order without being
+parsed, and per-institute report archives are bundled into a single zip.
+"""
+
+import os
+import shutil
+import zipfile
+from .exports import student_queryset
+
+# حقل التقسيم في جدول الطلاب
+SLICE_FIELDS = {
+    'institute': 'institute_id',
+    'department': 'department_id',
+}
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+def slice_specs(spec=None, by='institute'):
+    """مواصفات فرعية لكل معهد أو إدارة فيها طلاب مطابقون"""
+    if by not in SLICE_FIELDS:
+        raise ValueError(f"Unsupported slice: {by}")
+    spec = dict(spec or {})
+    keys = student_queryset(spec).order_by(SLICE_FIELDS[by]).values_list(SLICE_FIELDS[by], flat=True).distinct()
+    return [dict(spec, **{by: key}) for key in keys]
+
+
+def parts_dir(path):
+    """مجلد الأجزاء المؤقت بجوار الملف النهائي"""
+    return path + '.parts'
+
+
+def part_path(path, index, extension):
+    return os.path.join(parts_dir(path), f'part_{index:05d}.{extension}')
+
+
+def _copy_range(source, target, start, end):
+    source.seek(start)
+    remaining = end - start
+    while remaining > 0:
+        chunk = source.read(min(COPY_BUFFER_SIZE, remaining))
+        if not chunk:
+            break
+        target.write(chunk)
+        remaining -= len(chunk)
+
+
+def merge_export_parts(parts, path, format):
+    """
+    دمج ملفات الأجزاء بترتيبها في ملف التصدير النهائي وحذف مجلد الأجزاء
+
+    يُكتب عنوان CSV مرة واحدة، وتُدمج مصفوفات JSON بنسخ ما بين القوسين
+    دون تحليل الصفوف.
+    """
+    partial_path = path + '.part'
+    with open(partial_path, 'wb') as target:
+        if format == 'json':
+            target.write(b'[')
+        written = False
+        for index, part in enumerate(parts):
+            size = os.path.getsize(part)
+            with open(part, 'rb') as source:
+                if format == 'csv':
+                    start = 0
+                    if index:
+                        source.readline()
+                        start = source.tell()
+                    _copy_range(source, target, start, size)
+                elif format == 'json':
+                    # محتوى الجزء بين '[' و ']' الختامية
+                    if size > 2:
+                        if written:
+                            target.write(b',')
+                        _copy_range(source, target, 1, size - 1)
+                        written = True
+                else:
+                    _copy_range(source, target, 0, size)
+        if format == 'json':
+            target.write(b']')
+    os.replace(partial_path, path)
+    shutil.rmtree(parts_dir(path), ignore_errors=True)
+    return path
+
+
+def bundle_report_archives(archives, path):
+    """جمع أرشيفات المعاهد في ملف zip واحد دون إعادة ضغطها وحذف مجلد الأجزاء"""
+    partial_path = path + '.part'
+    with zipfile.ZipFile(partial_path, 'w', compression=zipfile.ZIP_STORED) as bundle:
+        for archive in archives:
+            bundle.write(archive, os.path.basename(archive))
+    os.replace(partial_path, path)
+    shutil.rmtree(parts_dir(path), ignore_errors=True)
+    return path
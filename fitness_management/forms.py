@@ -1,5 +1,11 @@
 from django import forms
 from .models import Student, StudentTest, News, Event, Video, TrainingUnit, ExternalLink, Region, Department, Institute
+from .hierarchy import get_hierarchy, hierarchy_choices
+
+
+def set_hierarchy_choices(field, nodes, label):
+    """ملء خيارات الحقل من نسخة الهيكل الإداري في الذاكرة بدلاً من الاستعلام عند العرض"""
+    field.choices = hierarchy_choices(nodes, label, field.empty_label)
 
 class StudentForm(forms.ModelForm):
     region = forms.ModelChoiceField(
@@ -41,49 +47,28 @@ class StudentForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         
         if user_profile:
-            # فلترة المناطق حسب صلاحيات المستخدم
-            if user_profile.user_type == 'super_admin':
-                self.fields['region'].queryset = Region.objects.all()
-            elif user_profile.user_type == 'region_admin':
-                self.fields['region'].queryset = Region.objects.filter(id=user_profile.region.id)
-                self.fields['region'].initial = user_profile.region
-                self.fields['region'].widget.attrs['readonly'] = True
-            elif user_profile.user_type == 'department_admin':
-                self.fields['region'].queryset = Region.objects.filter(id=user_profile.department.region.id)
-                self.fields['region'].initial = user_profile.department.region
-                self.fields['region'].widget.attrs['readonly'] = True
-            else:  # institute_admin
-                self.fields['region'].queryset = Region.objects.filter(id=user_profile.institute.department.region.id)
-                self.fields['region'].initial = user_profile.institute.department.region
+            # فلترة القوائم حسب صلاحيات المستخدم
+            hierarchy = get_hierarchy()
+            regions = hierarchy.regions_for_profile(user_profile)
+            departments = hierarchy.departments_for_profile(user_profile)
+            self.fields['region'].queryset = Region.objects.for_profile(user_profile)
+            self.fields['department'].queryset = Department.objects.for_profile(user_profile)
+            self.fields['institute'].queryset = Institute.objects.for_profile(user_profile)
+            set_hierarchy_choices(self.fields['region'], regions, lambda node: node.name)
+            set_hierarchy_choices(self.fields['department'], departments, hierarchy.department_label)
+            set_hierarchy_choices(
+                self.fields['institute'], hierarchy.institutes_for_profile(user_profile), hierarchy.institute_label
+            )
+            
+            if user_profile.user_type != 'super_admin':
+                self.fields['region'].initial = regions[0].id if regions else None
                 self.fields['region'].widget.attrs['readonly'] = True
             
-            # تعيين الإدارات حسب المنطقة الأولية
-            if user_profile.user_type == 'region_admin':
-                self.fields['department'].queryset = Department.objects.filter(region=user_profile.region)
-            elif user_profile.user_type == 'department_admin':
-                self.fields['department'].queryset = Department.objects.filter(id=user_profile.department.id)
-                self.fields['department'].initial = user_profile.department
-            elif user_profile.user_type == 'institute_admin':
-                self.fields['department'].queryset = Department.objects.filter(id=user_profile.institute.department.id)
-                self.fields['department'].initial = user_profile.institute.department
-            else:
-                # للمستخدمين العاديين، عرض جميع الإدارات
-                self.fields['department'].queryset = Department.objects.all()
-                
-            # إذا كان هناك منطقة محددة مسبقاً، عرض إداراتها
-            if self.fields['region'].initial:
-                region = self.fields['region'].initial
-                self.fields['department'].queryset = Department.objects.filter(region=region)
-                
-            # تعيين المعاهد حسب الإدارة الأولية
+            if user_profile.user_type in ['department_admin', 'institute_admin']:
+                self.fields['department'].initial = departments[0].id if departments else None
+            
             if user_profile.user_type == 'institute_admin':
-                self.fields['institute'].queryset = Institute.objects.filter(id=user_profile.institute.id)
-                self.fields['institute'].initial = user_profile.institute
-            else:
-                # للمستخدمين الآخرين، عرض المعاهد حسب الإدارة المحددة
-                if self.fields['department'].initial:
-                    department = self.fields['department'].initial
-                    self.fields['institute'].queryset = Institute.objects.filter(department=department)
+                self.fields['institute'].initial = user_profile.institute_id
 
 class StudentTestForm(forms.ModelForm):
     class Meta:
@@ -177,14 +162,17 @@ class DepartmentForm(forms.ModelForm):
         
         if user_profile:
             # فلترة المناطق حسب صلاحيات المستخدم
-            if user_profile.user_type == 'super_admin':
-                self.fields['region'].queryset = Region.objects.all()
-            elif user_profile.user_type == 'region_admin':
-                self.fields['region'].queryset = Region.objects.filter(id=user_profile.region.id)
-                self.fields['region'].initial = user_profile.region
-                self.fields['region'].widget.attrs['readonly'] = True
+            if user_profile.user_type in ['super_admin', 'region_admin']:
+                self.fields['region'].queryset = Region.objects.for_profile(user_profile)
+                set_hierarchy_choices(
+                    self.fields['region'], get_hierarchy().regions_for_profile(user_profile), lambda node: node.name
+                )
             else:
                 self.fields['region'].queryset = Region.objects.none()
+            
+            if user_profile.user_type == 'region_admin':
+                self.fields['region'].initial = user_profile.region_id
+                self.fields['region'].widget.attrs['readonly'] = True
 
 class InstituteForm(forms.ModelForm):
     region = forms.ModelChoiceField(
@@ -215,34 +203,26 @@ class InstituteForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         
         if user_profile:
-            # فلترة المناطق حسب صلاحيات المستخدم
-            if user_profile.user_type == 'super_admin':
-                self.fields['region'].queryset = Region.objects.all()
-            elif user_profile.user_type == 'region_admin':
-                self.fields['region'].queryset = Region.objects.filter(id=user_profile.region.id)
-                self.fields['region'].initial = user_profile.region
-                self.fields['region'].widget.attrs['readonly'] = True
-            elif user_profile.user_type == 'department_admin':
-                self.fields['region'].queryset = Region.objects.filter(id=user_profile.department.region.id)
-                self.fields['region'].initial = user_profile.department.region
-                self.fields['region'].widget.attrs['readonly'] = True
+            # فلترة القوائم حسب صلاحيات المستخدم
+            hierarchy = get_hierarchy()
+            if user_profile.user_type in ['super_admin', 'region_admin', 'department_admin']:
+                self.fields['region'].queryset = Region.objects.for_profile(user_profile)
+                regions = hierarchy.regions_for_profile(user_profile)
             else:
                 self.fields['region'].queryset = Region.objects.none()
+                regions = []
+            self.fields['department'].queryset = Department.objects.for_profile(user_profile)
+            set_hierarchy_choices(self.fields['region'], regions, lambda node: node.name)
+            set_hierarchy_choices(
+                self.fields['department'], hierarchy.departments_for_profile(user_profile), hierarchy.department_label
+            )
             
-            # تعيين الإدارات حسب المنطقة الأولية
-            if user_profile.user_type == 'region_admin':
-                self.fields['department'].queryset = Department.objects.filter(region=user_profile.region)
-            elif user_profile.user_type == 'department_admin':
-                self.fields['department'].queryset = Department.objects.filter(id=user_profile.department.id)
-                self.fields['department'].initial = user_profile.department
-            else:
-                # للمستخدمين العاديين، عرض جميع الإدارات
-                self.fields['department'].queryset = Department.objects.all()
-                
-            # إذا كان هناك منطقة محددة مسبقاً، عرض إداراتها
-            if self.fields['region'].initial:
-                region = self.fields['region'].initial
-                self.fields['department'].queryset = Department.objects.filter(region=region)
+            if user_profile.user_type in ['region_admin', 'department_admin']:
+                self.fields['region'].initial = regions[0].id if regions else None
+                self.fields['region'].widget.attrs['readonly'] = True
+            
+            if user_profile.user_type == 'department_admin':
+                self.fields['department'].initial = user_profile.department_id
     
     def save(self, commit=True):
         """حفظ المعهد مع التأكد من صحة العلاقة مع الإدارة"""
@@ -0,0 +1,180 @@
+"""
+Process-local cache of the Region -> Department -> Institute hierarchy.
+
+The hierarchy is small and rarely changes, so each process keeps a full copy
+in memory and answers ancestor/descendant lookups from dictionaries. A version
+stamp in the shared cache is bumped whenever one of the three models changes;
+processes compare it at most every ``HIERARCHY_CACHE_CHECK_INTERVAL`` seconds
+and reload their copy when it differs.
+"""
+
+import threading
+import time
+import uuid
+from collections import defaultdict, namedtuple
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = 'fitness_management:hierarchy_version'
+
+RegionNode = namedtuple('RegionNode', ['id', 'name', 'code'])
+DepartmentNode = namedtuple('DepartmentNode', ['id', 'name', 'code', 'region_id'])
+InstituteNode = namedtuple('InstituteNode', ['id', 'name', 'code', 'department_id', 'region_id'])
+
+
+class Hierarchy:
+    """نسخة ثابتة من الهيكل الإداري مع فهارس للبحث السريع"""
+
+    def __init__(self, version, regions, departments, institutes):
+        self.version = version
+        self.regions = {node.id: node for node in regions}
+        self.departments = {node.id: node for node in departments}
+        self.institutes = {node.id: node for node in institutes}
+
+        self.departments_by_region = defaultdict(list)
+        for node in departments:
+            self.departments_by_region[node.region_id].append(node)
+        self.institutes_by_department = defaultdict(list)
+        self.institutes_by_region = defaultdict(list)
+        for node in institutes:
+            self.institutes_by_department[node.department_id].append(node)
+            self.institutes_by_region[node.region_id].append(node)
+
+    @classmethod
+    def load(cls, version):
+        from .models import Department, Institute, Region
+        regions = [
+            RegionNode(*row)
+            for row in Region.objects.order_by('id').values_list('id', 'name', 'code')
+        ]
+        departments = [
+            DepartmentNode(*row)
+            for row in Department.objects.order_by('id').values_list('id', 'name', 'code', 'region_id')
+        ]
+        institutes = [
+            InstituteNode(*row)
+            for row in Institute.objects.order_by('id').values_list(
+                'id', 'name', 'code', 'department_id', 'department__region_id'
+            )
+        ]
+        return cls(version, regions, departments, institutes)
+
+    # ===== الأسلاف =====
+    def region_of_department(self, department_id):
+        node = self.departments.get(department_id)
+        return node.region_id if node else None
+
+    def department_of_institute(self, institute_id):
+        node = self.institutes.get(institute_id)
+        return node.department_id if node else None
+
+    def region_of_institute(self, institute_id):
+        node = self.institutes.get(institute_id)
+        return node.region_id if node else None
+
+    def ancestors(self, region_id=None, department_id=None, institute_id=None):
+        """استكمال معرفات المنطقة والإدارة من أدنى مستوى معروف"""
+        if institute_id is not None:
+            department_id = self.department_of_institute(institute_id)
+        if department_id is not None:
+            region_id = self.region_of_department(department_id)
+        return region_id, department_id, institute_id
+
+    # ===== الأسماء =====
+    def region_name(self, region_id):
+        node = self.regions.get(region_id)
+        return node.name if node else ''
+
+    def department_name(self, department_id):
+        node = self.departments.get(department_id)
+        return node.name if node else ''
+
+    def institute_name(self, institute_id):
+        node = self.institutes.get(institute_id)
+        return node.name if node else ''
+
+    def department_label(self, node):
+        return f"{node.name} - {self.region_name(node.region_id)}"
+
+    def institute_label(self, node):
+        return f"{node.name} - {self.department_name(node.department_id)}"
+
+    # ===== النطاق حسب المستخدم =====
+    def regions_for_profile(self, user_profile):
+        if user_profile.user_type == 'super_admin':
+            return list(self.regions.values())
+        region_id, _, _ = self.ancestors(
+            user_profile.region_id, user_profile.department_id, user_profile.institute_id
+        )
+        node = self.regions.get(region_id)
+        return [node] if node else []
+
+    def departments_for_profile(self, user_profile):
+        user_type = user_profile.user_type
+        if user_type == 'super_admin':
+            return list(self.departments.values())
+        if user_type == 'region_admin':
+            return list(self.departments_by_region.get(user_profile.region_id, []))
+        _, department_id, _ = self.ancestors(
+            department_id=user_profile.department_id, institute_id=user_profile.institute_id
+        )
+        node = self.departments.get(department_id)
+        return [node] if node else []
+
+    def institutes_for_profile(self, user_profile):
+        user_type = user_profile.user_type
+        if user_type == 'super_admin':
+            return list(self.institutes.values())
+        if user_type == 'region_admin':
+            return list(self.institutes_by_region.get(user_profile.region_id, []))
+        if user_type == 'department_admin':
+            return list(self.institutes_by_department.get(user_profile.department_id, []))
+        node = self.institutes.get(user_profile.institute_id)
+        return [node] if node else []
+
+
+_lock = threading.Lock()
+_hierarchy = None
+_checked_at = 0.0
+
+
+def _current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def get_hierarchy():
+    """الحصول على نسخة الهيكل الإداري المحفوظة في ذاكرة العملية"""
+    global _hierarchy, _checked_at
+    interval = getattr(settings, 'HIERARCHY_CACHE_CHECK_INTERVAL', 1)
+    hierarchy = _hierarchy
+    now = time.monotonic()
+    if hierarchy is not None and now - _checked_at < interval:
+        return hierarchy
+
+    version = _current_version()
+    if hierarchy is None or hierarchy.version != version:
+        with _lock:
+            hierarchy = _hierarchy
+            if hierarchy is None or hierarchy.version != version:
+                hierarchy = Hierarchy.load(version)
+                _hierarchy = hierarchy
+    _checked_at = now
+    return hierarchy
+
+
+def invalidate_hierarchy():
+    """إبطال النسخ المحفوظة في جميع العمليات"""
+    global _hierarchy
+    _hierarchy = None
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def hierarchy_choices(nodes, label, empty_label=None):
+    """قائمة خيارات جاهزة لحقول الاختيار من عقد الهيكل"""
+    choices = [('', empty_label)] if empty_label is not None else []
+    choices.extend((node.id, label(node)) for node in nodes)
+    return choices
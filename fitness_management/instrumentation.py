@@ -0,0 +1,41 @@
+"""
+Lightweight query instrumentation.
+
+``QueryCounter`` hooks into ``connection.execute_wrapper`` so it works with
+DEBUG off and costs one function call per query.
+"""
+
+import time
+from django.db import connection
+
+
+class QueryCounter:
+    """عد الاستعلامات ووقت تنفيذها داخل كتلة with"""
+
+    def __init__(self, using=None):
+        self.connection = using or connection
+        self.count = 0
+        self.sql_time = 0.0
+        self.elapsed = 0.0
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.count += 1
+            self.sql_time += duration
+            self.queries.append((sql, duration))
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        self._wrapper = self.connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._wrapper.__exit__(exc_type, exc_value, traceback)
+        self.elapsed = time.perf_counter() - self._started
+        return False
@@ -0,0 +1,246 @@
+"""
+Backend-aware database maintenance.
+
+Each backend measures churn per table from the statistics the database keeps
+itself and only maintains tables above a threshold:
+
+* SQLite compares row counts with ``sqlite_stat1`` and runs ``ANALYZE`` on
+  tables that drifted, ``VACUUM`` when the free-page ratio is high, and
+  finishes with ``PRAGMA optimize``. SQLite keeps no per-table modification
+  counters (``PRAGMA data_version`` only tells a connection that another one
+  wrote something), so churn there is the growth or shrinkage in rows since
+  the last ``ANALYZE``: inserts and deletes count, updates in place do not.
+* PostgreSQL reads dead and modified tuples from ``pg_stat_user_tables``, runs
+  ``VACUUM (ANALYZE)`` per table and ``REINDEX INDEX CONCURRENTLY`` only for
+  B-tree indexes that ``pgstatindex`` reports as bloated, so no exclusive
+  lock is taken on the whole database.
+* MySQL runs ``OPTIMIZE TABLE`` on fragmented tables and ``ANALYZE TABLE`` on
+  tables modified since their statistics were last collected.
+
+Every step is timed and returned in a ``MaintenanceReport``.
+"""
+
+import time
+from django.conf import settings
+from django.db import connection
+
+MAINTENANCE_CHURN_THRESHOLD = 0.1
+MAINTENANCE_BLOAT_THRESHOLD = 0.3
+
+# كثافة الأوراق في فهرس B-tree مبني حديثاً (معامل الملء الافتراضي)
+BTREE_FILL_DENSITY = 90.0
+
+
+class MaintenanceStep:
+    """عملية صيانة واحدة ومدتها"""
+
+    def __init__(self, operation, target, reason):
+        self.operation = operation
+        self.target = target
+        self.reason = reason
+        self.elapsed = 0.0
+
+    def __str__(self):
+        return f"{self.operation} {self.target} ({self.reason}): {self.elapsed:.2f}s"
+
+
+class MaintenanceReport:
+    """نتيجة تشغيل الصيانة"""
+
+    def __init__(self, vendor):
+        self.vendor = vendor
+        self.steps = []
+        self.elapsed = 0.0
+
+    def __str__(self):
+        steps = '; '.join(str(step) for step in self.steps) or 'nothing to do'
+        return f"{self.vendor}: {len(self.steps)} steps in {self.elapsed:.2f}s ({steps})"
+
+
+class BaseMaintenanceBackend:
+    """الواجهة المشتركة: تحديد الجداول التي تحتاج صيانة ثم تنفيذ الخطوات"""
+
+    def __init__(self, connection, churn_threshold=None, bloat_threshold=None):
+        self.connection = connection
+        self.churn_threshold = churn_threshold if churn_threshold is not None else getattr(
+            settings, 'MAINTENANCE_CHURN_THRESHOLD', MAINTENANCE_CHURN_THRESHOLD)
+        self.bloat_threshold = bloat_threshold if bloat_threshold is not None else getattr(
+            settings, 'MAINTENANCE_BLOAT_THRESHOLD', MAINTENANCE_BLOAT_THRESHOLD)
+
+    def tables(self):
+        """جداول النماذج المثبتة الموجودة فعلاً"""
+        return sorted(self.connection.introspection.django_table_names(only_existing=True))
+
+    def quote(self, name):
+        return self.connection.ops.quote_name(name)
+
+    def plan(self):
+        """قائمة (العملية، الهدف، السبب، جملة SQL) المطلوبة"""
+        return []
+
+    def execute(self, sql):
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql)
+
+    def run(self, dry_run=False, progress=None):
+        """تنفيذ الخطوات المطلوبة مع قياس مدة كل منها"""
+        if self.connection.in_atomic_block:
+            # VACUUM و REINDEX CONCURRENTLY لا يعملان داخل معاملة
+            raise RuntimeError('Database maintenance cannot run inside a transaction')
+        report = MaintenanceReport(self.connection.vendor)
+        started = time.monotonic()
+        for operation, target, reason, sql in self.plan():
+            step = MaintenanceStep(operation, target, reason)
+            if not dry_run:
+                step_started = time.monotonic()
+                self.execute(sql)
+                step.elapsed = time.monotonic() - step_started
+            report.steps.append(step)
+            if progress:
+                progress(step)
+        report.elapsed = time.monotonic() - started
+        return report
+
+
+class SQLiteMaintenanceBackend(BaseMaintenanceBackend):
+    """
+    التغيير في SQLite هو فرق عدد الصفوف عن آخر ANALYZE
+
+    العد يتوقف بعد تجاوز الحد فلا يقرأ الجدول الذي نما كثيراً كاملاً، والجدول
+    الذي لم يُحلل قط يكفي فيه وجود صف واحد.
+    """
+
+    def plan(self):
+        steps = []
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            analyzed = {}
+            if cursor.fetchone():
+                # أول رقم في stat هو عدد الصفوف وقت آخر ANALYZE
+                cursor.execute('SELECT tbl, stat FROM sqlite_stat1')
+                for table, stat in cursor.fetchall():
+                    analyzed.setdefault(table, int(stat.split()[0]))
+
+            for table in self.tables():
+                if table not in analyzed:
+                    cursor.execute(f'SELECT 1 FROM {self.quote(table)} LIMIT 1')
+                    if cursor.fetchone():
+                        steps.append(('ANALYZE', table, 'never analyzed', f'ANALYZE {self.quote(table)}'))
+                    continue
+                limit = int(max(analyzed[table], 1) * (1 + self.churn_threshold)) + 1
+                cursor.execute(f'SELECT COUNT(*) FROM (SELECT 1 FROM {self.quote(table)} LIMIT {limit})')
+                rows = cursor.fetchone()[0]
+                churn = abs(rows - analyzed[table]) / max(analyzed[table], 1)
+                if churn > self.churn_threshold:
+                    reason = f'churn {churn:.0%}' if rows < limit else f'churn over {churn:.0%}'
+                    steps.append(('ANALYZE', table, reason, f'ANALYZE {self.quote(table)}'))
+
+            cursor.execute('PRAGMA page_count')
+            pages = cursor.fetchone()[0]
+            cursor.execute('PRAGMA freelist_count')
+            free = cursor.fetchone()[0]
+        if pages and free / pages > self.bloat_threshold:
+            steps.append(('VACUUM', 'database', f'{free / pages:.0%} free pages', 'VACUUM'))
+        steps.append(('PRAGMA optimize', 'database', 'query planner statistics', 'PRAGMA optimize'))
+        return steps
+
+
+class PostgreSQLMaintenanceBackend(BaseMaintenanceBackend):
+
+    def plan(self):
+        tables = self.tables()
+        steps = []
+        churned = []
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT relname, n_live_tup, n_dead_tup, n_mod_since_analyze '
+                'FROM pg_stat_user_tables WHERE relname = ANY(%s) ORDER BY relname',
+                [tables]
+            )
+            for table, live, dead, modified in cursor.fetchall():
+                churn = (dead + modified) / max(live, 1)
+                if churn > self.churn_threshold:
+                    churned.append(table)
+                    steps.append((
+                        'VACUUM ANALYZE', table, f'churn {churn:.0%}', f'VACUUM (ANALYZE) {self.quote(table)}'
+                    ))
+
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pgstattuple'")
+            if not churned or not cursor.fetchone():
+                return steps
+            # قياس الانتفاخ يقرأ الفهرس كاملاً فيقتصر على جداول التغيير الكثير
+            cursor.execute(
+                'SELECT index_class.relname FROM pg_index '
+                'JOIN pg_class index_class ON index_class.oid = pg_index.indexrelid '
+                'JOIN pg_class table_class ON table_class.oid = pg_index.indrelid '
+                'JOIN pg_am ON pg_am.oid = index_class.relam '
+                "WHERE table_class.relname = ANY(%s) AND pg_am.amname = 'btree' ORDER BY index_class.relname",
+                [churned]
+            )
+            for (index,) in cursor.fetchall():
+                cursor.execute('SELECT avg_leaf_density FROM pgstatindex(%s::regclass)', [self.quote(index)])
+                density = cursor.fetchone()[0]
+                if density != density or not density:
+                    # فهرس فارغ
+                    continue
+                bloat = max(0.0, 1 - density / BTREE_FILL_DENSITY)
+                if bloat > self.bloat_threshold:
+                    steps.append((
+                        'REINDEX CONCURRENTLY', index, f'bloat {bloat:.0%}',
+                        f'REINDEX INDEX CONCURRENTLY {self.quote(index)}'
+                    ))
+        return steps
+
+
+class MySQLMaintenanceBackend(BaseMaintenanceBackend):
+
+    def plan(self):
+        steps = []
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT tables.TABLE_NAME, tables.DATA_LENGTH + tables.INDEX_LENGTH, tables.DATA_FREE, '
+                'tables.UPDATE_TIME, stats.last_update '
+                'FROM information_schema.TABLES tables '
+                'LEFT JOIN mysql.innodb_table_stats stats '
+                'ON stats.database_name = tables.TABLE_SCHEMA AND stats.table_name = tables.TABLE_NAME '
+                'WHERE tables.TABLE_SCHEMA = DATABASE() ORDER BY tables.TABLE_NAME'
+            )
+            rows = cursor.fetchall()
+        tables = set(self.tables())
+        for table, size, free, updated, analyzed in rows:
+            if table not in tables:
+                continue
+            fragmentation = (free or 0) / size if size else 0
+            if fragmentation > self.bloat_threshold:
+                # OPTIMIZE يعيد بناء جدول InnoDB ويحدث إحصائياته أيضاً
+                steps.append((
+                    'OPTIMIZE TABLE', table, f'{fragmentation:.0%} free space', f'OPTIMIZE TABLE {self.quote(table)}'
+                ))
+            elif updated and (analyzed is None or updated > analyzed):
+                steps.append(('ANALYZE TABLE', table, 'modified since analyze', f'ANALYZE TABLE {self.quote(table)}'))
+        return steps
+
+    def execute(self, sql):
+        # OPTIMIZE و ANALYZE يعيدان صفوف حالة يجب قراءتها
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql)
+            cursor.fetchall()
+
+
+_BACKENDS = {
+    'sqlite': SQLiteMaintenanceBackend,
+    'postgresql': PostgreSQLMaintenanceBackend,
+    'mysql': MySQLMaintenanceBackend,
+}
+
+
+def get_maintenance_backend(using=None, **kwargs):
+    """محرك الصيانة المناسب لقاعدة البيانات الحالية"""
+    conn = using or connection
+    backend_class = _BACKENDS.get(conn.vendor, BaseMaintenanceBackend)
+    return backend_class(conn, **kwargs)
+
+
+def optimize(dry_run=False, progress=None, using=None, **kwargs):
+    """تشغيل الصيانة وإرجاع MaintenanceReport"""
+    return get_maintenance_backend(using, **kwargs).run(dry_run=dry_run, progress=progress)
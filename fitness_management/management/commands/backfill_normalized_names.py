@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from fitness_management.arabic import normalize_arabic
+from fitness_management.models import Institute, Student
+from fitness_management.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'ملء حقول الأسماء الموحدة للطلاب والمعاهد على دفعات'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='عدد السجلات في كل دفعة')
+        parser.add_argument('--skip-search-index', action='store_true', help='عدم إعادة بناء فهرس البحث')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for model in (Institute, Student):
+            updated = self.backfill(model, batch_size)
+            self.stdout.write(f'{model._meta.verbose_name_plural}: تم تحديث {updated} سجل')
+
+        if not options['skip_search_index']:
+            total = get_search_backend().rebuild()
+            self.stdout.write(f'تمت إعادة فهرسة {total} طالب')
+
+        self.stdout.write(self.style.SUCCESS('تم ملء الأسماء الموحدة بنجاح'))
+
+    def backfill(self, model, batch_size):
+        """تحديث السجلات التي تختلف قيمتها الموحدة على دفعات مرتبة بالمعرف"""
+        updated = 0
+        last_pk = 0
+        while True:
+            rows = list(
+                model.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', 'name', 'name_normalized')[:batch_size]
+            )
+            if not rows:
+                break
+            changed = [
+                model(pk=pk, name_normalized=normalize_arabic(name))
+                for pk, name, current in rows
+                if normalize_arabic(name) != current
+            ]
+            if changed:
+                with transaction.atomic():
+                    model.objects.bulk_update(changed, ['name_normalized'])
+                updated += len(changed)
+            last_pk = rows[-1][0]
+        return updated
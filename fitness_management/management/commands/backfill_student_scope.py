@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, OuterRef, Subquery
+from fitness_management.models import Institute, Student, StudentTest
+
+
+class Command(BaseCommand):
+    help = 'ملء حقول الإدارة والمنطقة المخزنة مع الطلاب واختباراتهم على دفعات'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help='عدد المعرفات في كل دفعة')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+
+        institutes = Institute.objects.filter(pk=OuterRef('institute_id'))
+        students = self.backfill(Student, chunk_size, {
+            'department_id': Subquery(institutes.values('department_id')[:1]),
+            'region_id': Subquery(institutes.values('department__region_id')[:1]),
+        })
+        self.stdout.write(f'الطلاب: تم تحديث {students} سجل')
+
+        owners = Student.objects.filter(pk=OuterRef('student_id'))
+        tests = self.backfill(StudentTest, chunk_size, {
+            'department_id': Subquery(owners.values('department_id')[:1]),
+            'region_id': Subquery(owners.values('region_id')[:1]),
+        })
+        self.stdout.write(f'اختبارات الطلاب: تم تحديث {tests} سجل')
+
+        self.stdout.write(self.style.SUCCESS('تم ملء حقول النطاق بنجاح'))
+
+    def backfill(self, model, chunk_size, values):
+        """تحديث نطاقات متتالية من المعرفات كل منها في معاملة قصيرة"""
+        max_pk = model.objects.aggregate(max_pk=Max('pk'))['max_pk'] or 0
+        updated = 0
+        for start in range(0, max_pk + 1, chunk_size):
+            with transaction.atomic():
+                updated += model.objects.filter(
+                    pk__gte=start, pk__lt=start + chunk_size
+                ).update(**values)
+        return updated
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from fitness_management.backups import BACKUP_CHUNK_SIZE, COMPRESSION_EXTENSIONS, BackupEngine, BackupError
+
+
+class Command(BaseCommand):
+    help = 'إنشاء نسخة احتياطية مضغوطة لقاعدة البيانات مع بيان بعدد الصفوف والبصمات'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=['auto', 'full', 'incremental'], default='full', help='نوع النسخة')
+        parser.add_argument('--output', help='مجلد النسخ الاحتياطية (الافتراضي BACKUP_DIR)')
+        parser.add_argument('--compression', choices=sorted(COMPRESSION_EXTENSIONS), help='نوع الضغط')
+        parser.add_argument('--engine', choices=['auto', 'json', 'pg_dump'], help='طريقة النسخ')
+        parser.add_argument('--chunk-size', type=int, default=BACKUP_CHUNK_SIZE, help='عدد الصفوف في كل دفعة قراءة')
+
+    def handle(self, *args, **options):
+        try:
+            engine = BackupEngine(
+                options['output'],
+                compression=options['compression'],
+                engine=options['engine'],
+                chunk_size=options['chunk_size'],
+            )
+        except BackupError as e:
+            raise CommandError(str(e))
+
+        def progress(label, rows):
+            self.stdout.write(f'  {label}: {rows}')
+
+        try:
+            path, manifest = engine.run(kind=options['kind'], progress=progress)
+        except BackupError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"تم إنشاء النسخة {path} ({manifest['kind']}): {manifest['total_rows']} صف، "
+            f"{manifest['total_bytes']} بايت في {manifest['duration']:.2f} ثانية ({manifest['engine']}, {manifest['compression']})"
+        ))
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    override_settings, setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+from fitness_management.query_budget import (
+    DEFAULT_MAX_QUERIES, DEFAULT_MAX_SQL_TIME, TEST_CACHES, budget_urls, create_users, measure, sample_kwargs,
+    seed_hierarchy, worst_offenders,
+)
+
+
+class Command(BaseCommand):
+    help = 'طلب كل صفحات التطبيق بكل أنواع الحسابات على قاعدة اختبار وفحص عدد الاستعلامات ووقتها'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--regions', type=int, default=3, help='عدد المناطق')
+        parser.add_argument('--departments', type=int, default=3, help='عدد الإدارات في كل منطقة')
+        parser.add_argument('--institutes', type=int, default=3, help='عدد المعاهد في كل إدارة')
+        parser.add_argument('--students', type=int, default=20, help='عدد الطلاب في كل معهد')
+        parser.add_argument('--max-queries', type=int, default=DEFAULT_MAX_QUERIES, help='أقصى عدد استعلامات للصفحة')
+        parser.add_argument('--max-sql-time', type=float, default=DEFAULT_MAX_SQL_TIME, help='أقصى وقت SQL للصفحة بالثواني')
+        parser.add_argument('--top', type=int, default=10, help='عدد الصفحات في تقرير الأسوأ')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            with override_settings(CACHES=TEST_CACHES):
+                seed_hierarchy(options['regions'], options['departments'], options['institutes'], options['students'])
+                users = create_users()
+                urls = budget_urls(sample_kwargs())
+
+                def progress(result):
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f'  {result}')
+
+                results = measure(users, urls, options['max_queries'], options['max_sql_time'], progress=progress)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write('Worst offenders:')
+        for rank, result in enumerate(worst_offenders(results, options['top']), 1):
+            self.stdout.write(f'  {rank:2d}. {result}')
+
+        errors = [result for result in results if result.status >= 500]
+        over = [result for result in results if result.over_budget]
+        for result in errors:
+            self.stdout.write(self.style.ERROR(f'  ERROR {result}'))
+        for result in over:
+            self.stdout.write(self.style.ERROR(f'  OVER  {result}'))
+        if errors or over:
+            raise CommandError(f'{len(over)} views over budget, {len(errors)} server errors out of {len(results)} requests')
+        self.stdout.write(self.style.SUCCESS(f'{len(results)} requests within budget'))
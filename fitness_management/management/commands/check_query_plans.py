@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from fitness_management.query_plans import check_plans
+
+
+class Command(BaseCommand):
+    help = 'فحص خطط تنفيذ استعلامات الصفحات الرئيسية والفشل إذا قرأ أحدها جدولاً كاملاً أو لم يستخدم فهرسه'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='ملف لحفظ خطط التنفيذ')
+
+    def handle(self, *args, **options):
+        results = check_plans()
+        if not results:
+            raise CommandError('No students in the database; seed data first')
+
+        failures = []
+        output = []
+        for label, plan, problems in results:
+            output.append(f'== {label}\n{plan}\n')
+            if problems:
+                failures.append(f"{label}: {', '.join(problems)}")
+                self.stdout.write(self.style.ERROR(f'  FAIL {label}: {", ".join(problems)}'))
+            else:
+                self.stdout.write(f'  ok   {label}')
+            if options['verbosity'] > 1:
+                self.stdout.write(plan)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write('\n'.join(output))
+
+        if failures:
+            raise CommandError(f'{len(failures)} queries fall back to a full scan or miss their index: ' + '; '.join(failures))
+        self.stdout.write(self.style.SUCCESS(f'{len(results)} query plans use indexes'))
@@ -0,0 +1,37 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from fitness_management.cleanup import CLEANUP_BATCH_SIZE, archive_event, archive_news, purge
+from fitness_management.models import Event, News
+
+
+class Command(BaseCommand):
+    help = 'حذف الأخبار القديمة والفعاليات المنتهية على دفعات مع أرشفتها وحذف صورها'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=365, help='عمر الأخبار التي تُحذف بالأيام')
+        parser.add_argument('--batch-size', type=int, default=CLEANUP_BATCH_SIZE, help='عدد الصفوف في كل دفعة حذف')
+        parser.add_argument('--pause', type=float, help='ثوان انتظار بين الدفعات')
+        parser.add_argument('--no-archive', action='store_true', help='الحذف دون نسخ الصفوف لجداول الأرشيف')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        archive = not options['no_archive']
+
+        def progress(result):
+            self.stdout.write(f'  {result}')
+
+        jobs = [
+            (News.objects.filter(created_at__lt=now - timedelta(days=options['days'])), archive_news),
+            (Event.objects.filter(end_date__lt=now), archive_event),
+        ]
+        for queryset, archive_row in jobs:
+            result = purge(
+                queryset,
+                archive=archive_row if archive else None,
+                file_fields=['image'],
+                batch_size=options['batch_size'],
+                pause=options['pause'],
+                progress=progress,
+            )
+            self.stdout.write(self.style.SUCCESS(str(result)))
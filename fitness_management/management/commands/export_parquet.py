@@ -0,0 +1,29 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from fitness_management.analytics import ANALYTICS_BATCH_SIZE, ParquetExporter, ParquetUnavailable
+
+
+class Command(BaseCommand):
+    help = 'تصدير نتائج الاختبارات بصيغة Parquet مقسمة حسب العام الدراسي والمنطقة'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='مجلد مجموعة البيانات (الافتراضي BACKUP_DIR/analytics)')
+        parser.add_argument('--batch-size', type=int, default=ANALYTICS_BATCH_SIZE, help='عدد الصفوف في كل دفعة')
+        parser.add_argument('--full', action='store_true', help='حذف مجموعة البيانات وإعادة تصديرها بالكامل')
+
+    def handle(self, *args, **options):
+        try:
+            exporter = ParquetExporter(options['output'], batch_size=options['batch_size'])
+        except ParquetUnavailable as e:
+            raise CommandError(str(e))
+
+        started = time.monotonic()
+
+        def progress(done):
+            self.stdout.write(f'  {done} صف...')
+
+        exported, last_id = exporter.run(full=options['full'], progress=progress)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'تم تصدير {exported} نتيجة حتى المعرف {last_id} إلى {exporter.output_dir} في {elapsed:.2f} ثانية'
+        ))
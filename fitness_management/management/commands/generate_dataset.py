@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from fitness_management.synthetic import GENERATE_BATCH_SIZE, generate
+
+
+class Command(BaseCommand):
+    help = 'إنشاء بيانات تجريبية بحجم قومي لقياس الأداء (مناطق وإدارات ومعاهد وطلاب ونتائج)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--regions', type=int, default=27, help='عدد المناطق')
+        parser.add_argument('--departments', type=int, default=300, help='عدد الإدارات')
+        parser.add_argument('--institutes', type=int, default=10000, help='عدد المعاهد')
+        parser.add_argument('--students', type=int, default=3000000, help='عدد الطلاب')
+        parser.add_argument('--results', type=int, default=20000000, help='عدد نتائج الاختبارات المستهدف')
+        parser.add_argument('--workers', type=int, help='عدد العمليات المتوازية للإدخال')
+        parser.add_argument('--batch-size', type=int, default=GENERATE_BATCH_SIZE, help='عدد الطلاب في كل دفعة إدخال')
+        parser.add_argument('--seed', type=int, default=0, help='بذرة الأرقام العشوائية لتكرار نفس البيانات')
+        parser.add_argument('--keep-indexes', action='store_true', help='عدم حذف الفهارس الثانوية أثناء الإدخال')
+
+    def handle(self, *args, **options):
+        def progress(index, students, results, elapsed):
+            self.stdout.write(f'  job {index}: {students} students, {results} results in {elapsed:.1f}s')
+
+        try:
+            summary = generate(
+                regions=options['regions'],
+                departments=options['departments'],
+                institutes=options['institutes'],
+                students=options['students'],
+                results=options['results'],
+                workers=options['workers'],
+                batch_size=options['batch_size'],
+                seed=options['seed'],
+                defer_indexes=not options['keep_indexes'],
+                progress=progress,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(f'تم إنشاء البيانات: {summary}'))
+        self.stdout.write('البيانات أُدخلت دون سجل التغييرات، لذلك ستكون النسخة الاحتياطية التالية كاملة.')
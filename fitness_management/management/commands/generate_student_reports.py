@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from fitness_management.report_cards import REPORT_CHUNK_SIZE, generate_reports
+
+
+class Command(BaseCommand):
+    help = 'إنشاء تقارير الطلاب لنطاق كامل في أرشيف مضغوط لكل معهد'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--region', type=int, help='معرف المنطقة')
+        parser.add_argument('--department', type=int, help='معرف الإدارة')
+        parser.add_argument('--institute', type=int, help='معرف المعهد')
+        parser.add_argument('--academic-year', type=int, help='معرف العام الدراسي')
+        parser.add_argument('--output', help='مجلد الأرشيفات (الافتراضي BACKUP_DIR/reports)')
+        parser.add_argument('--workers', type=int, help='عدد العمليات التي تكتب الأرشيفات')
+        parser.add_argument('--chunk-size', type=int, default=REPORT_CHUNK_SIZE, help='عدد الصفوف في كل دفعة قراءة')
+
+    def handle(self, *args, **options):
+        spec = {
+            key: options[key]
+            for key in ('region', 'department', 'institute', 'academic_year')
+            if options[key] is not None
+        }
+
+        def progress(institute_id, students, tests):
+            self.stdout.write(f'  institute {institute_id}: {students} students, {tests} tests')
+
+        summary = generate_reports(
+            spec,
+            output_dir=options['output'],
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+            progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"تم إنشاء {len(summary['archives'])} أرشيف في {summary['path']}: "
+            f"{summary['students']} طالب، {summary['tests']} نتيجة"
+        ))
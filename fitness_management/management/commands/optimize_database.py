@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from fitness_management.maintenance import get_maintenance_backend
+
+
+class Command(BaseCommand):
+    help = 'صيانة قاعدة البيانات حسب نوعها للجداول التي تجاوز تغييرها الحد فقط'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--churn-threshold', type=float, help='نسبة الصفوف المتغيرة قبل تحليل الجدول')
+        parser.add_argument('--bloat-threshold', type=float, help='نسبة المساحة الفارغة أو انتفاخ الفهرس قبل إعادة البناء')
+        parser.add_argument('--dry-run', action='store_true', help='عرض الخطوات دون تنفيذها')
+
+    def handle(self, *args, **options):
+        backend = get_maintenance_backend(
+            churn_threshold=options['churn_threshold'],
+            bloat_threshold=options['bloat_threshold'],
+        )
+
+        def progress(step):
+            self.stdout.write(f'  {step}')
+
+        report = backend.run(dry_run=options['dry_run'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(
+            f'{report.vendor}: {len(report.steps)} خطوة في {report.elapsed:.2f} ثانية'
+        ))
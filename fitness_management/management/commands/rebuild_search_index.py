@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from fitness_management.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'إعادة بناء فهرس البحث النصي للطلاب'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        if not backend.available:
+            self.stdout.write(self.style.WARNING('فهرس البحث غير متاح لقاعدة البيانات الحالية'))
+            return
+        total = backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'تمت فهرسة {total} طالب'))
@@ -0,0 +1,16 @@
+import time
+from django.core.management.base import BaseCommand
+from fitness_management import rollups
+
+
+class Command(BaseCommand):
+    help = 'إعادة بناء جدول الإحصائيات المجمعة من بيانات الطلاب ونتائج الاختبارات'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=rollups.REBUILD_BATCH_SIZE, help='عدد الصفوف في كل دفعة إدخال')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        total = rollups.rebuild(batch_size=options['batch_size'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f'تمت إعادة بناء {total} مجموعة في {elapsed:.2f} ثانية'))
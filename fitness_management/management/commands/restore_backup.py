@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from fitness_management.backups import BackupError
+from fitness_management.restore import RESTORE_BATCH_SIZE, Restorer
+
+
+class Command(BaseCommand):
+    help = 'استعادة نسخة احتياطية (مع سلسلة النسخ التزايدية السابقة لها) والتحقق من عدد الصفوف والبصمات'
+
+    def add_arguments(self, parser):
+        parser.add_argument('backup', help='اسم النسخة داخل BACKUP_DIR أو مسار مجلدها')
+        parser.add_argument('--workers', type=int, help='عدد العمليات المتوازية لتحميل الجداول')
+        parser.add_argument('--batch-size', type=int, default=RESTORE_BATCH_SIZE, help='عدد الصفوف في كل دفعة إدخال')
+        parser.add_argument('--flush', action='store_true', help='حذف البيانات الحالية قبل الاستعادة')
+        parser.add_argument('--keep-indexes', action='store_true', help='عدم حذف الفهارس الثانوية أثناء التحميل')
+        parser.add_argument('--skip-migration-check', action='store_true', help='الاستعادة حتى لو اختلفت الترحيلات المطبقة')
+        parser.add_argument('--verify-only', action='store_true', help='التحقق من البصمات فقط دون استعادة')
+
+    def handle(self, *args, **options):
+        try:
+            restorer = Restorer(
+                options['backup'],
+                workers=options['workers'],
+                batch_size=options['batch_size'],
+                flush=options['flush'],
+                defer_indexes=not options['keep_indexes'],
+                check_migrations=not options['skip_migration_check'],
+            )
+            if options['verify_only']:
+                restorer.verify()
+                self.stdout.write(self.style.SUCCESS(
+                    f'النسخة سليمة: {" ← ".join(manifest["name"] for manifest in restorer.manifests)}'
+                ))
+                return
+
+            def progress(label, rows, elapsed):
+                timing = f' في {elapsed:.2f} ثانية' if elapsed is not None else ''
+                self.stdout.write(f'  {label}: {rows}{timing}')
+
+            summary = restorer.run(progress=progress)
+        except BackupError as e:
+            raise CommandError(str(e))
+
+        total = sum(summary['models'].values())
+        self.stdout.write(self.style.SUCCESS(
+            f"تمت استعادة {total} صف من {len(summary['backups'])} نسخة في {summary['duration']:.2f} ثانية"
+        ))
+        self.stdout.write('يُنصح بإنشاء نسخة كاملة جديدة بعد الاستعادة.')
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import UserProfile
+from fitness_management.models import Notification
+from fitness_management.notifications import NOTIFICATION_BATCH_SIZE, create_notification, deliver, profile_recipients
+
+
+class Command(BaseCommand):
+    help = 'إرسال إشعار بريدي مخصص لكل مستلم على اتصال واحد مع تسجيل حالة كل إرسال'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subject', help='قالب الموضوع (يقبل {{ name }} و {{ email }})')
+        parser.add_argument('--message', help='قالب نص الرسالة')
+        parser.add_argument('--message-file', help='ملف يحتوي قالب نص الرسالة')
+        parser.add_argument('--email', action='append', default=[], help='بريد مستلم (يمكن تكراره)')
+        parser.add_argument(
+            '--user-type', action='append', default=[], choices=[value for value, _ in UserProfile.USER_TYPES],
+            help='إرسال لكل حسابات هذا النوع (يمكن تكراره)',
+        )
+        parser.add_argument('--retry', type=int, help='إعادة الإرسال لمن فشل في إشعار سابق بدلاً من إنشاء إشعار')
+        parser.add_argument('--batch-size', type=int, default=NOTIFICATION_BATCH_SIZE, help='عدد الرسائل قبل تحديث الحالات')
+        parser.add_argument('--rate', type=float, help='أقصى عدد رسائل في الثانية')
+
+    def handle(self, *args, **options):
+        if options['retry']:
+            try:
+                notification = Notification.objects.get(id=options['retry'])
+            except Notification.DoesNotExist:
+                raise CommandError(f"Notification {options['retry']} not found")
+        else:
+            message = options['message']
+            if options['message_file']:
+                with open(options['message_file'], encoding='utf-8') as f:
+                    message = f.read()
+            if not options['subject'] or not message:
+                raise CommandError('--subject and --message (or --message-file) are required')
+            recipients = list(options['email'])
+            if options['user_type']:
+                recipients += profile_recipients(options['user_type'])
+            if not recipients:
+                raise CommandError('No recipients: use --email or --user-type')
+            notification = create_notification(options['subject'], message, recipients)
+
+        def progress(result):
+            self.stdout.write(f'  {result}')
+
+        result = deliver(
+            notification,
+            batch_size=options['batch_size'],
+            rate=options['rate'],
+            retry_failed=bool(options['retry']),
+            progress=progress,
+        )
+        if result.failed:
+            self.stdout.write(self.style.WARNING(
+                f'Notification {notification.id}: {result} (use --retry {notification.id} to resend)'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Notification {notification.id}: {result}'))
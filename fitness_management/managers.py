@@ -0,0 +1,131 @@
+"""
+QuerySets that restrict rows to the scope of a user profile.
+"""
+
+from django.apps import apps
+from django.db import models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model_name, field):
+    """عدد صفوف النموذج المرتبطة بالصف الحالي في استعلام فرعي بدلاً من استعلام لكل صف"""
+    rows = (
+        apps.get_model('fitness_management', model_name).objects
+        .filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(rows), 0)
+
+
+class ScopedQuerySet(models.QuerySet):
+    """
+    تصفية السجلات حسب نطاق صلاحيات المستخدم
+
+    لكل نوع مستخدم حقل التصفية في هذا الجدول واسم المعرف المقابل في
+    ملف المستخدم، بحيث تُبنى التصفية من المعرفات المخزنة دون تحميل
+    المنطقة أو الإدارة أو المعهد المرتبط بالمستخدم.
+    """
+
+    scope_lookups = {}
+    scope_related = ()
+
+    def for_profile(self, user_profile):
+        """السجلات المتاحة للمستخدم حسب صلاحياته"""
+        queryset = self.select_related(*self.scope_related) if self.scope_related else self.all()
+        if user_profile is None:
+            return queryset.none()
+        if user_profile.user_type == 'super_admin':
+            return queryset
+        lookup = self.scope_lookups.get(user_profile.user_type)
+        if lookup is None:
+            return queryset.none()
+        field, profile_attr = lookup
+        value = getattr(user_profile, profile_attr)
+        if value is None:
+            return queryset.none()
+        return queryset.filter(**{field: value})
+
+
+class RegionQuerySet(ScopedQuerySet):
+    scope_lookups = {
+        'region_admin': ('id', 'region_id'),
+        'department_admin': ('department__id', 'department_id'),
+        'institute_admin': ('department__institute__id', 'institute_id'),
+    }
+
+    def with_counts(self):
+        """إضافة عدد الإدارات والمعاهد والطلاب لكل منطقة"""
+        return self.annotate(
+            department_count=count_subquery('Department', 'region'),
+            institute_count=count_subquery('Institute', 'department__region'),
+            student_count=count_subquery('Student', 'region'),
+        )
+
+
+class DepartmentQuerySet(ScopedQuerySet):
+    scope_lookups = {
+        'region_admin': ('region_id', 'region_id'),
+        'department_admin': ('id', 'department_id'),
+        'institute_admin': ('institute__id', 'institute_id'),
+    }
+    scope_related = ('region',)
+
+    def with_counts(self):
+        """إضافة عدد المعاهد والطلاب لكل إدارة"""
+        return self.annotate(
+            institute_count=count_subquery('Institute', 'department'),
+            student_count=count_subquery('Student', 'department'),
+        )
+
+
+class InstituteQuerySet(ScopedQuerySet):
+    scope_lookups = {
+        'region_admin': ('department__region_id', 'region_id'),
+        'department_admin': ('department_id', 'department_id'),
+        'institute_admin': ('id', 'institute_id'),
+    }
+    scope_related = ('department__region',)
+
+    def with_counts(self):
+        """إضافة عدد الطلاب لكل معهد"""
+        return self.annotate(student_count=count_subquery('Student', 'institute'))
+
+
+class StudentQuerySet(ScopedQuerySet):
+    scope_lookups = {
+        'region_admin': ('region_id', 'region_id'),
+        'department_admin': ('department_id', 'department_id'),
+        'institute_admin': ('institute_id', 'institute_id'),
+    }
+
+    # الحقول المعروضة في قوائم الطلاب
+    listing_fields = (
+        'id', 'name', 'name_normalized', 'national_id', 'gender', 'education_level', 'grade',
+        'personal_photo', 'created_at', 'institute_id', 'department_id', 'region_id',
+        'institute__id', 'institute__name',
+    )
+
+    def for_listing(self):
+        """تحميل الطلاب مع معاهدهم بالحقول اللازمة للعرض فقط"""
+        return self.select_related('institute').only(*self.listing_fields)
+
+
+class StatisticsRollupQuerySet(ScopedQuerySet):
+    scope_lookups = {
+        'region_admin': ('region_id', 'region_id'),
+        'department_admin': ('department_id', 'department_id'),
+        'institute_admin': ('institute_id', 'institute_id'),
+    }
+
+
+class StudentTestQuerySet(ScopedQuerySet):
+    scope_lookups = {
+        'region_admin': ('region_id', 'region_id'),
+        'department_admin': ('department_id', 'department_id'),
+        'institute_admin': ('student__institute_id', 'institute_id'),
+    }
+    scope_related = ('student', 'test')
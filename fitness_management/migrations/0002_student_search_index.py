@@ -0,0 +1,58 @@
+from django.db import migrations
+
+
+SEARCH_TABLE = 'fitness_management_student_search'
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5('
+            f"name, national_id, institute_name, tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, name, national_id, institute_name) '
+            f'SELECT s.id, s.name, s.national_id, i.name '
+            f'FROM fitness_management_student s '
+            f'JOIN fitness_management_institute i ON i.id = s.institute_id'
+        )
+    elif connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute(
+            f'CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ('
+            f'student_id bigint PRIMARY KEY, '
+            f'document text NOT NULL, '
+            f'vector tsvector NOT NULL)'
+        )
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {SEARCH_TABLE}_trgm '
+            f'ON {SEARCH_TABLE} USING gin (document gin_trgm_ops)'
+        )
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {SEARCH_TABLE}_vector '
+            f'ON {SEARCH_TABLE} USING gin (vector)'
+        )
+        schema_editor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (student_id, document, vector) '
+            f"SELECT s.id, concat_ws(' ', s.name, s.national_id, i.name), "
+            f"to_tsvector('simple', concat_ws(' ', s.name, s.national_id, i.name)) "
+            f'FROM fitness_management_student s '
+            f'JOIN fitness_management_institute i ON i.id = s.institute_id'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fitness_management', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:43
+
+from django.db import migrations, models
+from fitness_management.arabic import normalize_arabic
+
+
+SEARCH_TABLE = 'fitness_management_student_search'
+BATCH_SIZE = 2000
+
+
+def fill_normalized_names(apps, schema_editor):
+    for model_name in ('Institute', 'Student'):
+        model = apps.get_model('fitness_management', model_name)
+        last_pk = 0
+        while True:
+            batch = list(model.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', 'name')[:BATCH_SIZE])
+            if not batch:
+                break
+            for obj in batch:
+                obj.name_normalized = normalize_arabic(obj.name)
+            model.objects.bulk_update(batch, ['name_normalized'])
+            last_pk = batch[-1].pk
+
+    # إعادة بناء وثائق البحث بالأسماء الموحدة
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        schema_editor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        schema_editor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, name, national_id, institute_name) '
+            f'SELECT s.id, s.name_normalized, s.national_id, i.name_normalized '
+            f'FROM fitness_management_student s '
+            f'JOIN fitness_management_institute i ON i.id = s.institute_id'
+        )
+    elif connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f"UPDATE {SEARCH_TABLE} t SET "
+            f"document = concat_ws(' ', s.name_normalized, s.national_id, i.name_normalized), "
+            f"vector = to_tsvector('simple', concat_ws(' ', s.name_normalized, s.national_id, i.name_normalized)) "
+            f'FROM fitness_management_student s '
+            f'JOIN fitness_management_institute i ON i.id = s.institute_id '
+            f'WHERE t.student_id = s.id'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fitness_management', '0002_student_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='institute',
+            name='name_normalized',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='name_normalized',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(fill_normalized_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fitness_management', '0003_normalized_names'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['name_normalized', 'id'], name='student_name_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['created_at', 'id'], name='student_created_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:46
+
+from django.db import migrations, models, transaction
+import django.db.models.deletion
+from django.db.models import Max, OuterRef, Subquery
+
+
+CHUNK_SIZE = 5000
+
+
+def fill_scope_columns(apps, schema_editor):
+    Institute = apps.get_model('fitness_management', 'Institute')
+    Student = apps.get_model('fitness_management', 'Student')
+    StudentTest = apps.get_model('fitness_management', 'StudentTest')
+    using = schema_editor.connection.alias
+
+    institutes = Institute.objects.filter(pk=OuterRef('institute_id'))
+    fill_in_chunks(Student, using, {
+        'department_id': Subquery(institutes.values('department_id')[:1]),
+        'region_id': Subquery(institutes.values('department__region_id')[:1]),
+    })
+    students = Student.objects.filter(pk=OuterRef('student_id'))
+    fill_in_chunks(StudentTest, using, {
+        'department_id': Subquery(students.values('department_id')[:1]),
+        'region_id': Subquery(students.values('region_id')[:1]),
+    })
+
+
+def fill_in_chunks(model, using, values):
+    """تحديث نطاقات متتالية من المعرفات كل منها في معاملة قصيرة"""
+    manager = model.objects.using(using)
+    max_pk = manager.aggregate(max_pk=Max('pk'))['max_pk'] or 0
+    for start in range(0, max_pk + 1, CHUNK_SIZE):
+        with transaction.atomic(using=using):
+            manager.filter(pk__gte=start, pk__lt=start + CHUNK_SIZE).update(**values)
+
+
+class Migration(migrations.Migration):
+    # الملء على دفعات في معاملات قصيرة بدلاً من معاملة واحدة تحجز الجدولين طوال الترحيل
+    atomic = False
+
+    dependencies = [
+        ('fitness_management', '0004_student_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='department',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='fitness_management.department', verbose_name='الإدارة'),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='region',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='fitness_management.region', verbose_name='المنطقة'),
+        ),
+        migrations.AddField(
+            model_name='studenttest',
+            name='department',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='fitness_management.department', verbose_name='الإدارة'),
+        ),
+        migrations.AddField(
+            model_name='studenttest',
+            name='region',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='fitness_management.region', verbose_name='المنطقة'),
+        ),
+        migrations.RunPython(fill_scope_columns, migrations.RunPython.noop, atomic=False),
+    ]
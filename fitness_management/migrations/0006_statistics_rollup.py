@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+from fitness_management.rollups import rebuild
+
+
+def populate_rollup(apps, schema_editor):
+    rebuild(
+        apps.get_model('fitness_management', 'Student'),
+        apps.get_model('fitness_management', 'StudentTest'),
+        apps.get_model('fitness_management', 'StatisticsRollup'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fitness_management', '0005_student_scope_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatisticsRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gender', models.CharField(choices=[('male', 'بنين'), ('female', 'فتيات')], max_length=6, verbose_name='النوع')),
+                ('education_level', models.CharField(choices=[('primary', 'ابتدائي'), ('middle', 'إعدادي'), ('secondary', 'ثانوي')], max_length=10, verbose_name='المرحلة التعليمية')),
+                ('student_count', models.IntegerField(default=0, verbose_name='عدد الطلاب')),
+                ('test_count', models.IntegerField(default=0, verbose_name='عدد الاختبارات')),
+                ('score_sum', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='مجموع الدرجات')),
+                ('score_min', models.DecimalField(decimal_places=2, max_digits=5, null=True, verbose_name='أقل درجة')),
+                ('score_max', models.DecimalField(decimal_places=2, max_digits=5, null=True, verbose_name='أعلى درجة')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('academic_year', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='fitness_management.academicyear', verbose_name='العام الدراسي')),
+                ('department', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='fitness_management.department', verbose_name='الإدارة')),
+                ('institute', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='fitness_management.institute', verbose_name='المعهد')),
+                ('region', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='fitness_management.region', verbose_name='المنطقة')),
+            ],
+            options={
+                'verbose_name': 'إحصائية مجمعة',
+                'verbose_name_plural': 'الإحصائيات المجمعة',
+                'unique_together': {('academic_year', 'institute', 'gender', 'education_level')},
+            },
+        ),
+        migrations.RunPython(populate_rollup, migrations.RunPython.noop),
+    ]
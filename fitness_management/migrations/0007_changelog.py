@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fitness_management', '0006_statistics_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100, verbose_name='النموذج')),
+                ('object_id', models.BigIntegerField(verbose_name='معرف السجل')),
+                ('action', models.CharField(choices=[('save', 'حفظ'), ('delete', 'حذف')], max_length=6, verbose_name='العملية')),
+                ('changed_at', models.DateTimeField(auto_now_add=True, verbose_name='وقت التغيير')),
+            ],
+            options={
+                'verbose_name': 'سجل التغييرات',
+                'verbose_name_plural': 'سجل التغييرات',
+                'indexes': [models.Index(fields=['model', 'id'], name='changelog_model_id_idx')],
+            },
+        ),
+    ]
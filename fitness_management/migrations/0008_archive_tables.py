@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fitness_management', '0007_changelog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.BigIntegerField(unique=True, verbose_name='معرف الفعالية')),
+                ('title', models.CharField(max_length=200, verbose_name='العنوان')),
+                ('start_date', models.DateTimeField(verbose_name='تاريخ البداية')),
+                ('end_date', models.DateTimeField(verbose_name='تاريخ النهاية')),
+                ('location', models.CharField(max_length=200, verbose_name='الموقع')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الأرشفة')),
+            ],
+            options={
+                'verbose_name': 'فعالية مؤرشفة',
+                'verbose_name_plural': 'الفعاليات المؤرشفة',
+                'ordering': ['-end_date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedNews',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.BigIntegerField(unique=True, verbose_name='معرف الخبر')),
+                ('title', models.CharField(max_length=200, verbose_name='العنوان')),
+                ('content', models.TextField(verbose_name='المحتوى')),
+                ('created_at', models.DateTimeField(verbose_name='تاريخ النشر')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الأرشفة')),
+            ],
+            options={
+                'verbose_name': 'خبر مؤرشف',
+                'verbose_name_plural': 'الأخبار المؤرشفة',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fitness_management', '0008_archive_tables'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatisticsSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(verbose_name='الوقت')),
+                ('resolution', models.CharField(choices=[('hour', 'ساعة'), ('day', 'يوم'), ('week', 'أسبوع')], default='hour', max_length=5, verbose_name='الدقة')),
+                ('scope', models.CharField(choices=[('national', 'الجمهورية'), ('region', 'المنطقة'), ('department', 'الإدارة'), ('institute', 'المعهد')], max_length=10, verbose_name='النطاق')),
+                ('scope_id', models.IntegerField(default=0, verbose_name='معرف النطاق')),
+                ('student_count', models.IntegerField(default=0, verbose_name='عدد الطلاب')),
+                ('test_count', models.IntegerField(default=0, verbose_name='عدد الاختبارات')),
+                ('male_students', models.IntegerField(default=0, verbose_name='الطلاب البنين')),
+                ('female_students', models.IntegerField(default=0, verbose_name='الطالبات')),
+                ('primary_students', models.IntegerField(default=0, verbose_name='طلاب المرحلة الابتدائية')),
+                ('middle_students', models.IntegerField(default=0, verbose_name='طلاب المرحلة الإعدادية')),
+                ('secondary_students', models.IntegerField(default=0, verbose_name='طلاب المرحلة الثانوية')),
+                ('score_sum', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='مجموع الدرجات')),
+            ],
+            options={
+                'verbose_name': 'لقطة إحصائية',
+                'verbose_name_plural': 'اللقطات الإحصائية',
+                'indexes': [models.Index(fields=['scope', 'scope_id', 'timestamp'], name='snapshot_scope_time_idx')],
+                'unique_together': {('scope', 'scope_id', 'resolution', 'timestamp')},
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('fitness_management', '0009_statistics_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=200, verbose_name='الموضوع')),
+                ('message', models.TextField(verbose_name='نص الرسالة')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='أنشئ بواسطة')),
+            ],
+            options={
+                'verbose_name': 'إشعار',
+                'verbose_name_plural': 'الإشعارات',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='NotificationDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipient', models.EmailField(max_length=254, verbose_name='البريد الإلكتروني')),
+                ('name', models.CharField(blank=True, max_length=150, verbose_name='اسم المستلم')),
+                ('status', models.CharField(choices=[('pending', 'في الانتظار'), ('sent', 'تم الإرسال'), ('failed', 'فشل')], default='pending', max_length=10, verbose_name='الحالة')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='عدد المحاولات')),
+                ('error', models.TextField(blank=True, verbose_name='الخطأ')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='وقت الإرسال')),
+                ('notification', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='fitness_management.notification', verbose_name='الإشعار')),
+            ],
+            options={
+                'verbose_name': 'إرسال إشعار',
+                'verbose_name_plural': 'إرسالات الإشعارات',
+                'indexes': [models.Index(fields=['notification', 'status'], name='delivery_status_idx')],
+            },
+        ),
+    ]
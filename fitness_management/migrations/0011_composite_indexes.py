@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fitness_management', '0010_notifications'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['start_date'], name='event_active_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='news',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['-created_at'], name='news_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['institute', 'gender', 'education_level'], name='student_inst_gender_level_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studenttest',
+            index=models.Index(fields=['student', 'test_date'], name='studenttest_student_date_idx'),
+        ),
+    ]
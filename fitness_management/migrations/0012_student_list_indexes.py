@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fitness_management', '0011_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='student',
+            name='student_inst_gender_level_idx',
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['institute', 'gender', 'education_level', 'name_normalized', 'id'], name='student_inst_filter_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['department', 'name_normalized', 'id'], name='student_department_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['region', 'name_normalized', 'id'], name='student_region_name_idx'),
+        ),
+    ]
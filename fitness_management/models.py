@@ -1,6 +1,12 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import RegexValidator
 from django.contrib.auth.models import User
+from .arabic import normalize_arabic
+from .hierarchy import get_hierarchy
+from .managers import (
+    DepartmentQuerySet, InstituteQuerySet, RegionQuerySet, StatisticsRollupQuerySet, StudentQuerySet,
+    StudentTestQuerySet
+)
 
 class AcademicYear(models.Model):
     name = models.CharField(max_length=50, verbose_name="اسم العام الدراسي")
@@ -19,6 +25,8 @@ class Region(models.Model):
     name = models.CharField(max_length=100, verbose_name="اسم المنطقة")
     code = models.CharField(max_length=10, unique=True, verbose_name="رمز المنطقة")
     
+    objects = RegionQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "المنطقة"
         verbose_name_plural = "المناطق"
@@ -31,24 +39,79 @@ class Department(models.Model):
     region = models.ForeignKey(Region, on_delete=models.CASCADE, verbose_name="المنطقة")
     code = models.CharField(max_length=10, unique=True, verbose_name="رمز الإدارة")
     
+    objects = DepartmentQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "الإدارة"
         verbose_name_plural = "الإدارات"
     
     def __str__(self):
-        return f"{self.name} - {self.region.name}"
+        region_name = get_hierarchy().region_name(self.region_id) or self.region.name
+        return f"{self.name} - {region_name}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_region_id = instance.__dict__.get('region_id')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        moved = self.pk is not None and getattr(self, '_loaded_region_id', self.region_id) != self.region_id
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if moved:
+                # نقل الإدارة لمنطقة أخرى يتطلب تحديث المنطقة المخزنة مع الطلاب
+                students = Student.objects.filter(department_id=self.pk)
+                tests = StudentTest.objects.filter(department_id=self.pk)
+                ChangeLog.record_queryset(students)
+                ChangeLog.record_queryset(tests)
+                students.update(region_id=self.region_id)
+                tests.update(region_id=self.region_id)
+                StatisticsRollup.objects.filter(department_id=self.pk).update(region_id=self.region_id)
+        self._loaded_region_id = self.region_id
 
 class Institute(models.Model):
     name = models.CharField(max_length=100, verbose_name="اسم المعهد")
+    name_normalized = models.CharField(max_length=100, db_index=True, editable=False, blank=True, default='')
     department = models.ForeignKey(Department, on_delete=models.CASCADE, verbose_name="الإدارة")
     code = models.CharField(max_length=10, unique=True, verbose_name="رمز المعهد")
     
+    objects = InstituteQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "المعهد"
         verbose_name_plural = "المعاهد"
     
     def __str__(self):
-        return f"{self.name} - {self.department.name}"
+        department_name = get_hierarchy().department_name(self.department_id) or self.department.name
+        return f"{self.name} - {department_name}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_department_id = instance.__dict__.get('department_id')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        self.name_normalized = normalize_arabic(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'name_normalized'}
+        moved = self.pk is not None and getattr(self, '_loaded_department_id', self.department_id) != self.department_id
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if moved:
+                # نقل المعهد لإدارة أخرى يتطلب تحديث الإدارة والمنطقة المخزنة مع الطلاب
+                region_id = Department.objects.values_list('region_id', flat=True).get(pk=self.department_id)
+                scope = {'department_id': self.department_id, 'region_id': region_id}
+                students = Student.objects.filter(institute_id=self.pk)
+                tests = StudentTest.objects.filter(student__institute_id=self.pk)
+                ChangeLog.record_queryset(students)
+                ChangeLog.record_queryset(tests)
+                students.update(**scope)
+                tests.update(**scope)
+                StatisticsRollup.objects.filter(institute_id=self.pk).update(**scope)
+        self._loaded_department_id = self.department_id
 
 class Student(models.Model):
     GENDER_CHOICES = [
@@ -63,6 +126,7 @@ class Student(models.Model):
     ]
     
     name = models.CharField(max_length=100, verbose_name="اسم الطالب")
+    name_normalized = models.CharField(max_length=100, db_index=True, editable=False, blank=True, default='')
     national_id = models.CharField(max_length=14, unique=True, verbose_name="الرقم القومي")
     gender = models.CharField(max_length=6, choices=GENDER_CHOICES, verbose_name="النوع")
     education_level = models.CharField(max_length=10, choices=EDUCATION_LEVELS, verbose_name="المرحلة التعليمية")
@@ -70,6 +134,10 @@ class Student(models.Model):
     institute = models.ForeignKey(Institute, on_delete=models.CASCADE, verbose_name="المعهد")
     academic_year = models.ForeignKey(AcademicYear, on_delete=models.CASCADE, verbose_name="العام الدراسي")
     
+    # نسخة من إدارة ومنطقة المعهد لتصفية النطاق دون ربط الجداول
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, null=True, editable=False, verbose_name="الإدارة")
+    region = models.ForeignKey(Region, on_delete=models.CASCADE, null=True, editable=False, verbose_name="المنطقة")
+    
     # الصور
     personal_photo = models.ImageField(upload_to='students/photos/', verbose_name="الصورة الشخصية")
     birth_certificate = models.ImageField(upload_to='students/documents/', verbose_name="شهادة الميلاد/البطاقة")
@@ -84,20 +152,61 @@ class Student(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = StudentQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "الطالب"
         verbose_name_plural = "الطلاب"
+        indexes = [
+            models.Index(fields=['name_normalized', 'id'], name='student_name_keyset_idx'),
+            models.Index(fields=['created_at', 'id'], name='student_created_keyset_idx'),
+            # قوائم المعهد والإدارة والمنطقة مرتبة بالاسم دون فرز كل طلاب النطاق
+            models.Index(fields=['institute', 'gender', 'education_level', 'name_normalized', 'id'], name='student_inst_filter_name_idx'),
+            models.Index(fields=['department', 'name_normalized', 'id'], name='student_department_name_idx'),
+            models.Index(fields=['region', 'name_normalized', 'id'], name='student_region_name_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.name} - {self.institute.name}"
+        institute_name = get_hierarchy().institute_name(self.institute_id) or self.institute.name
+        return f"{self.name} - {institute_name}"
     
-    @property
-    def region(self):
-        return self.institute.department.region
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_institute_id = instance.__dict__.get('institute_id')
+        return instance
     
-    @property
-    def department(self):
-        return self.institute.department
+    def save(self, *args, **kwargs):
+        self.name_normalized = normalize_arabic(self.name)
+        loaded_institute_id = getattr(self, '_loaded_institute_id', None)
+        moved = loaded_institute_id != self.institute_id
+        if self.institute_id and (moved or self.region_id is None):
+            self.department_id, self.region_id = Institute.objects.values_list(
+                'department_id', 'department__region_id'
+            ).get(pk=self.institute_id)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if 'name' in update_fields:
+                update_fields.add('name_normalized')
+            if 'institute' in update_fields:
+                update_fields |= {'department', 'region'}
+            kwargs['update_fields'] = update_fields
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if moved and loaded_institute_id is not None:
+                # نقل الطالب لمعهد آخر يتطلب تحديث نطاق اختباراته
+                tests = StudentTest.objects.filter(student_id=self.pk)
+                ChangeLog.record_queryset(tests)
+                tests.update(department_id=self.department_id, region_id=self.region_id)
+        self._loaded_institute_id = self.institute_id
+    
+    def possible_duplicates(self):
+        """الطلاب المسجلون بنفس الاسم بعد التوحيد في نفس المعهد"""
+        return Student.objects.filter(
+            institute_id=self.institute_id,
+            name_normalized=normalize_arabic(self.name),
+        ).exclude(pk=self.pk)
 
 class Test(models.Model):
     name = models.CharField(max_length=100, verbose_name="اسم الاختبار")
@@ -120,13 +229,119 @@ class StudentTest(models.Model):
     notes = models.TextField(blank=True, verbose_name="ملاحظات")
     test_date = models.DateField(verbose_name="تاريخ الاختبار")
     
+    # نسخة من إدارة ومنطقة الطالب لتصفية النطاق دون ربط الجداول
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, null=True, editable=False, verbose_name="الإدارة")
+    region = models.ForeignKey(Region, on_delete=models.CASCADE, null=True, editable=False, verbose_name="المنطقة")
+    
+    objects = StudentTestQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "اختبار الطالب"
         verbose_name_plural = "اختبارات الطلاب"
         unique_together = ['student', 'test']
+        indexes = [
+            # نتائج الطالب مرتبة بالتاريخ في صفحة الطالب وتقاريره
+            models.Index(fields=['student', 'test_date'], name='studenttest_student_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.student.name} - {self.test.name} - {self.score}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_student_id = instance.__dict__.get('student_id')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        # النتيجة المنقولة لطالب آخر تأخذ إدارة ومنطقة الطالب الجديد
+        moved = getattr(self, '_loaded_student_id', None) != self.student_id
+        if self.student_id and (moved or self.region_id is None):
+            self.department_id, self.region_id = Student.objects.values_list(
+                'department_id', 'region_id'
+            ).get(pk=self.student_id)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'student' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'department', 'region'}
+        super().save(*args, **kwargs)
+        self._loaded_student_id = self.student_id
+
+class StatisticsRollup(models.Model):
+    """
+    إحصائيات مجمعة لكل عام دراسي ومعهد ونوع ومرحلة تعليمية
+
+    تُحدّث مع كل إضافة أو تعديل أو حذف للطلاب ونتائج الاختبارات، ويمكن
+    إعادة بنائها بالكامل بالأمر rebuild_statistics_rollup.
+    """
+    academic_year = models.ForeignKey(AcademicYear, on_delete=models.CASCADE, verbose_name="العام الدراسي")
+    institute = models.ForeignKey(Institute, on_delete=models.CASCADE, verbose_name="المعهد")
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, null=True, verbose_name="الإدارة")
+    region = models.ForeignKey(Region, on_delete=models.CASCADE, null=True, verbose_name="المنطقة")
+    gender = models.CharField(max_length=6, choices=Student.GENDER_CHOICES, verbose_name="النوع")
+    education_level = models.CharField(max_length=10, choices=Student.EDUCATION_LEVELS, verbose_name="المرحلة التعليمية")
+    
+    student_count = models.IntegerField(default=0, verbose_name="عدد الطلاب")
+    test_count = models.IntegerField(default=0, verbose_name="عدد الاختبارات")
+    score_sum = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="مجموع الدرجات")
+    score_min = models.DecimalField(max_digits=5, decimal_places=2, null=True, verbose_name="أقل درجة")
+    score_max = models.DecimalField(max_digits=5, decimal_places=2, null=True, verbose_name="أعلى درجة")
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = StatisticsRollupQuerySet.as_manager()
+    
+    class Meta:
+        verbose_name = "إحصائية مجمعة"
+        verbose_name_plural = "الإحصائيات المجمعة"
+        unique_together = ['academic_year', 'institute', 'gender', 'education_level']
+    
+    def __str__(self):
+        return f"{self.academic_year_id} - {self.institute_id} - {self.gender} - {self.education_level}"
+
+class StatisticsSnapshot(models.Model):
+    """
+    لقطة دورية لإحصائيات نطاق (الجمهورية أو منطقة أو إدارة أو معهد)
+
+    تُسجل كل ساعة من الإحصائيات المجمعة، وتُدمج اللقطات القديمة في لقطة
+    يومية ثم أسبوعية للاحتفاظ بسنوات من البيانات بعدد صغير من الصفوف.
+    """
+    SCOPES = [
+        ('national', 'الجمهورية'),
+        ('region', 'المنطقة'),
+        ('department', 'الإدارة'),
+        ('institute', 'المعهد'),
+    ]
+    RESOLUTIONS = [
+        ('hour', 'ساعة'),
+        ('day', 'يوم'),
+        ('week', 'أسبوع'),
+    ]
+    
+    timestamp = models.DateTimeField(verbose_name="الوقت")
+    resolution = models.CharField(max_length=5, choices=RESOLUTIONS, default='hour', verbose_name="الدقة")
+    scope = models.CharField(max_length=10, choices=SCOPES, verbose_name="النطاق")
+    # صفر للجمهورية حتى يعمل القيد الفريد دون قيم فارغة
+    scope_id = models.IntegerField(default=0, verbose_name="معرف النطاق")
+    
+    student_count = models.IntegerField(default=0, verbose_name="عدد الطلاب")
+    test_count = models.IntegerField(default=0, verbose_name="عدد الاختبارات")
+    male_students = models.IntegerField(default=0, verbose_name="الطلاب البنين")
+    female_students = models.IntegerField(default=0, verbose_name="الطالبات")
+    primary_students = models.IntegerField(default=0, verbose_name="طلاب المرحلة الابتدائية")
+    middle_students = models.IntegerField(default=0, verbose_name="طلاب المرحلة الإعدادية")
+    secondary_students = models.IntegerField(default=0, verbose_name="طلاب المرحلة الثانوية")
+    score_sum = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="مجموع الدرجات")
+    
+    class Meta:
+        verbose_name = "لقطة إحصائية"
+        verbose_name_plural = "اللقطات الإحصائية"
+        unique_together = ['scope', 'scope_id', 'resolution', 'timestamp']
+        indexes = [
+            models.Index(fields=['scope', 'scope_id', 'timestamp'], name='snapshot_scope_time_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.scope} {self.scope_id} {self.timestamp:%Y-%m-%d %H:%M} ({self.resolution})"
 
 class News(models.Model):
     title = models.CharField(max_length=200, verbose_name="العنوان")
@@ -140,6 +355,10 @@ class News(models.Model):
         verbose_name = "الخبر"
         verbose_name_plural = "الأخبار"
         ordering = ['-created_at']
+        # فهارس جزئية للصفوف المعروضة فقط (لا ينشئها Django على MySQL)
+        indexes = [
+            models.Index(fields=['-created_at'], condition=models.Q(is_published=True), name='news_published_idx'),
+        ]
     
     def __str__(self):
         return self.title
@@ -157,6 +376,9 @@ class Event(models.Model):
         verbose_name = "الفعالية"
         verbose_name_plural = "الفعاليات"
         ordering = ['start_date']
+        indexes = [
+            models.Index(fields=['start_date'], condition=models.Q(is_active=True), name='event_active_start_idx'),
+        ]
     
     def __str__(self):
         return self.title
@@ -203,4 +425,127 @@ class ExternalLink(models.Model):
         ordering = ['-created_at']
     
     def __str__(self):
-        return self.title 
\ No newline at end of file
+        return self.title 
+
+class ChangeLog(models.Model):
+    """
+    سجل الصفوف المحفوظة والمحذوفة لاستخدامه في النسخ الاحتياطية التزايدية
+
+    يغطي النماذج التي لا تحتوي حقل updated_at ويحفظ معرفات الصفوف المحذوفة،
+    ويُحذف ما سبق آخر نسخة كاملة بعد إنشائها.
+    """
+    ACTIONS = [
+        ('save', 'حفظ'),
+        ('delete', 'حذف'),
+    ]
+    
+    model = models.CharField(max_length=100, verbose_name="النموذج")
+    object_id = models.BigIntegerField(verbose_name="معرف السجل")
+    action = models.CharField(max_length=6, choices=ACTIONS, verbose_name="العملية")
+    changed_at = models.DateTimeField(auto_now_add=True, verbose_name="وقت التغيير")
+    
+    class Meta:
+        verbose_name = "سجل التغييرات"
+        verbose_name_plural = "سجل التغييرات"
+        indexes = [
+            models.Index(fields=['model', 'id'], name='changelog_model_id_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.model} {self.object_id} {self.action}"
+    
+    @classmethod
+    def record(cls, model, pks, action='save', batch_size=1000):
+        """تسجيل تغيير مجموعة من الصفوف دفعة واحدة للعمليات التي لا ترسل إشارات"""
+        label = model._meta.label_lower
+        cls.objects.bulk_create(
+            (cls(model=label, object_id=pk, action=action) for pk in pks),
+            batch_size=batch_size,
+        )
+    
+    @classmethod
+    def record_queryset(cls, queryset, action='save', batch_size=1000):
+        cls.record(
+            queryset.model,
+            queryset.values_list('pk', flat=True).iterator(chunk_size=batch_size),
+            action=action,
+            batch_size=batch_size,
+        )
+
+
+class ArchivedNews(models.Model):
+    """نسخة مختصرة من الأخبار القديمة بعد حذفها وحذف صورها"""
+    original_id = models.BigIntegerField(unique=True, verbose_name="معرف الخبر")
+    title = models.CharField(max_length=200, verbose_name="العنوان")
+    content = models.TextField(verbose_name="المحتوى")
+    created_at = models.DateTimeField(verbose_name="تاريخ النشر")
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name="تاريخ الأرشفة")
+    
+    class Meta:
+        verbose_name = "خبر مؤرشف"
+        verbose_name_plural = "الأخبار المؤرشفة"
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return self.title
+
+
+class ArchivedEvent(models.Model):
+    """نسخة مختصرة من الفعاليات المنتهية بعد حذفها وحذف صورها"""
+    original_id = models.BigIntegerField(unique=True, verbose_name="معرف الفعالية")
+    title = models.CharField(max_length=200, verbose_name="العنوان")
+    start_date = models.DateTimeField(verbose_name="تاريخ البداية")
+    end_date = models.DateTimeField(verbose_name="تاريخ النهاية")
+    location = models.CharField(max_length=200, verbose_name="الموقع")
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name="تاريخ الأرشفة")
+    
+    class Meta:
+        verbose_name = "فعالية مؤرشفة"
+        verbose_name_plural = "الفعاليات المؤرشفة"
+        ordering = ['-end_date']
+    
+    def __str__(self):
+        return self.title
+
+
+class Notification(models.Model):
+    """إشعار بريدي جماعي بقالب يُخصص لكل مستلم"""
+    subject = models.CharField(max_length=200, verbose_name="الموضوع")
+    message = models.TextField(verbose_name="نص الرسالة")
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="أنشئ بواسطة")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="تاريخ الإنشاء")
+    
+    class Meta:
+        verbose_name = "إشعار"
+        verbose_name_plural = "الإشعارات"
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return self.subject
+
+
+class NotificationDelivery(models.Model):
+    """حالة إرسال إشعار لمستلم واحد"""
+    STATUSES = [
+        ('pending', 'في الانتظار'),
+        ('sent', 'تم الإرسال'),
+        ('failed', 'فشل'),
+    ]
+    
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE, related_name='deliveries', verbose_name="الإشعار")
+    recipient = models.EmailField(verbose_name="البريد الإلكتروني")
+    name = models.CharField(max_length=150, blank=True, verbose_name="اسم المستلم")
+    status = models.CharField(max_length=10, choices=STATUSES, default='pending', verbose_name="الحالة")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="عدد المحاولات")
+    error = models.TextField(blank=True, verbose_name="الخطأ")
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name="وقت الإرسال")
+    
+    class Meta:
+        verbose_name = "إرسال إشعار"
+        verbose_name_plural = "إرسالات الإشعارات"
+        indexes = [
+            models.Index(fields=['notification', 'status'], name='delivery_status_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.recipient} - {self.get_status_display()}"
@@ -0,0 +1,172 @@
+"""
+Bulk email notifications.
+
+A notification is stored once with its subject and message templates, plus one
+delivery row per recipient. Messages are rendered for each recipient and sent
+in batches over a single SMTP session opened with ``get_connection()``, which
+is reopened only if the server drops it, with an optional rate limit between
+messages. After every batch the delivery rows are updated with their outcome,
+so failures can be inspected and retried without resending what already went
+out.
+
+To try it locally, start a debugging server (``pip install aiosmtpd``; the
+``smtpd`` module was removed in Python 3.12) and point EMAIL_HOST/EMAIL_PORT
+at it::
+
+    python -m aiosmtpd -n -l localhost:1025
+"""
+
+import smtplib
+import time
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.template import Context, Template
+from django.utils import timezone
+from .models import Notification, NotificationDelivery
+
+NOTIFICATION_BATCH_SIZE = 100
+NOTIFICATION_MAX_ATTEMPTS = 3
+
+
+class DeliveryResult:
+    """إحصائيات إرسال إشعار واحد"""
+
+    def __init__(self, notification):
+        self.notification = notification
+        self.sent = 0
+        self.failed = 0
+        self.batches = 0
+        self.reconnects = 0
+        self.elapsed = 0.0
+        self.error = ''
+
+    def __str__(self):
+        summary = (
+            f"{self.notification}: {self.sent} sent, {self.failed} failed "
+            f"in {self.batches} batches ({self.elapsed:.2f}s, {self.reconnects} reconnects)"
+        )
+        return f"{summary}: {self.error}" if self.error else summary
+
+
+def profile_recipients(user_types=None):
+    """بريد واسم المستخدمين النشطين حسب نوع الحساب"""
+    from accounts.models import UserProfile
+    profiles = UserProfile.objects.filter(user__is_active=True).exclude(user__email='')
+    if user_types:
+        profiles = profiles.filter(user_type__in=user_types)
+    return [
+        (email, f'{first_name} {last_name}'.strip() or username)
+        for email, first_name, last_name, username in profiles.order_by('id').values_list(
+            'user__email', 'user__first_name', 'user__last_name', 'user__username'
+        )
+    ]
+
+
+def create_notification(subject, message, recipients, created_by_id=None):
+    """
+    حفظ الإشعار وصف إرسال لكل مستلم
+
+    recipients عناوين بريد أو أزواج (البريد، الاسم)، ويُحذف المكرر منها.
+    """
+    rows = {}
+    for recipient in recipients:
+        email, name = (recipient, '') if isinstance(recipient, str) else recipient
+        rows.setdefault(email.strip().lower(), name)
+
+    with transaction.atomic():
+        notification = Notification.objects.create(subject=subject, message=message, created_by_id=created_by_id)
+        NotificationDelivery.objects.bulk_create(
+            [NotificationDelivery(notification=notification, recipient=email, name=name) for email, name in rows.items()],
+            batch_size=NOTIFICATION_BATCH_SIZE,
+        )
+    return notification
+
+
+def _send(connection, message, result):
+    """إرسال رسالة على الاتصال المفتوح مع إعادة فتحه مرة واحدة إذا قطعه الخادم"""
+    try:
+        connection.send_messages([message])
+    except smtplib.SMTPServerDisconnected:
+        connection.close()
+        connection.open()
+        result.reconnects += 1
+        connection.send_messages([message])
+
+
+def deliver(notification, batch_size=None, rate=None, retry_failed=False, max_attempts=NOTIFICATION_MAX_ATTEMPTS,
+            progress=None):
+    """
+    إرسال الإشعار للمستلمين الذين لم يستلموه بعد وإرجاع DeliveryResult
+
+    rate أقصى عدد رسائل في الثانية (صفر دون حد)، وretry_failed يعيد
+    المحاولة للمستلمين الذين فشل الإرسال إليهم ما لم يتجاوزوا max_attempts.
+    """
+    batch_size = batch_size or getattr(settings, 'NOTIFICATION_BATCH_SIZE', NOTIFICATION_BATCH_SIZE)
+    rate = rate if rate is not None else getattr(settings, 'NOTIFICATION_RATE', 0)
+    statuses = ['pending', 'failed'] if retry_failed else ['pending']
+    deliveries = notification.deliveries.filter(status__in=statuses, attempts__lt=max_attempts).order_by('pk')
+
+    # القوالب تُحلل مرة واحدة وتُعرض لكل مستلم
+    subject = Template(notification.subject)
+    body = Template(notification.message)
+    from_email = settings.DEFAULT_FROM_EMAIL
+
+    result = DeliveryResult(notification)
+    started = time.monotonic()
+    interval = 1.0 / rate if rate else 0
+    next_send = started
+    last_pk = 0
+
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        # الخادم غير متاح: تُسجل محاولة فاشلة لكل مستلم منتظر حتى يظهر السبب ويمكن إعادة المحاولة
+        result.error = str(e)
+        result.failed = deliveries.update(status='failed', attempts=F('attempts') + 1, error=result.error)
+        result.elapsed = time.monotonic() - started
+        return result
+    try:
+        while True:
+            batch = list(deliveries.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            for delivery in batch:
+                if interval:
+                    delay = next_send - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    next_send = max(next_send, time.monotonic()) + interval
+
+                context = Context({'name': delivery.name, 'email': delivery.recipient}, autoescape=False)
+                message = EmailMessage(
+                    subject.render(context).strip().replace('\n', ' '), body.render(context),
+                    from_email, [delivery.recipient], connection=connection,
+                )
+                delivery.attempts += 1
+                try:
+                    _send(connection, message, result)
+                except Exception as e:
+                    delivery.status = 'failed'
+                    delivery.error = str(e)
+                    result.failed += 1
+                else:
+                    delivery.status = 'sent'
+                    delivery.error = ''
+                    delivery.sent_at = timezone.now()
+                    result.sent += 1
+
+            NotificationDelivery.objects.bulk_update(batch, ['status', 'attempts', 'error', 'sent_at'])
+            result.batches += 1
+            result.elapsed = time.monotonic() - started
+            if progress:
+                progress(result)
+    finally:
+        connection.close()
+
+    result.elapsed = time.monotonic() - started
+    return result
@@ -0,0 +1,119 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are addressed by the ordering key of their first/last row instead of an
+offset, so fetching any page costs an index range scan and no ``COUNT(*)``.
+"""
+
+from django.core import signing
+from django.db.models import Q
+
+CURSOR_SALT = 'fitness_management.pagination'
+
+
+class KeysetPage:
+    """صفحة من النتائج مع رموز الانتقال للصفحة التالية والسابقة"""
+
+    def __init__(self, object_list, has_next, has_previous, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+class KeysetPaginator:
+    """
+    ترقيم الصفحات باستخدام مفتاح الترتيب
+
+    يجب أن يكون آخر حقل في الترتيب فريداً (عادة id) حتى يكون الترتيب ثابتاً.
+    """
+
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = [
+            (field[1:], True) if field.startswith('-') else (field, False)
+            for field in ordering
+        ]
+
+    def get_page(self, cursor=None):
+        """إرجاع الصفحة التي يشير إليها الرمز، أو الصفحة الأولى"""
+        position = self.decode_cursor(cursor)
+        if position is None:
+            return self._build_page(self._fetch(None, forward=True), forward=True, from_cursor=False)
+        values, forward = position
+        return self._build_page(self._fetch(values, forward), forward, from_cursor=True)
+
+    def encode_cursor(self, obj, forward):
+        values = [self._value(obj, field) for field, _ in self.ordering]
+        return signing.dumps({'v': values, 'f': forward}, salt=CURSOR_SALT, compress=True)
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            data = signing.loads(cursor, salt=CURSOR_SALT)
+        except signing.BadSignature:
+            return None
+        values = data.get('v')
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            return None
+        return values, bool(data.get('f'))
+
+    def _value(self, obj, field):
+        value = getattr(obj, field)
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return value
+
+    def _fetch(self, values, forward):
+        """جلب صف زائد لمعرفة ما إذا كانت هناك صفحة أخرى في نفس الاتجاه"""
+        queryset = self.queryset
+        if values is not None:
+            queryset = queryset.filter(self._after(values, forward))
+        order_by = [
+            ('-' if descending == forward else '') + field
+            for field, descending in self.ordering
+        ]
+        return list(queryset.order_by(*order_by)[:self.per_page + 1])
+
+    def _after(self, values, forward):
+        """
+        بناء شرط "بعد المفتاح" للترتيب المركب:
+        (a > x) OR (a = x AND b > y) OR ...
+        """
+        condition = Q()
+        equal = {}
+        for (field, descending), value in zip(self.ordering, values):
+            lookup = 'lt' if descending == forward else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        return condition
+
+    def _build_page(self, rows, forward, from_cursor):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+
+        if forward:
+            has_next, has_previous = has_more, from_cursor
+        else:
+            has_next, has_previous = True, has_more
+
+        next_cursor = self.encode_cursor(rows[-1], True) if rows and has_next else None
+        previous_cursor = self.encode_cursor(rows[0], False) if rows and has_previous else None
+        return KeysetPage(rows, has_next, has_previous, next_cursor, previous_cursor)
@@ -0,0 +1,117 @@
+"""
+Permission checks that work on ancestor IDs instead of model instances.
+
+The user's region/department/institute IDs are resolved once from the
+in-memory hierarchy and kept on the profile for the rest of the request, so
+each check is a comparison of integers and never touches the database.
+"""
+
+from .hierarchy import get_hierarchy
+
+
+class ProfileScope:
+    """معرفات نطاق صلاحيات المستخدم بعد استكمال المنطقة والإدارة"""
+
+    def __init__(self, user_profile, hierarchy=None):
+        hierarchy = hierarchy or get_hierarchy()
+        self.hierarchy = hierarchy
+        self.user_type = user_profile.user_type if user_profile else None
+        self.region_id = self.department_id = self.institute_id = None
+
+        if self.user_type == 'region_admin':
+            self.region_id = user_profile.region_id
+        elif self.user_type == 'department_admin':
+            self.region_id, self.department_id, _ = hierarchy.ancestors(
+                department_id=user_profile.department_id
+            )
+        elif self.user_type == 'institute_admin':
+            self.region_id, self.department_id, self.institute_id = hierarchy.ancestors(
+                institute_id=user_profile.institute_id
+            )
+
+    @property
+    def is_super_admin(self):
+        return self.user_type == 'super_admin'
+
+    def can_manage_region(self, region):
+        if self.is_super_admin:
+            return True
+        return self.region_id is not None and region.pk == self.region_id
+
+    def can_manage_department(self, department):
+        if self.is_super_admin:
+            return True
+        if self.user_type == 'region_admin':
+            return self.region_id is not None and department.region_id == self.region_id
+        if self.user_type in ('department_admin', 'institute_admin'):
+            return self.department_id is not None and department.pk == self.department_id
+        return False
+
+    def can_manage_institute(self, institute):
+        if self.is_super_admin:
+            return True
+        if self.user_type == 'region_admin':
+            region_id = self.hierarchy.region_of_department(institute.department_id)
+            return self.region_id is not None and region_id == self.region_id
+        if self.user_type == 'department_admin':
+            return self.department_id is not None and institute.department_id == self.department_id
+        if self.user_type == 'institute_admin':
+            return self.institute_id is not None and institute.pk == self.institute_id
+        return False
+
+    def can_manage_student(self, student):
+        if self.is_super_admin:
+            return True
+        region_id, department_id = student.region_id, student.department_id
+        if region_id is None or department_id is None:
+            # طالب لم تُملأ له أعمدة النطاق بعد
+            region_id, department_id, _ = self.hierarchy.ancestors(institute_id=student.institute_id)
+        if self.user_type == 'region_admin':
+            return self.region_id is not None and region_id == self.region_id
+        if self.user_type == 'department_admin':
+            return self.department_id is not None and department_id == self.department_id
+        if self.user_type == 'institute_admin':
+            return self.institute_id is not None and student.institute_id == self.institute_id
+        return False
+
+    def can_view_scope(self, scope, scope_id):
+        """صلاحية عرض إحصائيات نطاق ('national' أو 'region' أو 'department' أو 'institute') بمعرفه"""
+        if self.is_super_admin:
+            return True
+        if scope == 'region':
+            region_id = scope_id
+        elif scope == 'department':
+            region_id, department_id = self.hierarchy.region_of_department(scope_id), scope_id
+        elif scope == 'institute':
+            region_id, department_id, _ = self.hierarchy.ancestors(institute_id=scope_id)
+        else:
+            return False
+        if self.user_type == 'region_admin':
+            return self.region_id is not None and region_id == self.region_id
+        if self.user_type == 'department_admin':
+            return scope != 'region' and self.department_id is not None and department_id == self.department_id
+        if self.user_type == 'institute_admin':
+            return scope == 'institute' and self.institute_id is not None and scope_id == self.institute_id
+        return False
+
+    def annotate_students(self, students):
+        """تعيين علامة can_manage لكل طالب في القائمة"""
+        for student in students:
+            student.can_manage = self.can_manage_student(student)
+        return students
+
+    def annotate_institutes(self, institutes):
+        """تعيين علامة can_manage لكل معهد في القائمة"""
+        for institute in institutes:
+            institute.can_manage = self.can_manage_institute(institute)
+        return institutes
+
+
+def get_profile_scope(user_profile):
+    """نطاق المستخدم المحسوب مرة واحدة لكل طلب ومحفوظ مع ملفه"""
+    scope = getattr(user_profile, '_profile_scope', None)
+    if scope is None:
+        scope = ProfileScope(user_profile)
+        if user_profile is not None:
+            user_profile._profile_scope = scope
+    return scope
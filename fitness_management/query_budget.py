@@ -0,0 +1,222 @@
+"""
+Per-view query budgets.
+
+Every URL of the ``fitness_management`` and ``accounts`` apps is requested as
+each of the four user types against a seeded hierarchy, counting queries and
+SQL time with ``QueryCounter``. Each request runs inside a transaction that is
+rolled back, so views that change data on GET (delete links, logout) do not
+affect the requests after them. Views above their budget are reported and the
+results can be ranked to find the worst offenders after a template change.
+"""
+
+import random
+from datetime import date, timedelta
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from accounts import urls as accounts_urls
+from accounts.models import UserProfile
+from . import urls as fitness_urls
+from .arabic import normalize_arabic
+from .hierarchy import invalidate_hierarchy
+from .models import (
+    AcademicYear, Department, Event, ExternalLink, Institute, News, Region, Student, StudentTest, Test,
+    TrainingUnit, Video,
+)
+from .synthetic import NATIONAL_ID_SERIALS, national_id
+
+DEFAULT_MAX_QUERIES = 20
+DEFAULT_MAX_SQL_TIME = 0.5
+
+# ميزانيات خاصة لصفحات تحتاج استعلامات أكثر من الحد العام (اسم المسار: عدد الاستعلامات)
+# حذف إدارة أو منطقة يحذف طلابها ونتائجهم على دفعات من عدة مئات من الصفوف، فالحد
+# هنا لحجم البيانات الافتراضي في seed_hierarchy ويكشف عودة الاستعلامات لكل صف
+QUERY_BUDGETS = {
+    'fitness_management:delete_student': 30,
+    'fitness_management:delete_department': 30,
+    'fitness_management:delete_region': 45,
+}
+
+# ذاكرة مؤقتة منفصلة حتى لا تختلط بيانات الفحص بذاكرة التطبيق
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+USER_TYPES = ('super_admin', 'region_admin', 'department_admin', 'institute_admin')
+
+FIRST_NAMES = ['محمد', 'أحمد', 'محمود', 'علي', 'عمر', 'يوسف', 'فاطمة', 'مريم', 'آية', 'نور', 'هدى', 'سارة']
+FAMILY_NAMES = ['حسن', 'إبراهيم', 'عبدالله', 'السيد', 'مصطفى', 'عبدالرحمن', 'الشافعي', 'النجار']
+
+
+class ViewResult:
+    """قياس طلب صفحة واحدة لنوع مستخدم واحد"""
+
+    def __init__(self, name, user_type, url, status, queries, sql_time, max_queries, max_sql_time):
+        self.name = name
+        self.user_type = user_type
+        self.url = url
+        self.status = status
+        self.queries = queries
+        self.sql_time = sql_time
+        self.max_queries = max_queries
+        self.max_sql_time = max_sql_time
+
+    @property
+    def over_budget(self):
+        return self.queries > self.max_queries or self.sql_time > self.max_sql_time
+
+    def __str__(self):
+        return (
+            f"{self.name} [{self.user_type}] {self.status}: {self.queries}/{self.max_queries} queries, "
+            f"{self.sql_time * 1000:.1f}/{self.max_sql_time * 1000:.0f} ms"
+        )
+
+
+def seed_hierarchy(regions=3, departments=3, institutes=3, students=20, seed=0):
+    """
+    إنشاء هيكل إداري وطلاب ونتائج ومحتوى للصفحات العامة
+
+    الطلاب والنتائج تُضاف دفعة واحدة ثم يُعاد بناء الإحصائيات المجمعة
+    وفهرس البحث لأن bulk_create لا يرسل إشارات.
+    """
+    from .rollups import rebuild as rebuild_rollups
+    from .search import get_search_backend
+
+    rng = random.Random(seed)
+    year = AcademicYear.objects.create(name='2024-2025', start_date=date(2024, 9, 1), end_date=date(2025, 6, 30))
+    tests = [
+        Test.objects.create(name=name, description=name, education_level=level, gender=gender, max_score=max_score)
+        for name, level, gender, max_score in (
+            ('الجري 50 متر', 'primary', 'male', 20), ('الوثب الطويل', 'middle', 'male', 10),
+            ('المرونة', 'primary', 'female', 20), ('التحمل', 'secondary', 'female', 10),
+        )
+    ]
+
+    rows = []
+    serial = 0
+    for r in range(regions):
+        region = Region.objects.create(name=f'منطقة {r + 1}', code=f'R{r + 1}')
+        for d in range(departments):
+            department = Department.objects.create(name=f'إدارة {r + 1}-{d + 1}', region=region, code=f'D{r + 1}-{d + 1}')
+            for i in range(institutes):
+                institute = Institute.objects.create(
+                    name=f'معهد {r + 1}-{d + 1}-{i + 1} الأزهري', department=department, code=f'I{r + 1}-{d + 1}-{i + 1}'
+                )
+                for _ in range(students):
+                    serial += 1
+                    name = f'{rng.choice(FIRST_NAMES)} {rng.choice(FAMILY_NAMES)}'
+                    gender = rng.choice(['male', 'female'])
+                    birth_date = date(2012, 1, 1) + timedelta(days=serial // NATIONAL_ID_SERIALS)
+                    rows.append(Student(
+                        name=name, name_normalized=normalize_arabic(name),
+                        national_id=national_id(birth_date, 1, serial % NATIONAL_ID_SERIALS, gender),
+                        gender=gender, education_level=rng.choice(['primary', 'middle', 'secondary']),
+                        grade=str(rng.randint(1, 6)), institute=institute, department=department, region=region,
+                        academic_year=year, personal_photo='students/photos/placeholder.jpg',
+                        birth_certificate='students/documents/placeholder.jpg',
+                    ))
+    Student.objects.bulk_create(rows, batch_size=500)
+
+    # إدارة ومنطقة الطالب تُنسخ في النتائج لأن bulk_create لا يستدعي save
+    results = []
+    for student_id, department_id, region_id in Student.objects.values_list('id', 'department_id', 'region_id'):
+        for test in rng.sample(tests, 2):
+            results.append(StudentTest(
+                student_id=student_id, test=test, score=rng.randint(0, test.max_score),
+                test_date=date(2025, 1, 1) + timedelta(days=rng.randint(0, 120)),
+                department_id=department_id, region_id=region_id,
+            ))
+    StudentTest.objects.bulk_create(results, batch_size=500)
+
+    now = timezone.now()
+    for n in range(10):
+        News.objects.create(title=f'خبر {n + 1}', content='محتوى الخبر', is_published=n % 3 != 0)
+        Event.objects.create(
+            title=f'فعالية {n + 1}', description='وصف', location='القاهرة', is_active=n % 2 == 0,
+            start_date=now + timedelta(days=n), end_date=now + timedelta(days=n + 1),
+        )
+        Video.objects.create(title=f'فيديو {n + 1}', description='وصف', video_url='https://example.com/v', category=f'فئة {n % 3}')
+        TrainingUnit.objects.create(title=f'وحدة {n + 1}', content='محتوى', education_level='primary')
+        ExternalLink.objects.create(title=f'رابط {n + 1}', url='https://example.com')
+
+    rebuild_rollups()
+    get_search_backend().rebuild()
+    invalidate_hierarchy()
+
+
+def create_users():
+    """مستخدم لكل نوع حساب مرتبط بأول منطقة وإدارة ومعهد"""
+    institute = Institute.objects.select_related('department').order_by('id').first()
+    scopes = {
+        'super_admin': {},
+        'region_admin': {'region_id': institute.department.region_id},
+        'department_admin': {'department_id': institute.department_id},
+        'institute_admin': {'institute_id': institute.id},
+    }
+    users = {}
+    for user_type, scope in scopes.items():
+        user = User.objects.create_user(f'budget_{user_type}', email=f'{user_type}@example.com')
+        UserProfile.objects.create(user=user, user_type=user_type, **scope)
+        users[user_type] = user
+    return users
+
+
+def sample_kwargs():
+    """معرفات من نطاق أول معهد لملء معاملات المسارات فتراها كل أنواع الحسابات"""
+    student = Student.objects.order_by('id').first()
+    # أول خبر منشور وأول فعالية نشطة حتى تُعرض صفحات التفاصيل
+    first = {model: queryset.order_by('id').values_list('id', flat=True).first() for model, queryset in (
+        (News, News.objects.filter(is_published=True)), (Event, Event.objects.filter(is_active=True)),
+        (Video, Video.objects.all()), (TrainingUnit, TrainingUnit.objects.all()), (ExternalLink, ExternalLink.objects.all()),
+    )}
+    return {
+        'student_id': student.id,
+        'region_id': student.region_id,
+        'department_id': student.department_id,
+        'institute_id': student.institute_id,
+        'news_id': first[News],
+        'event_id': first[Event],
+        'video_id': first[Video],
+        'unit_id': first[TrainingUnit],
+        'link_id': first[ExternalLink],
+    }
+
+
+def budget_urls(kwargs):
+    """(الاسم، الرابط) لكل مسار في تطبيقي fitness_management و accounts"""
+    urls = []
+    for module in (fitness_urls, accounts_urls):
+        for pattern in module.urlpatterns:
+            name = f'{module.app_name}:{pattern.name}'
+            converters = pattern.pattern.converters
+            urls.append((name, reverse(name, kwargs={key: kwargs[key] for key in converters})))
+    return urls
+
+
+def measure(users, urls, max_queries=DEFAULT_MAX_QUERIES, max_sql_time=DEFAULT_MAX_SQL_TIME, progress=None):
+    """طلب كل رابط بكل مستخدم وإرجاع قائمة ViewResult"""
+    from .instrumentation import QueryCounter
+
+    client = Client()
+    results = []
+    for user_type in USER_TYPES:
+        for name, url in urls:
+            with transaction.atomic():
+                # تسجيل الدخول قبل كل طلب لأن رابط الخروج ينهي الجلسة
+                client.force_login(users[user_type])
+                with QueryCounter() as counter:
+                    response = client.get(url)
+                transaction.set_rollback(True)
+            result = ViewResult(
+                name, user_type, url, response.status_code, counter.count, counter.sql_time,
+                QUERY_BUDGETS.get(name, max_queries), max_sql_time,
+            )
+            results.append(result)
+            if progress:
+                progress(result)
+    return results
+
+
+def worst_offenders(results, limit=10):
+    """النتائج مرتبة من الأكثر استعلامات ثم الأطول وقتاً"""
+    return sorted(results, key=lambda result: (result.queries, result.sql_time), reverse=True)[:limit]
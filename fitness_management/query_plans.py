@@ -0,0 +1,133 @@
+"""
+EXPLAIN checks for the main view queries.
+
+The querysets used by the student list, student page, reports, home page and
+trend chart are rebuilt for sample ids taken from the current database and
+explained. A plan that reads a whole table instead of searching an index is
+reported, so a dropped or unusable index shows up on a seeded database before
+it shows up in production: ``Seq Scan`` on PostgreSQL, access type ``ALL`` on
+MySQL, and on SQLite any ``SCAN`` of a table. Walking an index in order
+(``SCAN t USING INDEX i``) still visits every row of the table, so it only
+passes when the query has a ``LIMIT`` and the index is covering, or partial
+(it then holds only the rows the query filters for); everything else has to
+be a ``SEARCH``. Queries built for a specific composite index
+also name it, and a plan that picks a different index is reported as well, so
+an index the planner never chooses does not go unnoticed.
+
+PostgreSQL prefers sequential scans on small tables regardless of indexes, so
+the check runs there with ``enable_seqscan`` off: a sequential scan is then
+only chosen when no index can serve the query. SQLite has no such switch and
+rightly scans tables of a few dozen rows once they are analyzed, so the check
+is meant for a seeded database of realistic size.
+"""
+
+import re
+from django.apps import apps
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from .models import Event, Institute, News, StatisticsRollup, StatisticsSnapshot, Student, StudentTest
+
+_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (?!CONSTANT ROW)(\w+)(?: USING (COVERING )?INDEX (\w+))?'),
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'mysql': re.compile(r'"table_name": "(\w+)",\s*"access_type": "ALL"'),
+}
+
+
+class _Scope:
+    """ملف مستخدم مبسط لبناء استعلامات for_profile دون حفظ"""
+
+    def __init__(self, user_type, **ids):
+        self.user_type = user_type
+        self.region_id = ids.get('region_id')
+        self.department_id = ids.get('department_id')
+        self.institute_id = ids.get('institute_id')
+
+
+def hot_queries():
+    """(الاسم، الاستعلام، الفهرس المتوقع أو None) لاستعلامات الصفحات الرئيسية بمعرفات من البيانات الحالية"""
+    student = Student.objects.order_by('id').values(
+        'id', 'gender', 'education_level', 'institute_id', 'department_id', 'region_id', 'academic_year_id'
+    ).first()
+    if student is None:
+        return []
+    institute = _Scope('institute_admin', institute_id=student['institute_id'])
+    department = _Scope('department_admin', department_id=student['department_id'])
+    region = _Scope('region_admin', region_id=student['region_id'])
+    name_order = ('name_normalized', 'id')
+
+    return [
+        ('student_list institute filtered', Student.objects.for_profile(institute).filter(
+            gender=student['gender'], education_level=student['education_level']
+        ).for_listing().order_by(*name_order)[:21], 'student_inst_filter_name_idx'),
+        ('student_list department', Student.objects.for_profile(department).for_listing().order_by(*name_order)[:21],
+         'student_department_name_idx'),
+        ('student_list region', Student.objects.for_profile(region).for_listing().order_by(*name_order)[:21],
+         'student_region_name_idx'),
+        ('students by academic year', Student.objects.filter(academic_year_id=student['academic_year_id']).order_by('id')[:21],
+         None),
+        ('student_detail tests', StudentTest.objects.filter(student_id=student['id']).order_by('test_date'),
+         'studenttest_student_date_idx'),
+        ('reports institute tests', StudentTest.objects.for_profile(institute).order_by().values('test_id').annotate(
+            count=Count('id'), total=Sum('score')
+        ), None),
+        ('reports department tests', StudentTest.objects.for_profile(department).order_by().values('test_id').annotate(
+            count=Count('id'), total=Sum('score')
+        ), None),
+        ('reports region rollup', StatisticsRollup.objects.for_profile(region).order_by().values('gender').annotate(
+            students=Sum('student_count')
+        ), None),
+        ('institutes of department', Institute.objects.for_profile(department), None),
+        ('home news', News.objects.filter(is_published=True)[:5], 'news_published_idx'),
+        ('home events', Event.objects.filter(is_active=True)[:3], 'event_active_start_idx'),
+        ('statistics trend', StatisticsSnapshot.objects.filter(
+            scope='institute', scope_id=student['institute_id']
+        ).order_by('timestamp'), 'snapshot_scope_time_idx'),
+    ]
+
+
+def explain(queryset, using=None):
+    """خطة تنفيذ الاستعلام كنص"""
+    conn = using or connection
+    if conn.vendor == 'mysql':
+        return queryset.explain(format='json')
+    if conn.vendor != 'postgresql':
+        return queryset.explain()
+    with transaction.atomic(using=conn.alias):
+        with conn.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+
+def full_scans(plan, vendor, bounded=False):
+    """
+    الجداول التي تُقرأ كاملة في الخطة
+
+    bounded: الاستعلام محدود بـ LIMIT فيتوقف المرور على فهرس مغطٍّ أو جزئي بعد عدد قليل من الصفوف
+    """
+    pattern = _SCAN_PATTERNS.get(vendor)
+    if pattern is None:
+        return []
+    if vendor == 'sqlite':
+        partial = {
+            index.name for model in apps.get_models() for index in model._meta.indexes if index.condition is not None
+        }
+        return sorted({
+            table for table, covering, index in pattern.findall(plan)
+            if not (bounded and (covering or index in partial))
+        })
+    return sorted(set(pattern.findall(plan)))
+
+
+def check_plans(queries=None, using=None):
+    """قائمة (الاسم، الخطة، المشكلات) لكل استعلام؛ المشكلات قراءة جدول كامل أو عدم استخدام الفهرس المتوقع"""
+    conn = using or connection
+    results = []
+    for label, queryset, index in hot_queries() if queries is None else queries:
+        plan = explain(queryset, conn)
+        bounded = queryset.query.high_mark is not None
+        problems = [f'full scan of {table}' for table in full_scans(plan, conn.vendor, bounded)]
+        if index and index not in plan:
+            problems.append(f'{index} not used')
+        results.append((label, plan, problems))
+    return results
@@ -0,0 +1,178 @@
+"""
+Batch generation of student report cards.
+
+All students of a scope are read with one ``values_list`` query and all their
+results with a second one, both ordered by institute so they can be walked
+side by side and grouped without further queries. Percentages, totals and
+averages are computed from the grouped rows, and each institute is handed as
+plain tuples to a process pool that writes one zip archive holding a JSON
+report per student plus a summary, so the workers never touch the database.
+"""
+
+import itertools
+import json
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from django.conf import settings
+from .exports import DISPLAY_VALUES, student_queryset, student_test_queryset
+from .models import Student, StudentTest
+
+REPORT_CHUNK_SIZE = 2000
+
+STUDENT_FIELDS = (
+    'id', 'name', 'national_id', 'gender', 'education_level', 'grade', 'institute_id', 'institute__name',
+)
+RESULT_FIELDS = ('student_id', 'test__name', 'test__max_score', 'score', 'test_date', 'notes')
+
+
+def build_report(student, results):
+    """
+    تقرير طالب واحد من صف بياناته ونتائجه بنفس صيغة التقرير الفردي
+
+    student صف بترتيب STUDENT_FIELDS، وresults صفوف بترتيب RESULT_FIELDS.
+    """
+    student_id, name, national_id, gender, education_level, grade, _, institute = student
+    tests = []
+    total_score = 0.0
+    for _, test_name, max_score, score, test_date, notes in results:
+        score = float(score)
+        total_score += score
+        tests.append({
+            'test_name': test_name,
+            'score': score,
+            'max_score': max_score,
+            'percentage': round(score / max_score * 100, 2) if max_score else 0,
+            'test_date': test_date.isoformat(),
+            'notes': notes,
+        })
+
+    return {
+        'student_info': {
+            'id': student_id,
+            'name': name,
+            'national_id': national_id,
+            'gender': DISPLAY_VALUES['gender'].get(gender, gender),
+            'education_level': DISPLAY_VALUES['education_level'].get(education_level, education_level),
+            'grade': grade,
+            'institute': institute,
+        },
+        'tests': tests,
+        'statistics': {
+            'total_tests': len(tests),
+            'average_score': round(total_score / len(tests), 2) if tests else 0,
+            'total_score': round(total_score, 2),
+        },
+    }
+
+
+def student_report(student_id):
+    """تقرير طالب واحد باستعلامين"""
+    student = Student.objects.filter(id=student_id).values_list(*STUDENT_FIELDS).first()
+    if student is None:
+        raise Student.DoesNotExist(f"Student with ID {student_id} not found")
+    results = StudentTest.objects.filter(student_id=student_id).order_by('test_date', 'id').values_list(*RESULT_FIELDS)
+    return build_report(student, results)
+
+
+def write_institute_archive(output_dir, institute_id, students, results):
+    """
+    كتابة أرشيف تقارير معهد واحد وإرجاع (المعهد، عدد الطلاب، عدد النتائج، المسار)
+
+    تعمل في عملية منفصلة على بيانات جاهزة دون الاتصال بقاعدة البيانات.
+    """
+    path = os.path.join(output_dir, f'institute_{institute_id}.zip')
+    partial_path = path + '.part'
+    tests = 0
+    total_score = 0.0
+    with zipfile.ZipFile(partial_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for student in students:
+            report = build_report(student, results.get(student[0], ()))
+            tests += report['statistics']['total_tests']
+            total_score += report['statistics']['total_score']
+            archive.writestr(f'student_{student[0]}.json', json.dumps(report, ensure_ascii=False, indent=2))
+        archive.writestr('summary.json', json.dumps({
+            'institute_id': institute_id,
+            'institute': students[0][7] if students else '',
+            'total_students': len(students),
+            'total_tests': tests,
+            'average_score': round(total_score / tests, 2) if tests else 0,
+        }, ensure_ascii=False, indent=2))
+    os.replace(partial_path, path)
+    return institute_id, len(students), tests, path
+
+
+def _write_job(job):
+    return write_institute_archive(*job)
+
+
+def institute_batches(spec=None, output_dir='', chunk_size=REPORT_CHUNK_SIZE):
+    """
+    مهام كتابة الأرشيفات لكل معهد من استعلامين متوازيين مرتبين بالمعهد
+
+    لا يُحمَّل في الذاكرة إلا طلاب المعهد الحالي ونتائجهم.
+    """
+    students = student_queryset(spec).order_by('institute_id', 'id').values_list(*STUDENT_FIELDS)
+    results = student_test_queryset(spec).order_by(
+        'student__institute_id', 'student_id', 'test_date', 'id'
+    ).values_list('student__institute_id', *RESULT_FIELDS)
+
+    result_groups = itertools.groupby(results.iterator(chunk_size=chunk_size), key=lambda row: row[0])
+    pending = next(result_groups, None)
+    for institute_id, rows in itertools.groupby(students.iterator(chunk_size=chunk_size), key=lambda row: row[6]):
+        grouped = {}
+        # تخطي نتائج معاهد ليس لها طلاب مطابقون في المواصفات
+        while pending is not None and pending[0] < institute_id:
+            pending = next(result_groups, None)
+        if pending is not None and pending[0] == institute_id:
+            for row in pending[1]:
+                grouped.setdefault(row[1], []).append(row[1:])
+            pending = next(result_groups, None)
+        yield output_dir, institute_id, list(rows), grouped
+
+
+def generate_reports(spec=None, output_dir=None, workers=None, chunk_size=REPORT_CHUNK_SIZE, progress=None):
+    """
+    إنشاء أرشيف تقارير لكل معهد في نطاق المواصفات وإرجاع ملخص التشغيل
+
+    تُوزع كتابة الأرشيفات على مجموعة عمليات، ويُكتفى بعملية واحدة داخل
+    عمال Celery لأن العمليات الخدمية لا يُسمح لها بإنشاء عمليات فرعية.
+    """
+    if output_dir is None:
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        output_dir = os.path.join(settings.BACKUP_DIR, 'reports', f'student_reports_{timestamp}')
+    os.makedirs(output_dir, exist_ok=True)
+    if workers is None:
+        workers = getattr(settings, 'REPORT_WORKERS', None) or min(4, os.cpu_count() or 1)
+    if multiprocessing.current_process().daemon:
+        workers = 1
+
+    summary = {'path': output_dir, 'archives': [], 'students': 0, 'tests': 0}
+
+    def collect(result):
+        institute_id, students, tests, path = result
+        summary['archives'].append(path)
+        summary['students'] += students
+        summary['tests'] += tests
+        if progress:
+            progress(institute_id, students, tests)
+
+    jobs = institute_batches(spec, output_dir, chunk_size)
+    if workers <= 1:
+        for job in jobs:
+            collect(_write_job(job))
+        return summary
+
+    context = multiprocessing.get_context('fork')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = []
+        for job in jobs:
+            futures.append(pool.submit(_write_job, job))
+            # حد لعدد المعاهد المنتظرة حتى لا تتراكم بياناتها في الذاكرة
+            if len(futures) >= workers * 2:
+                collect(futures.pop(0).result())
+        for future in futures:
+            collect(future.result())
+    return summary
@@ -0,0 +1,416 @@
+"""
+Restore of backups written by ``fitness_management.backups``.
+
+Every file in the backup chain is checked against the SHA-256 checksums in its
+manifest before anything is written. Full JSON backups are loaded model by
+model in foreign-key dependency order with ``bulk_create`` batches: no
+``save()``, signals or per-row queries, original timestamps kept, secondary
+indexes dropped while a table loads and recreated afterwards, and foreign key
+checks deferred (``constraint_checks_disabled``) then verified at the end.
+Models on the same dependency level are independent and are loaded in
+parallel worker processes on backends that allow concurrent writers.
+
+``pg_dump`` backups are restored with ``pg_restore --jobs``. Incremental
+backups are then applied in chain order: deleted rows are removed and changed
+rows are upserted. Row counts are verified against every manifest, and the
+search index and statistics rollup are rebuilt at the end.
+"""
+
+import io
+import json
+import multiprocessing
+import os
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from django.apps import apps
+from django.core import serializers
+from django.core.management.color import no_style
+from django.db import connection, connections, models, transaction
+from django.utils import timezone
+from .backups import (
+    DELETIONS_FILE, MANIFEST_FILE, PIPE_BUFFER_SIZE, RESTORE_MARKER, BackupError, applied_migrations, backup_chain,
+    backup_root, decompressor, file_checksum, models_in_dependency_order, pg_command, read_manifest
+)
+from .hierarchy import invalidate_hierarchy
+from .models import ChangeLog
+
+RESTORE_BATCH_SIZE = 2000
+
+
+def resolve_backup(name_or_path, root=None):
+    """مسارات سلسلة النسخة المطلوبة من الاسم أو المسار"""
+    if os.path.isfile(os.path.join(name_or_path, MANIFEST_FILE)):
+        root, name = os.path.split(os.path.abspath(name_or_path))
+        return backup_chain(name, root)
+    return backup_chain(name_or_path, root or backup_root())
+
+
+def verify_checksums(paths):
+    """مقارنة بصمة كل ملف في السلسلة بما في البيان وإرجاع قائمة الأخطاء"""
+    problems = []
+    for path in paths:
+        manifest = read_manifest(path)
+        for filename, info in manifest['files'].items():
+            file_path = os.path.join(path, filename)
+            if not os.path.exists(file_path):
+                problems.append(f'{manifest["name"]}/{filename}: missing')
+            elif file_checksum(file_path) != info['sha256']:
+                problems.append(f'{manifest["name"]}/{filename}: checksum mismatch')
+    return problems
+
+
+@contextmanager
+def open_text(path, compression):
+    with open(path, 'rb') as raw, decompressor(raw, compression) as stream:
+        yield io.TextIOWrapper(stream, encoding='utf-8')
+
+
+def dependency_levels(models):
+    """
+    تقسيم النماذج لمستويات لا يعتمد أي نموذج فيها على نموذج آخر في نفس المستوى
+
+    يمكن تحميل نماذج المستوى الواحد بالتوازي بعد اكتمال المستويات السابقة.
+    """
+    models = models_in_dependency_order(models)
+    included = set(models)
+    level = {}
+    for model in models:
+        parents = [
+            field.related_model for field in model._meta.get_fields()
+            if field.concrete and (field.many_to_one or field.one_to_one or field.many_to_many)
+            and field.related_model in included and field.related_model is not model
+        ]
+        level[model] = max((level[parent] + 1 for parent in parents if parent in level), default=0)
+    levels = []
+    for model in models:
+        while len(levels) <= level[model]:
+            levels.append([])
+        levels[level[model]].append(model)
+    return levels
+
+
+@contextmanager
+def preserved_timestamps(model):
+    """تعطيل auto_now مؤقتاً حتى تُحفظ التواريخ الأصلية مع bulk_create"""
+    fields = [
+        (field, field.auto_now, field.auto_now_add) for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    for field, _, _ in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in fields:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def secondary_indexes(model, using=None):
+    """
+    فهارس Meta.indexes وفهارس حقول db_index الموجودة فعلاً في الجدول ككائنات Index
+
+    فهرس حقل db_index يُبنى باسمه الموجود في قاعدة البيانات. فهارس _like
+    الإضافية في PostgreSQL وفهارس المفاتيح الأجنبية التي يحتاجها MySQL تبقى كما هي.
+    """
+    conn = using or connection
+    with conn.cursor() as cursor:
+        constraints = conn.introspection.get_constraints(cursor, model._meta.db_table)
+    indexes = [index for index in model._meta.indexes if index.name in constraints]
+    declared = {index.name for index in model._meta.indexes}
+    for field in model._meta.local_concrete_fields:
+        if not field.db_index or field.unique:
+            continue
+        if conn.vendor == 'mysql' and field.is_relation and field.db_constraint:
+            continue
+        for name, info in constraints.items():
+            if (info['index'] and not info['unique'] and not info['primary_key'] and info['columns'] == [field.column]
+                    and name not in declared and not name.endswith('_like')):
+                indexes.append(models.Index(fields=[field.name], name=name))
+    return indexes
+
+
+@contextmanager
+def deferred_indexes(model, using=None):
+    """حذف الفهارس الثانوية أثناء تحميل الجدول وإعادة إنشائها بعده"""
+    conn = using or connection
+    indexes = secondary_indexes(model, conn)
+    with conn.schema_editor() as editor:
+        for index in indexes:
+            editor.remove_index(model, index)
+    try:
+        yield
+    finally:
+        with conn.schema_editor() as editor:
+            for index in indexes:
+                editor.add_index(model, index)
+
+
+def _m2m_fields(model):
+    return [field for field in model._meta.many_to_many if field.remote_field.through._meta.auto_created]
+
+
+def _write_batch(model, objects, m2m_rows, upsert, using):
+    manager = model._base_manager.using(using)
+    if upsert:
+        conn = connections[using]
+        fields = [field.name for field in model._meta.concrete_fields if not field.primary_key]
+        unique_fields = ['pk'] if conn.features.supports_update_conflicts_with_target else None
+        manager.bulk_create(objects, update_conflicts=True, update_fields=fields, unique_fields=unique_fields)
+    else:
+        manager.bulk_create(objects)
+
+    for field in _m2m_fields(model):
+        through = field.remote_field.through
+        source = field.m2m_field_name()
+        target = field.m2m_reverse_field_name()
+        owners = [pk for pk, _ in m2m_rows]
+        if upsert:
+            through._base_manager.using(using).filter(**{f'{source}__in': owners})._raw_delete(using)
+        through._base_manager.using(using).bulk_create([
+            through(**{f'{source}_id': pk, f'{target}_id': related_pk})
+            for pk, values in m2m_rows
+            for related_pk in values.get(field.name, ())
+        ])
+
+
+def load_model_file(model, path, compression, batch_size=RESTORE_BATCH_SIZE, upsert=False, using=None):
+    """تحميل ملف نموذج على دفعات وإرجاع عدد الصفوف المقروءة"""
+    using = using or connection.alias
+    rows = 0
+    objects, m2m_rows = [], []
+    with open_text(path, compression) as text, preserved_timestamps(model):
+        with transaction.atomic(using=using), connections[using].constraint_checks_disabled():
+            for deserialized in serializers.deserialize('jsonl', text, using=using, ignorenonexistent=True):
+                objects.append(deserialized.object)
+                if deserialized.m2m_data:
+                    m2m_rows.append((deserialized.object.pk, deserialized.m2m_data))
+                if len(objects) >= batch_size:
+                    _write_batch(model, objects, m2m_rows, upsert, using)
+                    rows += len(objects)
+                    objects, m2m_rows = [], []
+            if objects:
+                _write_batch(model, objects, m2m_rows, upsert, using)
+                rows += len(objects)
+    return rows
+
+
+def _load_job(job):
+    """تحميل نموذج كامل في عملية منفصلة"""
+    label, path, compression, batch_size, defer = job
+    model = apps.get_model(label)
+    started = time.monotonic()
+    if defer:
+        with deferred_indexes(model):
+            rows = load_model_file(model, path, compression, batch_size)
+    else:
+        rows = load_model_file(model, path, compression, batch_size)
+    return label, rows, time.monotonic() - started
+
+
+class Restorer:
+    """
+    استعادة سلسلة نسخ احتياطية (نسخة كاملة ثم النسخ التزايدية بعدها)
+
+    تتطلب الاستعادة الكاملة جداول فارغة، أو flush=True لحذف البيانات الحالية أولاً.
+    """
+
+    def __init__(self, name_or_path, workers=None, batch_size=RESTORE_BATCH_SIZE, flush=False,
+                 defer_indexes=True, check_migrations=True, using=None):
+        self.paths = resolve_backup(name_or_path)
+        self.manifests = [read_manifest(path) for path in self.paths]
+        self.connection = using or connection
+        self.batch_size = batch_size
+        self.flush = flush
+        self.defer_indexes = defer_indexes
+        self.check_migrations = check_migrations
+        if workers is None:
+            workers = min(4, os.cpu_count() or 1)
+        # SQLite يسمح بكاتب واحد فقط في نفس الوقت
+        self.workers = 1 if self.connection.vendor == 'sqlite' else max(1, workers)
+
+    @property
+    def base(self):
+        return self.manifests[0]
+
+    def models(self):
+        models = []
+        for entry in self.base['models']:
+            try:
+                models.append(apps.get_model(entry['model']))
+            except LookupError:
+                raise BackupError(f'Model {entry["model"]} from the backup does not exist')
+        return models
+
+    def verify(self):
+        """التحقق من البصمات وتوافق الترحيلات قبل الكتابة في قاعدة البيانات"""
+        problems = verify_checksums(self.paths)
+        if self.check_migrations and self.manifests[-1]['migrations'] != applied_migrations(self.connection):
+            problems.append('applied migrations differ from the backup, migrate to the same state first')
+        if problems:
+            raise BackupError('Backup verification failed: ' + '; '.join(problems))
+
+    def run(self, progress=None):
+        """تنفيذ الاستعادة وإرجاع عدد الصفوف لكل نموذج"""
+        started = time.monotonic()
+        self.verify()
+        models = self.models()
+        if self.flush:
+            self._flush(models)
+        else:
+            self._ensure_empty(models)
+
+        if self.base['engine'] == 'pg_dump':
+            self._restore_pg_dump(self.paths[0], self.base)
+        else:
+            self._restore_json(self.paths[0], self.base, models, progress)
+        self._verify_counts(self.base, models)
+
+        for path, manifest in zip(self.paths[1:], self.manifests[1:]):
+            self._apply_incremental(path, manifest, progress)
+
+        self._finish(models)
+        return {
+            'models': {model._meta.label_lower: model._base_manager.using(self.connection.alias).count() for model in models},
+            'backups': [manifest['name'] for manifest in self.manifests],
+            'duration': time.monotonic() - started,
+        }
+
+    def _tables(self, models):
+        tables = []
+        for model in models:
+            tables.append(model._meta.db_table)
+            tables.extend(field.remote_field.through._meta.db_table for field in _m2m_fields(model))
+        return tables
+
+    def _flush(self, models):
+        """حذف بيانات الجداول المستعادة وسجل التغييرات"""
+        tables = self._tables(models) + [ChangeLog._meta.db_table]
+        sql_list = self.connection.ops.sql_flush(no_style(), tables, reset_sequences=True, allow_cascade=True)
+        self.connection.ops.execute_sql_flush(sql_list)
+
+    def _ensure_empty(self, models):
+        if self.base['engine'] == 'pg_dump':
+            # pg_restore --clean يحذف الجداول ويعيد إنشاءها
+            return
+        filled = [model._meta.label_lower for model in models if model._base_manager.using(self.connection.alias).exists()]
+        if filled:
+            raise BackupError(f'Tables are not empty ({", ".join(filled)}), use flush to replace their data')
+
+    def _restore_json(self, path, manifest, models, progress):
+        files = {entry['model']: os.path.join(path, entry['file']) for entry in manifest['models']}
+        expected = {entry['model']: entry['rows'] for entry in manifest['models']}
+        jobs_by_level = [
+            [
+                (model._meta.label_lower, files[model._meta.label_lower], manifest['compression'],
+                 self.batch_size, self.defer_indexes)
+                for model in level
+            ]
+            for level in dependency_levels(models)
+        ]
+
+        def check(result):
+            label, rows, elapsed = result
+            if rows != expected[label]:
+                raise BackupError(f'{label}: read {rows} rows, manifest has {expected[label]}')
+            if progress:
+                progress(label, rows, elapsed)
+
+        if self.workers == 1:
+            for jobs in jobs_by_level:
+                for job in jobs:
+                    check(_load_job(job))
+            return
+
+        # لا تُورَّث اتصالات قاعدة البيانات للعمليات الفرعية
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as pool:
+            for jobs in jobs_by_level:
+                for result in pool.map(_load_job, jobs):
+                    check(result)
+
+    def _restore_pg_dump(self, path, manifest):
+        entry = next(iter(manifest['files']))
+        arguments = ['--clean', '--if-exists', '--no-owner', '--exit-on-error']
+        with tempfile.TemporaryDirectory(dir=backup_root()) as directory:
+            # pg_restore يحتاج ملفاً قابلاً للتنقل لاستخدام عدة عمليات
+            dump_path = os.path.join(directory, 'database.dump')
+            with open(os.path.join(path, entry), 'rb') as source, decompressor(source, manifest['compression']) as stream:
+                with open(dump_path, 'wb') as target:
+                    for chunk in iter(lambda: stream.read(PIPE_BUFFER_SIZE), b''):
+                        target.write(chunk)
+            if self.workers > 1:
+                arguments.append(f'--jobs={self.workers}')
+            else:
+                arguments.append('--single-transaction')
+            command, env = pg_command(self.connection, 'pg_restore', arguments)
+            result = subprocess.run(command + [dump_path], env=env, capture_output=True)
+            if result.returncode != 0:
+                raise BackupError(f'pg_restore failed: {result.stderr.decode(errors="replace").strip()}')
+
+    def _verify_counts(self, manifest, models):
+        by_label = {model._meta.label_lower: model for model in models}
+        mismatches = []
+        for entry in manifest['models']:
+            count = by_label[entry['model']]._base_manager.using(self.connection.alias).count()
+            if count != entry['rows']:
+                mismatches.append(f'{entry["model"]}: {count} rows, manifest has {entry["rows"]}')
+        if mismatches:
+            raise BackupError('Row counts differ after restore: ' + '; '.join(mismatches))
+
+    def _apply_incremental(self, path, manifest, progress):
+        """حذف الصفوف المحذوفة ثم إضافة أو تحديث الصفوف المعدلة"""
+        alias = self.connection.alias
+        compression = manifest['compression']
+        deletions = {}
+        deletions_file = next(filename for filename in manifest['files'] if filename.startswith(DELETIONS_FILE))
+        with open_text(os.path.join(path, deletions_file), compression) as text:
+            for line in text:
+                if line.strip():
+                    deletion = json.loads(line)
+                    deletions.setdefault(deletion['model'], []).append(deletion['pk'])
+
+        models = [apps.get_model(entry['model']) for entry in manifest['models']]
+        with transaction.atomic(using=alias):
+            for model in reversed(models_in_dependency_order(models)):
+                pks = deletions.get(model._meta.label_lower)
+                if pks:
+                    model._base_manager.using(alias).filter(pk__in=pks)._raw_delete(alias)
+            for entry in manifest['models']:
+                if not entry['rows']:
+                    continue
+                model = apps.get_model(entry['model'])
+                rows = load_model_file(
+                    model, os.path.join(path, entry['file']), compression, self.batch_size, upsert=True, using=alias
+                )
+                if rows != entry['rows']:
+                    raise BackupError(f'{manifest["name"]}/{entry["model"]}: read {rows} rows, manifest has {entry["rows"]}')
+                if progress:
+                    progress(f'{manifest["name"]}:{entry["model"]}', rows, None)
+
+    def _finish(self, models):
+        """التحقق من العلاقات وضبط التسلسلات وإعادة بناء البيانات المحسوبة"""
+        from . import rollups
+        from .search import get_search_backend
+
+        self.connection.check_constraints(table_names=self._tables(models))
+        sequence_sql = self.connection.ops.sequence_reset_sql(no_style(), models)
+        if sequence_sql:
+            with self.connection.cursor() as cursor:
+                for sql in sequence_sql:
+                    cursor.execute(sql)
+
+        # الإحصائيات المجمعة لا تدخل في النسخ التزايدية وفهرس البحث لا يدخل في أي نسخة
+        if len(self.manifests) > 1:
+            rollups.rebuild()
+        backend = get_search_backend(self.connection)
+        if backend.available:
+            backend.rebuild()
+        invalidate_hierarchy()
+
+        os.makedirs(backup_root(), exist_ok=True)
+        with open(os.path.join(backup_root(), RESTORE_MARKER), 'w', encoding='utf-8') as f:
+            json.dump({'restored': self.manifests[-1]['name'], 'at': timezone.now().isoformat()}, f)
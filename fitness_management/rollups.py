@@ -0,0 +1,224 @@
+"""
+Maintenance of the StatisticsRollup table.
+
+Inserts are applied as F() increments on the affected bucket, and the rows
+removed by one delete (including its cascade) are subtracted with one update
+per bucket. Changes that
+can move a student between buckets or lower a min/max are handled by
+recomputing only the buckets involved. ``rebuild`` recreates the whole table
+from two grouped queries and is used by the migration and the
+``rebuild_statistics_rollup`` command.
+"""
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, Max, Min, Q, Sum, Value, When
+
+KEY_FIELDS = ('academic_year_id', 'institute_id', 'gender', 'education_level')
+REBUILD_BATCH_SIZE = 1000
+
+
+def student_key(student):
+    """مفتاح المجموعة التي ينتمي إليها الطالب"""
+    values = tuple(student.__dict__.get(field) for field in KEY_FIELDS)
+    if None in values and student.pk:
+        # الحقول مؤجلة في هذه النسخة من الطالب
+        return student_key_by_id(student.pk)
+    return values
+
+
+def student_key_by_id(student_id):
+    """مفتاح مجموعة الطالب كما هو محفوظ في قاعدة البيانات"""
+    from .models import Student
+    values = Student.objects.filter(pk=student_id).values_list(*KEY_FIELDS).first()
+    return tuple(values) if values else None
+
+
+def student_keys_by_id(student_ids):
+    """مفاتيح مجموعات عدة طلاب باستعلام واحد ({معرف الطالب: المفتاح})"""
+    from .models import Student
+    return {
+        row[0]: tuple(row[1:])
+        for row in Student.objects.filter(pk__in=student_ids).values_list('pk', *KEY_FIELDS)
+    }
+
+
+def test_key(student_test):
+    """مفتاح مجموعة الطالب صاحب نتيجة الاختبار"""
+    student = student_test._state.fields_cache.get('student')
+    if student is not None:
+        return student_key(student)
+    return student_key_by_id(student_test.student_id)
+
+
+def _key_filter(key):
+    return dict(zip(KEY_FIELDS, key))
+
+
+def _bucket(key):
+    from .models import StatisticsRollup
+    return StatisticsRollup.objects.filter(**_key_filter(key))
+
+
+def _ensure_bucket(key):
+    """إنشاء صف المجموعة إذا لم يكن موجوداً"""
+    from .models import Institute, StatisticsRollup
+    department_id, region_id = Institute.objects.values_list(
+        'department_id', 'department__region_id'
+    ).get(pk=key[1])
+    StatisticsRollup.objects.get_or_create(
+        **_key_filter(key), defaults={'department_id': department_id, 'region_id': region_id}
+    )
+
+
+def _increment(key, **changes):
+    """تطبيق الزيادة على المجموعة وإنشاؤها عند أول إضافة"""
+    with transaction.atomic():
+        if not _bucket(key).update(**changes):
+            _ensure_bucket(key)
+            _bucket(key).update(**changes)
+
+
+def add_student(key):
+    _increment(key, student_count=F('student_count') + 1)
+
+
+def remove_students(counts):
+    """إنقاص عدد الطلاب المحذوفين من مجموعاتهم ({المفتاح: العدد})"""
+    for key, count in counts.items():
+        _bucket(key).update(student_count=F('student_count') - count)
+
+
+def add_test(key, score):
+    value = Value(score, output_field=DecimalField(max_digits=5, decimal_places=2))
+    _increment(
+        key,
+        test_count=F('test_count') + 1,
+        score_sum=F('score_sum') + value,
+        score_min=Case(
+            When(Q(score_min__isnull=True) | Q(score_min__gt=score), then=value),
+            default=F('score_min'),
+        ),
+        score_max=Case(
+            When(Q(score_max__isnull=True) | Q(score_max__lt=score), then=value),
+            default=F('score_max'),
+        ),
+    )
+
+
+def remove_tests(scores_by_key):
+    """
+    حذف نتائج من مجموعاتها ({المفتاح: [الدرجات]}) بتحديث واحد لكل مجموعة
+
+    يُعاد حساب الحدود فقط إذا كانت إحدى الدرجات المحذوفة حداً للمجموعة،
+    وتُتجاوز المجموعات المحذوفة مع معهدها.
+    """
+    from .models import StatisticsRollup, StudentTest
+    if not scores_by_key:
+        return
+    with transaction.atomic():
+        for key, scores in scores_by_key.items():
+            total = Value(sum(scores), output_field=DecimalField(max_digits=14, decimal_places=2))
+            _bucket(key).update(test_count=F('test_count') - len(scores), score_sum=F('score_sum') - total)
+
+        # حدود المجموعات الباقية تُقرأ باستعلام واحد، وما كانت إحدى الدرجات المحذوفة حداً له
+        # يُعاد حسابه باستعلام مجمع واحد
+        stale = []
+        rows = StatisticsRollup.objects.filter(institute_id__in={key[1] for key in scores_by_key}).values_list(
+            *KEY_FIELDS, 'score_min', 'score_max'
+        )
+        for row in rows:
+            key, (score_min, score_max) = tuple(row[:len(KEY_FIELDS)]), row[len(KEY_FIELDS):]
+            scores = scores_by_key.get(key)
+            if scores and (score_min is None or score_min >= min(scores) or score_max <= max(scores)):
+                stale.append(key)
+        if not stale:
+            return
+        bounds = {
+            tuple(row[:len(KEY_FIELDS)]): row[len(KEY_FIELDS):]
+            for row in StudentTest.objects.filter(student__institute_id__in={key[1] for key in stale}).order_by()
+            .values_list(*(f'student__{field}' for field in KEY_FIELDS))
+            .annotate(score_min=Min('score'), score_max=Max('score'))
+        }
+        for key in stale:
+            score_min, score_max = bounds.get(key, (None, None))
+            _bucket(key).update(score_min=score_min, score_max=score_max)
+
+
+def refresh_bucket(key):
+    """إعادة حساب مجموعة واحدة من البيانات الأصلية"""
+    from .models import Student
+    with transaction.atomic():
+        student_count = Student.objects.filter(**_key_filter(key)).count()
+        tests = _test_queryset(key).aggregate(
+            test_count=Count('id'), score_sum=Sum('score'), score_min=Min('score'), score_max=Max('score')
+        )
+        tests['score_sum'] = tests['score_sum'] or 0
+        if student_count or tests['test_count']:
+            _ensure_bucket(key)
+            _bucket(key).update(student_count=student_count, **tests)
+        else:
+            _bucket(key).delete()
+
+
+def _test_queryset(key):
+    from .models import StudentTest
+    return StudentTest.objects.filter(**{f'student__{field}': value for field, value in _key_filter(key).items()})
+
+
+def rebuild(student_model=None, student_test_model=None, rollup_model=None, batch_size=REBUILD_BATCH_SIZE):
+    """
+    إعادة بناء جدول الإحصائيات بالكامل وإرجاع عدد المجموعات
+
+    تقبل الدالة نماذج بديلة حتى يمكن استخدامها من ملفات الترحيل.
+    """
+    if student_model is None:
+        from .models import StatisticsRollup, Student, StudentTest
+        student_model, student_test_model, rollup_model = Student, StudentTest, StatisticsRollup
+
+    buckets = {}
+    student_rows = (
+        student_model.objects.order_by()
+        .values(*KEY_FIELDS)
+        .annotate(
+            student_count=Count('id'),
+            department=Max('institute__department_id'),
+            region=Max('institute__department__region_id'),
+        )
+    )
+    for row in student_rows:
+        key = tuple(row[field] for field in KEY_FIELDS)
+        buckets[key] = {
+            'student_count': row['student_count'],
+            'department_id': row['department'],
+            'region_id': row['region'],
+        }
+
+    test_rows = (
+        student_test_model.objects.order_by()
+        .values(*(f'student__{field}' for field in KEY_FIELDS))
+        .annotate(
+            test_count=Count('id'),
+            score_sum=Sum('score'),
+            score_min=Min('score'),
+            score_max=Max('score'),
+        )
+    )
+    for row in test_rows:
+        key = tuple(row[f'student__{field}'] for field in KEY_FIELDS)
+        bucket = buckets.get(key)
+        if bucket is None:
+            continue
+        bucket.update(
+            test_count=row['test_count'],
+            score_sum=row['score_sum'] or 0,
+            score_min=row['score_min'],
+            score_max=row['score_max'],
+        )
+
+    with transaction.atomic():
+        rollup_model.objects.all().delete()
+        rollup_model.objects.bulk_create(
+            (rollup_model(**_key_filter(key), **values) for key, values in buckets.items()),
+            batch_size=batch_size,
+        )
+    return len(buckets)
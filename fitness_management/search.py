@@ -0,0 +1,258 @@
+"""
+Full-text search index for students.
+
+SQLite uses an FTS5 virtual table, PostgreSQL a table holding a trigram-indexed
+document and a tsvector. Other backends fall back to prefix lookups on the
+normalized name columns.
+"""
+
+import re
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from .arabic import normalize_arabic, prefix_q
+
+SEARCH_TABLE = 'fitness_management_student_search'
+INDEX_BATCH_SIZE = 1000
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(query):
+    """تقسيم نص البحث إلى كلمات بعد توحيد الحروف"""
+    return _TOKEN_RE.findall(normalize_arabic(query))
+
+
+class BaseSearchBackend:
+    """الواجهة المشتركة لمحركات البحث"""
+
+    # ترتيب نتائج البحث بالبادئة، ويُستخدم أيضاً عند تعذر استخدام جدول الفهرس
+    prefix_ordering = ('name_normalized', 'id')
+    # ترتيب النتائج حسب الصلة ثم المعرف لضمان ثبات الترتيب
+    rank_ordering = prefix_ordering
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    @property
+    def available(self):
+        return False
+
+    def index_students(self, student_ids):
+        """تحديث الفهرس لمجموعة من الطلاب"""
+
+    def index_institute(self, institute_id):
+        """تحديث الفهرس لجميع طلاب المعهد"""
+
+    def remove_students(self, student_ids):
+        """حذف الطلاب من الفهرس"""
+
+    def rebuild(self):
+        """إعادة بناء الفهرس بالكامل"""
+        return 0
+
+    def search(self, queryset, query):
+        """
+        تصفية الطلاب حسب بداية الاسم الموحد أو الرقم القومي أو اسم المعهد
+
+        تُرجع (الاستعلام، الترتيب المطبق عليه) لأن الترتيب بالصلة لا يتوفر إلا عند استخدام الفهرس.
+        """
+        normalized = normalize_arabic(query)
+        return queryset.filter(
+            prefix_q('name_normalized', normalized) |
+            Q(national_id__startswith=query.strip()) |
+            prefix_q('institute__name_normalized', normalized)
+        ).order_by(*self.prefix_ordering), self.prefix_ordering
+
+    def _table_exists(self):
+        with self.connection.cursor() as cursor:
+            return SEARCH_TABLE in self.connection.introspection.table_names(cursor)
+
+    def _documents(self, queryset):
+        """قراءة بيانات الفهرس على دفعات"""
+        return queryset.values_list(
+            'id', 'name_normalized', 'national_id', 'institute__name_normalized'
+        ).order_by().iterator(chunk_size=INDEX_BATCH_SIZE)
+
+    def _student_queryset(self, **filters):
+        from .models import Student
+        return Student.objects.filter(**filters)
+
+
+class TableSearchBackend(BaseSearchBackend):
+    """أساس المحركات التي تعتمد على جدول فهرس منفصل"""
+
+    _available = None
+
+    @property
+    def available(self):
+        if self._available is None:
+            self._available = self._table_exists()
+        return self._available
+
+    def index_students(self, student_ids):
+        if not self.available or not student_ids:
+            return
+        self._write(self._documents(self._student_queryset(id__in=list(student_ids))))
+
+    def index_institute(self, institute_id):
+        if not self.available:
+            return
+        self._write(self._documents(self._student_queryset(institute_id=institute_id)))
+
+    def rebuild(self):
+        if not self.available:
+            return 0
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        return self._write(self._documents(self._student_queryset()))
+
+    def _write(self, rows):
+        """كتابة الوثائق في الفهرس على دفعات وإرجاع عددها"""
+        total = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= INDEX_BATCH_SIZE:
+                self._write_batch(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            self._write_batch(batch)
+            total += len(batch)
+        return total
+
+    def _write_batch(self, batch):
+        raise NotImplementedError
+
+
+class SQLiteSearchBackend(TableSearchBackend):
+    """البحث باستخدام FTS5 في SQLite"""
+
+    # bm25 يعيد قيمة سالبة، والأصغر هو الأكثر صلة
+    rank_ordering = ('search_rank', 'id')
+
+    def remove_students(self, student_ids):
+        if not self.available or not student_ids:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s',
+                [(student_id,) for student_id in student_ids]
+            )
+
+    def _write_batch(self, batch):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s',
+                [(row[0],) for row in batch]
+            )
+            cursor.executemany(
+                f'INSERT INTO {SEARCH_TABLE} (rowid, name, national_id, institute_name) '
+                f'VALUES (%s, %s, %s, %s)',
+                batch
+            )
+
+    def build_match(self, query):
+        """تحويل نص البحث إلى تعبير MATCH بالبحث عن بدايات الكلمات"""
+        return ' '.join('"%s"*' % token.replace('"', '""') for token in tokenize(query))
+
+    def search(self, queryset, query):
+        if not self.available:
+            return super().search(queryset, query)
+        match = self.build_match(query)
+        if not match:
+            return queryset.none(), self.prefix_ordering
+        student_table = queryset.model._meta.db_table
+        return queryset.filter(
+            id__in=RawSQL(f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s', [match])
+        ).annotate(
+            search_rank=RawSQL(
+                f'SELECT bm25({SEARCH_TABLE}, 10.0, 5.0, 1.0) FROM {SEARCH_TABLE} '
+                f'WHERE {SEARCH_TABLE} MATCH %s AND rowid = {student_table}.id',
+                [match]
+            )
+        ).order_by(*self.rank_ordering), self.rank_ordering
+
+
+class PostgreSQLSearchBackend(TableSearchBackend):
+    """البحث باستخدام pg_trgm و tsvector في PostgreSQL"""
+
+    rank_ordering = ('-search_rank', 'id')
+
+    def remove_students(self, student_ids):
+        if not self.available or not student_ids:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {SEARCH_TABLE} WHERE student_id = ANY(%s)',
+                [list(student_ids)]
+            )
+
+    def _write_batch(self, batch):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {SEARCH_TABLE} (student_id, document, vector) '
+                f"VALUES (%s, %s, to_tsvector('simple', %s)) "
+                f'ON CONFLICT (student_id) DO UPDATE '
+                f'SET document = EXCLUDED.document, vector = EXCLUDED.vector',
+                [(row[0], self.build_document(row[1:]), self.build_document(row[1:])) for row in batch]
+            )
+
+    def build_document(self, values):
+        return ' '.join(value or '' for value in values)
+
+    def build_tsquery(self, query):
+        return ' & '.join('%s:*' % token for token in tokenize(query))
+
+    def search(self, queryset, query):
+        if not self.available:
+            return super().search(queryset, query)
+        tsquery = self.build_tsquery(query)
+        if not tsquery:
+            return queryset.none(), self.prefix_ordering
+        pattern = '%%%s%%' % normalize_arabic(query).replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        student_table = queryset.model._meta.db_table
+        return queryset.filter(
+            id__in=RawSQL(
+                f'SELECT student_id FROM {SEARCH_TABLE} '
+                f"WHERE vector @@ to_tsquery('simple', %s) OR document ILIKE %s",
+                [tsquery, pattern]
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                f"SELECT ts_rank(vector, to_tsquery('simple', %s)) + similarity(document, %s) "
+                f'FROM {SEARCH_TABLE} WHERE student_id = {student_table}.id',
+                [tsquery, normalize_arabic(query)]
+            )
+        ).order_by(*self.rank_ordering), self.rank_ordering
+
+
+_BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgreSQLSearchBackend,
+}
+
+_backend_cache = {}
+
+
+def get_search_backend(using=None):
+    """الحصول على محرك البحث المناسب لقاعدة البيانات الحالية"""
+    conn = using or connection
+    key = (conn.alias, conn.settings_dict['NAME'])
+    if key not in _backend_cache:
+        backend_class = _BACKENDS.get(conn.vendor, BaseSearchBackend)
+        _backend_cache[key] = backend_class(conn)
+    return _backend_cache[key]
+
+
+def search_students(queryset, query):
+    """
+    البحث في الطلاب مع ترتيب النتائج حسب الصلة
+
+    تُرجع (الاستعلام، الترتيب المطبق)، والترتيب None إذا كان نص البحث فارغاً ولم يتغير الاستعلام.
+    """
+    query = (query or '').strip()
+    if not query:
+        return queryset, None
+    return get_search_backend().search(queryset, query)
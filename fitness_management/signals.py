@@ -0,0 +1,222 @@
+"""
+Signal handlers for fitness_management app.
+"""
+
+import threading
+from collections import Counter, defaultdict
+from django.db import connections, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from . import backups, rollups
+from .hierarchy import invalidate_hierarchy
+from .models import ChangeLog, Department, Institute, Region, Student, StudentTest
+from .search import get_search_backend
+
+
+@receiver(post_save, sender=Student)
+def index_student(sender, instance, raw=False, **kwargs):
+    """تحديث فهرس البحث عند حفظ الطالب"""
+    if raw:
+        return
+    get_search_backend().index_students([instance.pk])
+
+
+@receiver(pre_save, sender=Institute)
+def remember_institute_name(sender, instance, raw=False, **kwargs):
+    """حفظ الاسم السابق للمعهد لمعرفة ما إذا تغير"""
+    if raw or not instance.pk:
+        instance._previous_name = None
+        return
+    instance._previous_name = (
+        Institute.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Institute)
+def reindex_institute_students(sender, instance, created, raw=False, **kwargs):
+    """إعادة فهرسة طلاب المعهد عند تغيير اسمه"""
+    if raw or created:
+        return
+    if getattr(instance, '_previous_name', None) != instance.name:
+        get_search_backend().index_institute(instance.pk)
+
+
+@receiver(post_save, sender=Region)
+@receiver(post_delete, sender=Region)
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+@receiver(post_save, sender=Institute)
+@receiver(post_delete, sender=Institute)
+def refresh_hierarchy(sender, **kwargs):
+    """تحديث نسخة الهيكل الإداري في جميع العمليات بعد اكتمال المعاملة"""
+    transaction.on_commit(invalidate_hierarchy)
+
+
+@receiver(pre_save, sender=Student)
+def remember_student_rollup_key(sender, instance, raw=False, **kwargs):
+    """حفظ مجموعة الإحصائيات السابقة للطالب لمعرفة ما إذا تغيرت"""
+    if raw or not instance.pk:
+        instance._previous_rollup_key = None
+        return
+    instance._previous_rollup_key = rollups.student_key_by_id(instance.pk)
+
+
+@receiver(post_save, sender=Student)
+def update_student_rollup(sender, instance, created, raw=False, **kwargs):
+    """تحديث الإحصائيات المجمعة عند إضافة الطالب أو نقله لمجموعة أخرى"""
+    if raw:
+        return
+    key = rollups.student_key(instance)
+    if created:
+        rollups.add_student(key)
+        return
+    previous_key = getattr(instance, '_previous_rollup_key', None)
+    if previous_key != key:
+        if previous_key is not None:
+            rollups.refresh_bucket(previous_key)
+        rollups.refresh_bucket(key)
+
+
+@receiver(pre_save, sender=StudentTest)
+def remember_student_test_score(sender, instance, raw=False, **kwargs):
+    """حفظ الطالب والدرجة السابقين لنتيجة الاختبار لمعرفة ما إذا تغيرا"""
+    if raw or not instance.pk:
+        instance._previous_result = None
+        return
+    instance._previous_result = (
+        StudentTest.objects.filter(pk=instance.pk).values_list('student_id', 'score').first()
+    )
+
+
+@receiver(post_save, sender=StudentTest)
+def update_student_test_rollup(sender, instance, created, raw=False, **kwargs):
+    """تحديث الإحصائيات المجمعة عند إضافة نتيجة اختبار أو تعديل درجتها"""
+    if raw:
+        return
+    key = rollups.test_key(instance)
+    if key is None:
+        return
+    if created:
+        rollups.add_test(key, instance.score)
+        return
+    previous = getattr(instance, '_previous_result', None)
+    if previous is None or previous == (instance.student_id, instance.score):
+        return
+    if previous[0] != instance.student_id:
+        previous_key = rollups.student_key_by_id(previous[0])
+        if previous_key is not None and previous_key != key:
+            rollups.refresh_bucket(previous_key)
+    rollups.refresh_bucket(key)
+
+
+class _DeletionBatch:
+    """الصفوف المحذوفة بعملية delete واحدة مع ما يلزم لتحديث البيانات المحسوبة"""
+
+    def __init__(self, block):
+        self.block = block
+        self.pending = 0
+        self.student_keys = {}
+        self.test_scores = []
+        self.deleted = defaultdict(list)
+
+
+_deletions = threading.local()
+
+
+def _deletion_batch(using):
+    """
+    دفعة الحذف الجارية على قاعدة البيانات using
+
+    Django يرسل pre_delete لكل الصفوف المحذوفة (ومنها المحذوفة بالتتابع)
+    قبل أول post_delete داخل معاملة الحذف، فتُطبق الدفعة عند آخر post_delete.
+    الدفعة التي بقيت من معاملة أخرى فشل فيها الحذف تُهمل.
+    """
+    batches = _deletions.__dict__.setdefault('batches', {})
+    conn = connections[using]
+    block = conn.atomic_blocks[-1] if conn.atomic_blocks else None
+    batch = batches.get(using)
+    if batch is None or batch.block is not block:
+        batch = batches[using] = _DeletionBatch(block)
+    return batch
+
+
+def collect_deleted_row(sender, instance, using, **kwargs):
+    """حفظ مجموعة الإحصائيات للطالب أو النتيجة قبل حذفها"""
+    batch = _deletion_batch(using)
+    batch.pending += 1
+    if sender is Student:
+        batch.student_keys[instance.pk] = rollups.student_key(instance)
+    elif sender is StudentTest:
+        batch.test_scores.append((instance.student_id, instance.score))
+
+
+def apply_deleted_rows(sender, instance, using, **kwargs):
+    """تسجيل الصف المحذوف وتطبيق الدفعة كاملة بعد آخر صف فيها"""
+    batch = _deletion_batch(using)
+    batch.deleted[sender].append(instance.pk)
+    batch.pending -= 1
+    if batch.pending > 0:
+        return
+    del _deletions.batches[using]
+
+    students = batch.deleted.get(Student, [])
+    # مجموعات المعاهد المحذوفة حُذفت معها بالتتابع فلا تحتاج تحديثاً
+    deleted_institutes = set(batch.deleted.get(Institute, []))
+
+    def kept(key):
+        return key is not None and key[1] not in deleted_institutes
+
+    rollups.remove_students(Counter(
+        batch.student_keys[pk] for pk in students if kept(batch.student_keys.get(pk))
+    ))
+    if batch.test_scores:
+        # الطلاب المحذوفون مع نتائجهم معروفة مفاتيحهم، والباقون يُقرؤون باستعلام واحد
+        keys = dict(batch.student_keys)
+        missing = {student_id for student_id, _ in batch.test_scores} - keys.keys()
+        if missing:
+            keys.update(rollups.student_keys_by_id(missing))
+        scores = defaultdict(list)
+        for student_id, score in batch.test_scores:
+            if kept(keys.get(student_id)):
+                scores[keys[student_id]].append(score)
+        rollups.remove_tests(scores)
+    if students:
+        get_search_backend().remove_students(students)
+
+    # سجل التغييرات بإدخال واحد لكل نموذج بدلاً من صف لكل حذف
+    for model, pks in batch.deleted.items():
+        if model in tracked_models:
+            ChangeLog.record(model, pks, action='delete')
+
+
+def record_saved_row(sender, instance, raw=False, **kwargs):
+    """تسجيل الصف المحفوظ في سجل التغييرات للنسخ التزايدية"""
+    if raw:
+        return
+    ChangeLog.objects.create(model=sender._meta.label_lower, object_id=instance.pk, action='save')
+
+
+def record_m2m_change(sender, instance, action, reverse, model, pk_set, **kwargs):
+    """العلاقات المتعددة تُحفظ مع الصف الذي يملك الحقل"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        ChangeLog.record(type(instance), [instance.pk])
+    elif pk_set:
+        ChangeLog.record(model, pk_set)
+
+
+tracked_models = set(backups.change_tracked_models())
+
+for tracked_model in tracked_models:
+    label = tracked_model._meta.label_lower
+    post_save.connect(record_saved_row, sender=tracked_model, dispatch_uid=f'changelog_save_{label}')
+    for field in tracked_model._meta.many_to_many:
+        through = field.remote_field.through
+        if through._meta.auto_created:
+            m2m_changed.connect(record_m2m_change, sender=through, dispatch_uid=f'changelog_m2m_{through._meta.label_lower}')
+
+for deleted_model in tracked_models | {Student, StudentTest}:
+    label = deleted_model._meta.label_lower
+    pre_delete.connect(collect_deleted_row, sender=deleted_model, dispatch_uid=f'deletion_collect_{label}')
+    post_delete.connect(apply_deleted_rows, sender=deleted_model, dispatch_uid=f'deletion_apply_{label}')
@@ -0,0 +1,161 @@
+"""
+Time series of statistics snapshots.
+
+Every hour the statistics rollup is read with a single grouped query and one
+compact row per scope (national, region, department, institute) is upserted
+into ``StatisticsSnapshot``. Hourly points older than
+``SNAPSHOT_HOURLY_DAYS`` are merged into daily points and daily points older
+than ``SNAPSHOT_DAILY_DAYS`` into weekly points, keeping the last value of
+each period since the metrics are counts at a point in time. A year of trend
+data for one scope is then a few hundred rows read from one index.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+from .models import ChangeLog, StatisticsRollup, StatisticsSnapshot
+
+SNAPSHOT_HOURLY_DAYS = 7
+SNAPSHOT_DAILY_DAYS = 365
+
+COUNT_METRICS = (
+    'student_count', 'test_count', 'male_students', 'female_students',
+    'primary_students', 'middle_students', 'secondary_students',
+)
+METRICS = COUNT_METRICS + ('score_sum',)
+UNIQUE_FIELDS = ['scope', 'scope_id', 'resolution', 'timestamp']
+
+
+def period_start(moment, resolution):
+    """بداية الساعة أو اليوم أو الأسبوع بالتوقيت المحلي"""
+    moment = timezone.localtime(moment).replace(minute=0, second=0, microsecond=0)
+    if resolution == 'hour':
+        return moment
+    moment = moment.replace(hour=0)
+    if resolution == 'week':
+        moment -= timedelta(days=moment.weekday())
+    return moment
+
+
+def profile_scope(user_profile):
+    """نطاق اللقطات الخاص بالمستخدم"""
+    scope = {
+        'region_admin': ('region', user_profile.region_id),
+        'department_admin': ('department', user_profile.department_id),
+        'institute_admin': ('institute', user_profile.institute_id),
+    }.get(user_profile.user_type)
+    return scope or ('national', 0)
+
+
+def _upsert(snapshots):
+    kwargs = {'update_conflicts': True, 'update_fields': list(METRICS)}
+    if connection.features.supports_update_conflicts_with_target:
+        kwargs['unique_fields'] = UNIQUE_FIELDS
+    StatisticsSnapshot.objects.bulk_create(snapshots, **kwargs)
+
+
+def capture_snapshot(moment=None):
+    """تسجيل لقطة الساعة الحالية لكل النطاقات من الإحصائيات المجمعة وإرجاع عدد الصفوف"""
+    timestamp = period_start(moment or timezone.now(), 'hour')
+    rows = StatisticsRollup.objects.values(
+        'region_id', 'department_id', 'institute_id', 'gender', 'education_level'
+    ).annotate(
+        students=Sum('student_count'), tests=Sum('test_count'), scores=Sum('score_sum')
+    ).order_by()
+
+    totals = {}
+    for row in rows:
+        scopes = [
+            ('national', 0),
+            ('region', row['region_id']),
+            ('department', row['department_id']),
+            ('institute', row['institute_id']),
+        ]
+        for scope in scopes:
+            if scope[1] is None:
+                continue
+            values = totals.setdefault(scope, dict.fromkeys(COUNT_METRICS, 0))
+            values.setdefault('score_sum', Decimal('0'))
+            values['student_count'] += row['students'] or 0
+            values['test_count'] += row['tests'] or 0
+            values['score_sum'] += row['scores'] or 0
+            gender_key = f"{row['gender']}_students"
+            if gender_key in values:
+                values[gender_key] += row['students'] or 0
+            level_key = f"{row['education_level']}_students"
+            if level_key in values:
+                values[level_key] += row['students'] or 0
+
+    with transaction.atomic():
+        _upsert([
+            StatisticsSnapshot(timestamp=timestamp, resolution='hour', scope=scope, scope_id=scope_id, **values)
+            for (scope, scope_id), values in totals.items()
+        ])
+        # bulk_create لا يرسل إشارات، فتُسجل الصفوف للنسخ الاحتياطية التزايدية
+        ChangeLog.record_queryset(StatisticsSnapshot.objects.filter(resolution='hour', timestamp=timestamp))
+    return len(totals)
+
+
+def _merge(source, target, cutoff):
+    """دمج لقطات الدقة source الأقدم من cutoff في لقطات الدقة target"""
+    cutoff = period_start(cutoff, target)
+    old = StatisticsSnapshot.objects.filter(resolution=source, timestamp__lt=cutoff)
+    latest = {}
+    for snapshot in old.order_by('timestamp').iterator(chunk_size=2000):
+        latest[(snapshot.scope, snapshot.scope_id, period_start(snapshot.timestamp, target))] = snapshot
+
+    with transaction.atomic():
+        _upsert([
+            StatisticsSnapshot(
+                timestamp=timestamp, resolution=target, scope=scope, scope_id=scope_id,
+                **{metric: getattr(snapshot, metric) for metric in METRICS}
+            )
+            for (scope, scope_id, timestamp), snapshot in latest.items()
+        ])
+        ChangeLog.record_queryset(StatisticsSnapshot.objects.filter(
+            resolution=target, timestamp__in={timestamp for _, _, timestamp in latest}
+        ))
+        ChangeLog.record_queryset(old, action='delete')
+        old._raw_delete(old.db)
+    return len(latest)
+
+
+def downsample(now=None):
+    """تقليل دقة اللقطات القديمة وإرجاع عدد النقاط المدمجة"""
+    now = now or timezone.now()
+    hourly_days = getattr(settings, 'SNAPSHOT_HOURLY_DAYS', SNAPSHOT_HOURLY_DAYS)
+    daily_days = getattr(settings, 'SNAPSHOT_DAILY_DAYS', SNAPSHOT_DAILY_DAYS)
+    merged = _merge('hour', 'day', now - timedelta(days=hourly_days))
+    merged += _merge('day', 'week', now - timedelta(days=daily_days))
+    return merged
+
+
+def series(scope, scope_id=0, start=None, end=None, metrics=METRICS):
+    """
+    نقاط النطاق مرتبة زمنياً كقوائم متوازية جاهزة للرسم البياني
+
+    يُضاف متوسط الدرجات (مجموع الدرجات على عدد الاختبارات) لكل نقطة.
+    """
+    snapshots = StatisticsSnapshot.objects.filter(scope=scope, scope_id=scope_id or 0)
+    if start is not None:
+        snapshots = snapshots.filter(timestamp__gte=start)
+    if end is not None:
+        snapshots = snapshots.filter(timestamp__lte=end)
+    rows = list(snapshots.order_by('timestamp').values_list('timestamp', 'resolution', *METRICS))
+
+    columns = dict(zip(('timestamp', 'resolution') + METRICS, zip(*rows))) if rows else {}
+    data = {
+        'timestamps': [timestamp.isoformat() for timestamp in columns.get('timestamp', ())],
+        'resolution': list(columns.get('resolution', ())),
+    }
+    for metric in metrics:
+        values = columns.get(metric, ())
+        data[metric] = [float(value) for value in values] if metric == 'score_sum' else list(values)
+    data['average_score'] = [
+        round(float(scores) / tests, 2) if tests else 0
+        for scores, tests in zip(columns.get('score_sum', ()), columns.get('test_count', ()))
+    ]
+    return data
@@ -0,0 +1,133 @@
+"""
+Aggregated statistics for students and test results.
+
+Each breakdown is computed in a single query: students from the rollup table,
+test results grouped by test. Totals are then derived in Python from the
+grouped rows.
+"""
+
+from django.db.models import Avg, Count, Max, Min, Sum
+from .models import Student
+
+
+def rollup_statistics(rollups):
+    """
+    إحصائيات الطلاب والاختبارات من جدول الإحصائيات المجمعة في استعلام واحد
+
+    أعداد الطلاب حسب النوع والمرحلة مع إجماليات الاختبارات.
+    """
+    rows = list(
+        rollups.order_by()
+        .values('gender', 'education_level')
+        .annotate(
+            students=Sum('student_count'),
+            tests=Sum('test_count'),
+            score_sum=Sum('score_sum'),
+            score_min=Min('score_min'),
+            score_max=Max('score_max'),
+        )
+    )
+    stats = _student_breakdown({
+        (row['gender'], row['education_level']): row['students'] or 0 for row in rows
+    })
+    total_tests = sum(row['tests'] or 0 for row in rows)
+    score_sum = sum(row['score_sum'] or 0 for row in rows)
+    stats.update({
+        'total_tests': total_tests,
+        'average_score': score_sum / total_tests if total_tests else 0,
+        'score_sum': score_sum,
+        'lowest_score': min((row['score_min'] for row in rows if row['score_min'] is not None), default=None),
+        'highest_score': max((row['score_max'] for row in rows if row['score_max'] is not None), default=None),
+    })
+    return stats
+
+
+def _student_breakdown(counts):
+    """بناء إحصائيات الطلاب من الأعداد المجمعة حسب (النوع، المرحلة)"""
+    stats = {'total_students': sum(counts.values())}
+    for gender, _ in Student.GENDER_CHOICES:
+        stats[f'{gender}_students'] = sum(
+            counts.get((gender, level), 0) for level, _ in Student.EDUCATION_LEVELS
+        )
+    for level, _ in Student.EDUCATION_LEVELS:
+        stats[f'{level}_students'] = sum(
+            counts.get((gender, level), 0) for gender, _ in Student.GENDER_CHOICES
+        )
+        for gender, _ in Student.GENDER_CHOICES:
+            stats[f'{level}_{gender}_students'] = counts.get((gender, level), 0)
+
+    stats['by_gender'] = [
+        {'gender': gender, 'label': label, 'total': stats[f'{gender}_students']}
+        for gender, label in Student.GENDER_CHOICES
+    ]
+    stats['by_level'] = [
+        {
+            'level': level,
+            'label': label,
+            'total': stats[f'{level}_students'],
+            'genders': [stats[f'{level}_{gender}_students'] for gender, _ in Student.GENDER_CHOICES],
+        }
+        for level, label in Student.EDUCATION_LEVELS
+    ]
+    return stats
+
+
+def test_statistics(tests):
+    """إحصائيات نتائج الاختبارات مجمعة حسب الاختبار في استعلام واحد"""
+    rows = list(
+        tests.order_by()
+        .values('test_id', 'test__name', 'test__gender', 'test__education_level', 'test__max_score')
+        .annotate(
+            count=Count('id'),
+            total=Sum('score'),
+            average=Avg('score'),
+            minimum=Min('score'),
+            maximum=Max('score'),
+        )
+    )
+    rows.sort(key=lambda row: (row['test__name'], row['test_id']))
+
+    gender_labels = dict(Student.GENDER_CHOICES)
+    level_labels = dict(Student.EDUCATION_LEVELS)
+    by_test = [
+        {
+            'id': row['test_id'],
+            'name': row['test__name'],
+            'gender': gender_labels.get(row['test__gender'], row['test__gender']),
+            'education_level': level_labels.get(row['test__education_level'], row['test__education_level']),
+            'max_score': row['test__max_score'],
+            'count': row['count'],
+            'average': row['average'] or 0,
+            'minimum': row['minimum'],
+            'maximum': row['maximum'],
+        }
+        for row in rows
+    ]
+
+    total_tests = sum(row['count'] for row in rows)
+    score_sum = sum(row['total'] or 0 for row in rows)
+    return {
+        'total_tests': total_tests,
+        'average_score': score_sum / total_tests if total_tests else 0,
+        'score_sum': score_sum,
+        'highest_score': max((row['maximum'] for row in rows), default=None),
+        'by_gender': _group_tests(rows, 'test__gender', Student.GENDER_CHOICES),
+        'by_level': _group_tests(rows, 'test__education_level', Student.EDUCATION_LEVELS),
+        'by_test': by_test,
+    }
+
+
+def _group_tests(rows, key, choices):
+    """تجميع صفوف الاختبارات حسب خاصية في الاختبار"""
+    groups = []
+    for value, label in choices:
+        matching = [row for row in rows if row[key] == value]
+        count = sum(row['count'] for row in matching)
+        total = sum(row['total'] or 0 for row in matching)
+        groups.append({
+            'value': value,
+            'label': label,
+            'count': count,
+            'average': total / count if count else 0,
+        })
+    return groups
@@ -0,0 +1,407 @@
+"""
+Synthetic national-scale dataset for benchmarking.
+
+Builds a hierarchy of regions (one per governorate, cycling when more are
+requested), departments, institutes, students and test results at a chosen
+scale with a realistic skew: departments follow governorate population,
+institute counts per department and student counts per institute are drawn
+from log-normal weights, and every institute teaches one stage to one gender as
+Al-Azhar institutes do. Every student gets a structurally valid Egyptian
+national ID whose birth date matches the stage, whose governorate is the one of
+the region and whose gender digit matches the student.
+
+The hierarchy is inserted with ``bulk_create`` in the calling process. The
+institutes are then split into jobs that insert their students and results in
+parallel worker processes, each on its own connection, with the secondary
+indexes of both tables dropped during the load and recreated afterwards.
+``bulk_create`` sends no signals, so the statistics rollups and the search
+index are rebuilt at the end, and the backup directory is marked so that the
+next backup is a full one.
+"""
+
+import heapq
+import json
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from datetime import date, timedelta
+from decimal import Decimal
+from django.db import connection, connections, transaction
+from django.utils import timezone
+from .arabic import normalize_arabic
+from .models import AcademicYear, Department, Institute, Region, Student, StudentTest, Test
+
+GENERATE_BATCH_SIZE = 5000
+# عدد المهام لكل عملية حتى تتوزع المعاهد الكبيرة ويظهر التقدم أثناء التشغيل
+JOBS_PER_WORKER = 4
+
+# (رمز المحافظة في الرقم القومي، الاسم، عدد السكان بالمليون تقريباً)
+GOVERNORATES = (
+    (1, 'القاهرة', 10.1), (21, 'الجيزة', 9.2), (13, 'الشرقية', 7.8), (12, 'الدقهلية', 6.9),
+    (18, 'البحيرة', 6.7), (24, 'المنيا', 6.2), (14, 'القليوبية', 6.0), (26, 'سوهاج', 5.5),
+    (2, 'الإسكندرية', 5.4), (16, 'الغربية', 5.4), (25, 'أسيوط', 4.8), (17, 'المنوفية', 4.6),
+    (23, 'الفيوم', 4.0), (15, 'كفر الشيخ', 3.6), (27, 'قنا', 3.5), (22, 'بني سويف', 3.4),
+    (28, 'أسوان', 1.6), (11, 'دمياط', 1.6), (19, 'الإسماعيلية', 1.4), (29, 'الأقصر', 1.3),
+    (3, 'بورسعيد', 0.8), (4, 'السويس', 0.8), (33, 'مطروح', 0.5), (34, 'شمال سيناء', 0.5),
+    (31, 'البحر الأحمر', 0.4), (32, 'الوادي الجديد', 0.3), (35, 'جنوب سيناء', 0.1),
+)
+
+NATIONAL_ID_WEIGHTS = (2, 7, 6, 5, 4, 3, 2, 7, 6, 5, 4, 3, 2)
+# أرقام التسلسل الممكنة لكل (تاريخ ميلاد، محافظة، نوع): ثلاثة أرقام مع خمسة أرقام للنوع
+NATIONAL_ID_SERIALS = 5000
+
+# (المرحلة، نسبة المعاهد، أعمار الطلاب في بداية العام، الصفوف)
+EDUCATION_LEVELS = (
+    ('primary', 0.45, 6, ('الأول', 'الثاني', 'الثالث', 'الرابع', 'الخامس', 'السادس')),
+    ('middle', 0.30, 12, ('الأول', 'الثاني', 'الثالث')),
+    ('secondary', 0.25, 15, ('الأول', 'الثاني', 'الثالث')),
+)
+MALE_SHARE = 0.55
+
+# بطارية الاختبارات لكل مرحلة ونوع (الاسم، الدرجة العظمى)
+TEST_BATTERY = (
+    ('الجري 30 متر', 10), ('الجري 600 متر', 20), ('الوثب العريض من الثبات', 10), ('رمي الكرة الطبية', 10),
+    ('الجلوس من الرقود', 20), ('الانبطاح المائل', 20), ('ثني الجذع للأمام', 10), ('الجري الارتدادي', 10),
+)
+
+MALE_NAMES = [
+    'محمد', 'أحمد', 'محمود', 'علي', 'عمر', 'يوسف', 'مصطفى', 'إبراهيم', 'عبدالرحمن', 'حسن', 'خالد', 'عبدالله',
+    'مازن', 'زياد', 'حمزة', 'أنس', 'كريم', 'إسلام', 'طه', 'ياسين',
+]
+FEMALE_NAMES = [
+    'فاطمة', 'مريم', 'آية', 'نور', 'هدى', 'سارة', 'خديجة', 'زينب', 'منة', 'روان', 'جنى', 'ملك', 'حبيبة', 'رحمة',
+    'أسماء', 'شيماء', 'ياسمين', 'سلمى', 'رقية', 'آلاء',
+]
+FATHER_NAMES = MALE_NAMES + ['السيد', 'عبدالعزيز', 'سعيد', 'جمال', 'عادل', 'صلاح', 'رمضان', 'شعبان', 'عبدالحميد']
+
+
+class DatasetSummary:
+    """نتيجة إنشاء البيانات"""
+
+    def __init__(self):
+        self.regions = 0
+        self.departments = 0
+        self.institutes = 0
+        self.students = 0
+        self.results = 0
+        self.elapsed = 0.0
+
+    def __str__(self):
+        return (
+            f"{self.regions} regions, {self.departments} departments, {self.institutes} institutes, "
+            f"{self.students} students, {self.results} results in {self.elapsed:.1f}s"
+        )
+
+
+def national_id_check_digit(digits):
+    """
+    رقم التحقق للرقم القومي من أول 13 رقماً
+
+    مصلحة الأحوال المدنية لا تنشر الخوارزمية، وهذه الأوزان مع باقي القسمة
+    على 11 هي المستخدمة في أدوات التحقق الشائعة.
+    """
+    total = sum(int(digit) * weight for digit, weight in zip(digits, NATIONAL_ID_WEIGHTS))
+    return (11 - total % 11) % 10
+
+
+def national_id(birth_date, governorate, serial, gender):
+    """
+    رقم قومي من تاريخ الميلاد ورمز المحافظة والنوع
+
+    serial من صفر إلى NATIONAL_ID_SERIALS - 1 ويميز الأشخاص المولودين في
+    نفس اليوم والمحافظة ومن نفس النوع. الرقم الثالث عشر فردي للذكور وزوجي للإناث.
+    """
+    if not 0 <= serial < NATIONAL_ID_SERIALS:
+        raise ValueError(f'National ID serial out of range: {serial}')
+    sequence, parity = divmod(serial, 5)
+    century = 2 if birth_date.year < 2000 else 3
+    gender_digit = parity * 2 + (1 if gender == 'male' else 0)
+    digits = f'{century}{birth_date:%y%m%d}{governorate:02d}{sequence:03d}{gender_digit}'
+    return digits + str(national_id_check_digit(digits))
+
+
+def is_valid_national_id(value):
+    """التحقق من بنية الرقم القومي: التاريخ ورمز المحافظة ورقم التحقق"""
+    if len(value) != 14 or not value.isdigit() or value[0] not in '23':
+        return False
+    try:
+        date(1900 + (int(value[0]) - 2) * 100 + int(value[1:3]), int(value[3:5]), int(value[5:7]))
+    except ValueError:
+        return False
+    if int(value[7:9]) not in {code for code, _, _ in GOVERNORATES} | {88}:
+        return False
+    return national_id_check_digit(value[:13]) == int(value[13])
+
+
+def _allocate(total, weights, minimum=0):
+    """توزيع total على الأوزان بطريقة أكبر باقٍ مع حد أدنى لكل عنصر"""
+    base = minimum * len(weights)
+    if total < base:
+        raise ValueError(f'Cannot give {len(weights)} items at least {minimum} each out of {total}')
+    remaining = total - base
+    scale = remaining / sum(weights)
+    shares = [weight * scale for weight in weights]
+    counts = [int(share) for share in shares]
+    order = sorted(range(len(weights)), key=lambda i: shares[i] - counts[i], reverse=True)
+    for i in order[:remaining - sum(counts)]:
+        counts[i] += 1
+    return [count + minimum for count in counts]
+
+
+def _plan_hierarchy(rng, regions, departments, institutes, students):
+    """أعداد الإدارات والمعاهد والطلاب لكل مستوى بتوزيع غير متساوٍ"""
+    region_rows = []
+    for r in range(regions):
+        code, name, population = GOVERNORATES[r % len(GOVERNORATES)]
+        cycle = r // len(GOVERNORATES)
+        # المحافظة المقسمة على أكثر من منطقة تتوزع سكانها عليها
+        shares = len(range(r % len(GOVERNORATES), regions, len(GOVERNORATES)))
+        region_rows.append((code, f'{name} {cycle + 1}' if cycle else name, population / shares))
+
+    department_counts = _allocate(departments, [population for _, _, population in region_rows], minimum=1)
+    department_regions = [r for r, count in enumerate(department_counts) for _ in range(count)]
+    institute_counts = _allocate(institutes, [rng.lognormvariate(0, 0.5) for _ in department_regions], minimum=1)
+    institute_departments = [d for d, count in enumerate(institute_counts) for _ in range(count)]
+    # عدد طلاب المنطقة يتبع سكانها مهما كان عدد معاهدها، ويتفاوت حجم المعهد داخلها
+    region_institutes = [0] * regions
+    for d in institute_departments:
+        region_institutes[department_regions[d]] += 1
+    student_counts = _allocate(students, [
+        rng.lognormvariate(0, 0.9) * region_rows[r][2] / region_institutes[r]
+        for r in (department_regions[d] for d in institute_departments)
+    ])
+    return region_rows, department_regions, institute_departments, student_counts
+
+
+def _create_hierarchy(rng, region_rows, department_regions, institute_departments, batch_size):
+    """إدخال المناطق والإدارات والمعاهد وإرجاع معرفاتها بالترتيب"""
+    def insert(model, objects):
+        model.objects.bulk_create(objects, batch_size=batch_size)
+        # بعض قواعد البيانات لا تعيد المعرفات من bulk_create، والبادئة تغني عن قائمة رموز طويلة
+        ids = dict(model.objects.filter(code__startswith=objects[0].code[:2]).values_list('code', 'id'))
+        return [ids[obj.code] for obj in objects]
+
+    region_ids = insert(Region, [
+        Region(name=f'منطقة {name} الأزهرية', code=f'SR{r + 1:03d}') for r, (_, name, _) in enumerate(region_rows)
+    ])
+    department_ids = insert(Department, [
+        Department(
+            name=f'إدارة {region_rows[r][1]} {d + 1}', region_id=region_ids[r], code=f'SD{d + 1:05d}'
+        )
+        for d, r in enumerate(department_regions)
+    ])
+
+    levels = [level for level, _, _, _ in EDUCATION_LEVELS]
+    level_weights = [share for _, share, _, _ in EDUCATION_LEVELS]
+    institutes = []
+    for i, d in enumerate(institute_departments):
+        level = rng.choices(levels, level_weights)[0]
+        gender = 'male' if rng.random() < MALE_SHARE else 'female'
+        stage = dict(Student.EDUCATION_LEVELS)[level]
+        suffix = 'بنين' if gender == 'male' else 'بنات'
+        name = f'معهد {region_rows[department_regions[d]][1]} الأزهري {stage} {suffix} {i + 1}'
+        institutes.append((
+            Institute(name=name, name_normalized=normalize_arabic(name), department_id=department_ids[d],
+                      code=f'SI{i + 1:06d}'),
+            level, gender,
+        ))
+    institute_ids = insert(Institute, [institute for institute, _, _ in institutes])
+    return region_ids, department_ids, [
+        (institute_id, level, gender) for institute_id, (_, level, gender) in zip(institute_ids, institutes)
+    ]
+
+
+def _create_tests():
+    """بطارية الاختبارات لكل مرحلة ونوع: {(المرحلة، النوع): [(المعرف، الدرجة العظمى)]}"""
+    tests = {}
+    for level, _, _, _ in EDUCATION_LEVELS:
+        for gender, _ in Student.GENDER_CHOICES:
+            tests[level, gender] = [
+                (Test.objects.get_or_create(
+                    name=name, education_level=level, gender=gender,
+                    defaults={'description': name, 'max_score': max_score},
+                )[0].id, max_score)
+                for name, max_score in TEST_BATTERY
+            ]
+    return tests
+
+
+def _split_jobs(institutes, count):
+    """توزيع المعاهد على count مهمة بأحمال متقاربة (الأكبر أولاً لأقل المهام حملاً)"""
+    heap = [(0, index, []) for index in range(count)]
+    for institute in sorted(institutes, key=lambda row: row[-1], reverse=True):
+        load, index, rows = heapq.heappop(heap)
+        rows.append(institute)
+        heapq.heappush(heap, (load + institute[-1], index, rows))
+    return [rows for _, index, rows in sorted(heap, key=lambda item: item[1])]
+
+
+def _birth_date(rng, year_start, first_age, grades):
+    """تاريخ ميلاد يناسب المرحلة ورقم الصف المقابل له"""
+    grade = rng.randrange(len(grades))
+    age = first_age + grade
+    born = date(year_start.year - age - 1, 10, 1) + timedelta(days=rng.randrange(365))
+    return born, grades[grade]
+
+
+def _generate_job(job):
+    """إدخال طلاب ونتائج مجموعة معاهد في عملية منفصلة"""
+    (index, jobs, institutes, tests, year, results_per_student, batch_size, seed) = job
+    rng = random.Random(seed * 1000003 + index)
+    year_id, year_start, year_end = year
+    test_days = (year_end - year_start).days
+    levels = {level: (first_age, grades) for level, _, first_age, grades in EDUCATION_LEVELS}
+    # تسلسل الرقم القومي لكل (تاريخ، محافظة، نوع) داخل المهمة، والمهام تتناوب عليه
+    serials = {}
+    started = time.monotonic()
+    students = results = 0
+    pending = []
+
+    def flush():
+        nonlocal students, results
+        with transaction.atomic():
+            Student.objects.bulk_create([student for student, _ in pending])
+            if not connection.features.can_return_rows_from_bulk_insert:
+                ids = dict(Student.objects.filter(
+                    national_id__in=[student.national_id for student, _ in pending]
+                ).values_list('national_id', 'id'))
+                for student, _ in pending:
+                    student.id = ids[student.national_id]
+
+            rows = []
+            for student, battery in pending:
+                # كل اختبار يُسجل باحتمال ثابت فيكون عدد النتائج توزيعاً ذا حدين
+                for test_id, max_score in battery:
+                    if rng.random() >= results_per_student:
+                        continue
+                    score = min(max(rng.gauss(0.65, 0.15), 0.0), 1.0) * max_score
+                    rows.append(StudentTest(
+                        student_id=student.id, test_id=test_id, score=Decimal(f'{score:.2f}'),
+                        test_date=year_start + timedelta(days=rng.randrange(test_days)),
+                        department_id=student.department_id, region_id=student.region_id,
+                    ))
+            StudentTest.objects.bulk_create(rows, batch_size=batch_size)
+        students += len(pending)
+        results += len(rows)
+        pending.clear()
+
+    for institute_id, department_id, region_id, governorate, level, gender, count in institutes:
+        first_age, grades = levels[level]
+        battery = tests[level, gender]
+        first_names = MALE_NAMES if gender == 'male' else FEMALE_NAMES
+        for _ in range(count):
+            born, grade = _birth_date(rng, year_start, first_age, grades)
+            key = (born, governorate, gender)
+            serial = serials.get(key, 0) * jobs + index
+            if serial >= NATIONAL_ID_SERIALS:
+                raise ValueError(
+                    f'Too many students born on {born} in governorate {governorate}, use fewer workers or students'
+                )
+            serials[key] = serials.get(key, 0) + 1
+            name = f'{rng.choice(first_names)} {rng.choice(FATHER_NAMES)} {rng.choice(FATHER_NAMES)}'
+            pending.append((Student(
+                name=name, name_normalized=normalize_arabic(name),
+                national_id=national_id(born, governorate, serial, gender),
+                gender=gender, education_level=level, grade=f'الصف {grade}',
+                institute_id=institute_id, department_id=department_id, region_id=region_id,
+                academic_year_id=year_id,
+                personal_photo='students/photos/placeholder.jpg',
+                birth_certificate='students/documents/placeholder.jpg',
+            ), battery))
+            if len(pending) >= batch_size:
+                flush()
+    if pending:
+        flush()
+    return index, students, results, time.monotonic() - started
+
+
+def generate(regions=27, departments=300, institutes=10000, students=3000000, results=20000000, workers=None,
+             batch_size=GENERATE_BATCH_SIZE, seed=0, defer_indexes=True, progress=None):
+    """
+    إنشاء بيانات تجريبية بالحجم المطلوب وإرجاع DatasetSummary
+
+    تتطلب جدول طلاب فارغاً حتى لا تتعارض الأرقام القومية مع بيانات حقيقية.
+    results عدد النتائج المستهدف، والعدد الفعلي قريب منه ولا يتجاوز حجم
+    بطارية الاختبارات لكل طالب. progress تُستدعى بعد كل مهمة بمعاملات
+    (رقم المهمة، الطلاب، النتائج، المدة).
+    """
+    from . import rollups
+    from .backups import RESTORE_MARKER, backup_root
+    from .hierarchy import invalidate_hierarchy
+    from .restore import deferred_indexes
+    from .search import get_search_backend
+
+    if Student.objects.exists() or Region.objects.filter(code__startswith='SR').exists():
+        raise ValueError('The database already has students or synthetic regions, use flush first')
+    if regions < 1 or departments < regions or institutes < departments:
+        raise ValueError('Each level needs at least one row per parent')
+    if workers is None:
+        workers = min(4, os.cpu_count() or 1)
+    # SQLite يسمح بكاتب واحد فقط في نفس الوقت
+    workers = 1 if connection.vendor == 'sqlite' else max(1, workers)
+
+    summary = DatasetSummary()
+    started = time.monotonic()
+    rng = random.Random(seed)
+    region_rows, department_regions, institute_departments, student_counts = _plan_hierarchy(
+        rng, regions, departments, institutes, students
+    )
+    with transaction.atomic():
+        region_ids, department_ids, institute_rows = _create_hierarchy(
+            rng, region_rows, department_regions, institute_departments, batch_size
+        )
+        year, _ = AcademicYear.objects.get_or_create(
+            name='2024-2025', defaults={'start_date': date(2024, 9, 1), 'end_date': date(2025, 6, 30)}
+        )
+        tests = _create_tests()
+    summary.regions, summary.departments, summary.institutes = len(region_ids), len(department_ids), len(institute_rows)
+
+    scoped = []
+    for (institute_id, level, gender), d, count in zip(institute_rows, institute_departments, student_counts):
+        r = department_regions[d]
+        scoped.append((institute_id, department_ids[d], region_ids[r], region_rows[r][0], level, gender, count))
+    # احتمال تسجيل كل اختبار حتى يقترب عدد النتائج من المطلوب
+    probability = min(1.0, results / (max(students, 1) * len(TEST_BATTERY)))
+    job_count = max(1, min(len(scoped), workers * JOBS_PER_WORKER))
+    jobs = [
+        (index, job_count, rows, tests, (year.id, year.start_date, year.end_date), probability, batch_size, seed)
+        for index, rows in enumerate(_split_jobs(scoped, job_count))
+    ]
+
+    def collect(result):
+        index, job_students, job_results, elapsed = result
+        summary.students += job_students
+        summary.results += job_results
+        if progress:
+            progress(index, job_students, job_results, elapsed)
+
+    with ExitStack() as stack:
+        if defer_indexes:
+            stack.enter_context(deferred_indexes(Student))
+            stack.enter_context(deferred_indexes(StudentTest))
+        if workers == 1:
+            for job in jobs:
+                collect(_generate_job(job))
+        else:
+            # لا تُورَّث اتصالات قاعدة البيانات للعمليات الفرعية
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                for result in pool.map(_generate_job, jobs):
+                    collect(result)
+
+    # bulk_create لا يرسل إشارات ولا يسجل في سجل التغييرات
+    rollups.rebuild()
+    backend = get_search_backend()
+    if backend.available:
+        backend.rebuild()
+    invalidate_hierarchy()
+
+    summary.elapsed = time.monotonic() - started
+    os.makedirs(backup_root(), exist_ok=True)
+    with open(os.path.join(backup_root(), RESTORE_MARKER), 'w', encoding='utf-8') as f:
+        json.dump({'generated': str(summary), 'at': timezone.now().isoformat()}, f)
+    return summary
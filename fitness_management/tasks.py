@@ -4,44 +4,28 @@ Background tasks for fitness_management app.
 
 import os
 import shutil
-import zipfile
 from datetime import datetime, timedelta
 from celery import shared_task
 from django.conf import settings
 from django.core.mail import send_mail
-from django.db import connection
-from .models import Student, StudentTest, News, Event
+from django.utils import timezone
+from .backups import BACKUP_PREFIX, BackupEngine, backup_root, expired_backups
+from .models import Student, News, Event
 
 @shared_task
-def backup_database():
-    """نسخ احتياطي لقاعدة البيانات"""
+def backup_database(kind='auto'):
+    """نسخ احتياطي لقاعدة البيانات (كاملة دورياً وتزايدية بينها)"""
     try:
-        from django.core.management import call_command
-        from django.utils import timezone
-        
-        # إنشاء اسم الملف
-        timestamp = timezone.now().strftime('%Y%m%d_%H%M%S')
-        backup_filename = f'backup_{timestamp}.json'
-        backup_path = os.path.join(settings.BACKUP_DIR, backup_filename)
-        
-        # إنشاء النسخة الاحتياطية
-        call_command('dumpdata', 
-                    exclude=['contenttypes', 'auth.permission'],
-                    output=backup_path,
-                    indent=2)
-        
-        # ضغط الملف
-        zip_filename = f'{backup_path}.zip'
-        with zipfile.ZipFile(zip_filename, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            zipf.write(backup_path, os.path.basename(backup_path))
-        
-        # حذف الملف الأصلي
-        os.remove(backup_path)
+        # كتابة الصفوف مضغوطة مباشرة دون ملف JSON وسيط
+        path, manifest = BackupEngine().run(kind=kind)
         
         # حذف النسخ الاحتياطية القديمة
         cleanup_old_backups()
         
-        return f"Database backup created: {zip_filename}"
+        return (
+            f"Database backup created: {path} "
+            f"({manifest['kind']}, {manifest['total_rows']} rows, {manifest['total_bytes']} bytes, {manifest['engine']})"
+        )
     except Exception as e:
         return f"Backup failed: {str(e)}"
 
@@ -52,12 +36,25 @@ def cleanup_old_backups():
         retention_days = getattr(settings, 'BACKUP_RETENTION_DAYS', 30)
         cutoff_date = datetime.now() - timedelta(days=retention_days)
         
-        for filename in os.listdir(settings.BACKUP_DIR):
-            file_path = os.path.join(settings.BACKUP_DIR, filename)
+        backup_dir = backup_root()
+        # النسخ المجلدات تُحذف كسلاسل كاملة حتى لا تبقى نسخة تزايدية دون أساسها
+        for path in expired_backups(timezone.make_aware(cutoff_date), backup_dir):
+            shutil.rmtree(path)
+        
+        for filename in os.listdir(backup_dir):
+            # علامة الاستعادة ومجلدات التحليلات والتقارير والتصدير ليست نسخاً احتياطية
+            if not filename.startswith(BACKUP_PREFIX):
+                continue
+            file_path = os.path.join(backup_dir, filename)
+            file_time = datetime.fromtimestamp(os.path.getctime(file_path))
+            if file_time >= cutoff_date:
+                continue
             if os.path.isfile(file_path):
-                file_time = datetime.fromtimestamp(os.path.getctime(file_path))
-                if file_time < cutoff_date:
-                    os.remove(file_path)
+                # أرشيفات النسخ القديمة (backup_*.json.zip)
+                os.remove(file_path)
+            elif filename.endswith('.part'):
+                # نسخة لم تكتمل
+                shutil.rmtree(file_path)
         
         return "Old backups cleaned up"
     except Exception as e:
@@ -81,53 +78,17 @@ def cleanup_old_files():
 
 @shared_task
 def generate_periodic_reports():
-    """إنشاء التقارير الدورية"""
+    """تسجيل لقطة الإحصائيات الدورية لكل النطاقات"""
     try:
-        from .models import Region, Department, Institute
-        
-        # إحصائيات عامة
-        stats = {
-            'total_students': Student.objects.count(),
-            'total_regions': Region.objects.count(),
-            'total_departments': Department.objects.count(),
-            'total_institutes': Institute.objects.count(),
-            'total_tests': StudentTest.objects.count(),
-        }
-        
-        # إحصائيات حسب النوع
-        male_students = Student.objects.filter(gender='male').count()
-        female_students = Student.objects.filter(gender='female').count()
-        
-        # إحصائيات حسب المرحلة التعليمية
-        primary_students = Student.objects.filter(education_level='primary').count()
-        middle_students = Student.objects.filter(education_level='middle').count()
-        secondary_students = Student.objects.filter(education_level='secondary').count()
-        
-        report_data = {
-            'timestamp': datetime.now().isoformat(),
-            'general_stats': stats,
-            'gender_stats': {
-                'male': male_students,
-                'female': female_students,
-            },
-            'education_stats': {
-                'primary': primary_students,
-                'middle': middle_students,
-                'secondary': secondary_students,
-            }
-        }
+        from .snapshots import capture_snapshot, downsample
         
-        # حفظ التقرير
-        report_filename = f'report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
-        report_path = os.path.join(settings.BACKUP_DIR, 'reports', report_filename)
+        # صف لكل نطاق في جدول اللقطات بدلاً من ملف JSON لكل تشغيل
+        scopes = capture_snapshot()
         
-        os.makedirs(os.path.dirname(report_path), exist_ok=True)
+        # دمج اللقطات القديمة في نقاط يومية وأسبوعية
+        merged = downsample()
         
-        import json
-        with open(report_path, 'w', encoding='utf-8') as f:
-            json.dump(report_data, f, ensure_ascii=False, indent=2)
-        
-        return f"Periodic report generated: {report_filename}"
+        return f"Statistics snapshot stored for {scopes} scopes ({merged} old points downsampled)"
     except Exception as e:
         return f"Report generation failed: {str(e)}"
 
@@ -147,95 +108,99 @@ def send_notification_email(subject, message, recipient_list):
         return f"Email sending failed: {str(e)}"
 
 @shared_task
-def export_student_data(student_ids, format='json'):
-    """تصدير بيانات الطلاب"""
+def send_bulk_notification(subject, message, recipients=None, user_types=None, created_by=None):
+    """
+    إرسال إشعار مخصص لكل مستلم على اتصال SMTP واحد مع تسجيل حالة كل إرسال
+
+    subject وmessage قوالب تُعرض بالمتغيرين name وemail، وrecipients عناوين
+    بريد أو أزواج (البريد، الاسم)، وuser_types أنواع الحسابات المستلمة.
+    """
+    try:
+        from .notifications import create_notification, deliver, profile_recipients
+        
+        recipients = list(recipients or [])
+        if user_types:
+            recipients += profile_recipients(user_types)
+        notification = create_notification(subject, message, recipients, created_by_id=created_by)
+        result = deliver(notification)
+        
+        return f"Notification {notification.id} sent: {result}"
+    except Exception as e:
+        return f"Email sending failed: {str(e)}"
+
+@shared_task
+def retry_notification(notification_id):
+    """إعادة إرسال الإشعار لمن فشل الإرسال إليهم"""
+    try:
+        from .models import Notification
+        from .notifications import deliver
+        
+        result = deliver(Notification.objects.get(id=notification_id), retry_failed=True)
+        
+        return f"Notification {notification_id} retried: {result}"
+    except Exception as e:
+        return f"Email sending failed: {str(e)}"
+
+@shared_task(bind=True)
+def export_student_data(self, spec=None, format='json', chunk_size=None):
+    """
+    تصدير بيانات الطلاب حسب مواصفات التصفية
+
+    spec قاموس مثل {'region': 3, 'gender': 'male', 'education_level': 'primary',
+    'academic_year': 2}، وتُقبل قائمة معرفات للتوافق مع الاستدعاءات القديمة.
+    """
     try:
-        students = Student.objects.filter(id__in=student_ids)
-        
-        if format == 'json':
-            from django.core.serializers import serialize
-            data = serialize('json', students)
-        elif format == 'csv':
-            import csv
-            from io import StringIO
-            
-            output = StringIO()
-            writer = csv.writer(output)
-            
-            # كتابة العناوين
-            writer.writerow(['ID', 'Name', 'National ID', 'Gender', 'Education Level', 'Grade', 'Institute'])
-            
-            # كتابة البيانات
-            for student in students:
-                writer.writerow([
-                    student.id,
-                    student.name,
-                    student.national_id,
-                    student.get_gender_display(),
-                    student.get_education_level_display(),
-                    student.grade,
-                    student.institute.name
-                ])
-            
-            data = output.getvalue()
-        else:
-            raise ValueError(f"Unsupported format: {format}")
+        from .exports import EXPORT_CHUNK_SIZE, export_students, student_queryset
+        
+        if isinstance(spec, (list, tuple)):
+            spec = {'ids': list(spec)}
+        students = student_queryset(spec)
+        total = students.count()
+        
+        def report_progress(done):
+            if self.request.id:
+                self.update_state(state='PROGRESS', meta={'done': done, 'total': total})
         
         # حفظ الملف
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'students_export_{timestamp}.{format}'
+        extension = 'jsonl' if format == 'ndjson' else format
+        filename = f'students_export_{timestamp}.{extension}'
         file_path = os.path.join(settings.BACKUP_DIR, 'exports', filename)
         
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(data)
+        exported = export_students(
+            students, format, file_path,
+            chunk_size=chunk_size or EXPORT_CHUNK_SIZE, progress=report_progress
+        )
         
-        return f"Student data exported: {filename}"
+        return f"Student data exported: {filename} ({exported} students)"
     except Exception as e:
         return f"Export failed: {str(e)}"
 
+@shared_task(bind=True)
+def export_test_results_parquet(self, full=False, batch_size=None):
+    """تصدير نتائج الاختبارات الجديدة والمعدلة إلى مجموعة بيانات Parquet للتحليل"""
+    try:
+        from .analytics import ANALYTICS_BATCH_SIZE, ParquetExporter
+        
+        def report_progress(done):
+            if self.request.id:
+                self.update_state(state='PROGRESS', meta={'done': done})
+        
+        exporter = ParquetExporter(batch_size=batch_size or ANALYTICS_BATCH_SIZE)
+        exported, last_id = exporter.run(full=full, progress=report_progress)
+        
+        return f"Parquet export finished: {exported} results (last id {last_id})"
+    except Exception as e:
+        return f"Parquet export failed: {str(e)}"
+
 @shared_task
 def generate_student_report(student_id):
     """إنشاء تقرير الطالب"""
     try:
-        student = Student.objects.get(id=student_id)
-        tests = StudentTest.objects.filter(student=student)
-        
-        report_data = {
-            'student_info': {
-                'id': student.id,
-                'name': student.name,
-                'national_id': student.national_id,
-                'gender': student.get_gender_display(),
-                'education_level': student.get_education_level_display(),
-                'grade': student.grade,
-                'institute': student.institute.name,
-            },
-            'tests': [],
-            'statistics': {
-                'total_tests': tests.count(),
-                'average_score': 0,
-                'total_score': 0,
-            }
-        }
-        
-        total_score = 0
-        for test in tests:
-            test_data = {
-                'test_name': test.test.name,
-                'score': float(test.score),
-                'max_score': test.test.max_score,
-                'percentage': (test.score / test.test.max_score) * 100,
-                'test_date': test.test_date.isoformat(),
-                'notes': test.notes,
-            }
-            report_data['tests'].append(test_data)
-            total_score += test.score
-        
-        if tests.count() > 0:
-            report_data['statistics']['total_score'] = total_score
-            report_data['statistics']['average_score'] = total_score / tests.count()
+        from .report_cards import student_report
+        
+        # بيانات الطالب ونتائجه في استعلامين بدلاً من استعلام لكل اختبار
+        report_data = student_report(student_id)
         
         # حفظ التقرير
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -254,38 +219,165 @@ def generate_student_report(student_id):
     except Exception as e:
         return f"Report generation failed: {str(e)}"
 
+@shared_task(bind=True)
+def generate_student_reports(self, spec=None, workers=None):
+    """
+    إنشاء تقارير طلاب نطاق كامل كأرشيف لكل معهد
+
+    spec بنفس صيغة مواصفات التصدير مثل {'region': 3} أو {'institute': 12}.
+    """
+    try:
+        from .report_cards import generate_reports
+        
+        def report_progress(institute_id, students, tests):
+            if self.request.id:
+                self.update_state(state='PROGRESS', meta={'institute': institute_id, 'students': students})
+        
+        summary = generate_reports(spec, workers=workers, progress=report_progress)
+        
+        return (
+            f"Student reports generated: {summary['path']} "
+            f"({len(summary['archives'])} institutes, {summary['students']} students, {summary['tests']} tests)"
+        )
+    except Exception as e:
+        return f"Report generation failed: {str(e)}"
+
+# إعادة محاولة الجزء الفاشل وحده دون إعادة بقية الأجزاء
+SLICE_RETRY = {'autoretry_for': (Exception,), 'retry_backoff': True, 'retry_kwargs': {'max_retries': 3}}
+
+@shared_task(bind=True, **SLICE_RETRY)
+def export_student_slice(self, spec, format, path, chunk_size=None):
+    """تصدير جزء واحد (معهد أو إدارة) من تصدير موزع إلى ملفه الخاص"""
+    from .exports import EXPORT_CHUNK_SIZE, export_students, student_queryset
+    
+    exported = export_students(student_queryset(spec), format, path, chunk_size=chunk_size or EXPORT_CHUNK_SIZE)
+    return {'path': path, 'rows': exported}
+
 @shared_task
-def cleanup_database():
-    """تنظيف قاعدة البيانات"""
+def merge_student_export(results, path, format):
+    """دمج أجزاء التصدير الموزع في الملف النهائي"""
+    try:
+        from .fanout import merge_export_parts
+        
+        merge_export_parts([result['path'] for result in results], path, format)
+        exported = sum(result['rows'] for result in results)
+        
+        return f"Student data exported: {os.path.basename(path)} ({exported} students in {len(results)} parts)"
+    except Exception as e:
+        return f"Export merge failed: {str(e)}"
+
+@shared_task
+def export_student_data_fanout(spec=None, format='csv', by='institute', chunk_size=None):
+    """
+    تصدير بيانات الطلاب موزعاً على مهمة لكل معهد أو إدارة ثم دمج الأجزاء
+
+    تُرتب الصفوف في الملف النهائي حسب المعهد أو الإدارة ثم المعرف.
+    """
     try:
-        # حذف السجلات القديمة (أكثر من سنة)
-        cutoff_date = datetime.now() - timedelta(days=365)
+        from celery import chord
+        from .fanout import part_path, slice_specs
         
-        # حذف الأخبار القديمة
-        old_news = News.objects.filter(created_at__lt=cutoff_date)
-        old_news_count = old_news.count()
-        old_news.delete()
+        slices = slice_specs(spec, by)
+        if not slices:
+            return "No students to export"
+        
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        extension = 'jsonl' if format == 'ndjson' else format
+        filename = f'students_export_{timestamp}.{extension}'
+        file_path = os.path.join(settings.BACKUP_DIR, 'exports', filename)
+        
+        header = [
+            export_student_slice.s(slice_spec, format, part_path(file_path, index, extension), chunk_size)
+            for index, slice_spec in enumerate(slices)
+        ]
+        chord(header)(merge_student_export.s(file_path, format))
+        
+        return f"Student export dispatched: {filename} ({len(slices)} slices by {by})"
+    except Exception as e:
+        return f"Export failed: {str(e)}"
+
+@shared_task(bind=True, **SLICE_RETRY)
+def student_report_slice(self, spec, output_dir):
+    """كتابة أرشيفات تقارير جزء واحد من مهمة تقارير موزعة"""
+    from .report_cards import generate_reports
+    
+    summary = generate_reports(spec, output_dir=output_dir, workers=1)
+    return {'archives': summary['archives'], 'students': summary['students'], 'tests': summary['tests']}
+
+@shared_task
+def merge_student_reports(results, path):
+    """جمع أرشيفات المعاهد من كل الأجزاء في ملف واحد"""
+    try:
+        from .fanout import bundle_report_archives
+        
+        archives = [archive for result in results for archive in result['archives']]
+        bundle_report_archives(archives, path)
+        students = sum(result['students'] for result in results)
+        
+        return f"Student reports generated: {os.path.basename(path)} ({len(archives)} institutes, {students} students)"
+    except Exception as e:
+        return f"Report merge failed: {str(e)}"
+
+@shared_task
+def generate_student_reports_fanout(spec=None, by='institute'):
+    """إنشاء تقارير الطلاب موزعة على مهمة لكل معهد أو إدارة ثم جمع الأرشيفات"""
+    try:
+        from celery import chord
+        from .fanout import parts_dir, slice_specs
+        
+        slices = slice_specs(spec, by)
+        if not slices:
+            return "No students to report"
+        
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        filename = f'student_reports_{timestamp}.zip'
+        file_path = os.path.join(settings.BACKUP_DIR, 'reports', filename)
+        
+        header = [student_report_slice.s(slice_spec, parts_dir(file_path)) for slice_spec in slices]
+        chord(header)(merge_student_reports.s(file_path))
+        
+        return f"Student reports dispatched: {filename} ({len(slices)} slices by {by})"
+    except Exception as e:
+        return f"Report generation failed: {str(e)}"
+
+@shared_task
+def cleanup_database(archive=None, batch_size=None):
+    """تنظيف قاعدة البيانات على دفعات مع أرشفة الصفوف المحذوفة"""
+    try:
+        from .cleanup import archive_event, archive_news, purge
+        
+        if archive is None:
+            archive = getattr(settings, 'CLEANUP_ARCHIVE', True)
+        now = timezone.now()
+        
+        # حذف الأخبار القديمة (أكثر من سنة)
+        news = purge(
+            News.objects.filter(created_at__lt=now - timedelta(days=365)),
+            archive=archive_news if archive else None,
+            file_fields=['image'],
+            batch_size=batch_size,
+        )
         
         # حذف الفعاليات المنتهية
-        old_events = Event.objects.filter(end_date__lt=datetime.now())
-        old_events_count = old_events.count()
-        old_events.delete()
+        events = purge(
+            Event.objects.filter(end_date__lt=now),
+            archive=archive_event if archive else None,
+            file_fields=['image'],
+            batch_size=batch_size,
+        )
         
-        return f"Database cleaned: {old_news_count} old news, {old_events_count} old events"
+        return f"Database cleaned: {news}; {events}"
     except Exception as e:
         return f"Database cleanup failed: {str(e)}"
 
 @shared_task
-def optimize_database():
-    """تحسين قاعدة البيانات"""
+def optimize_database(dry_run=False):
+    """تحسين قاعدة البيانات حسب نوعها للجداول كثيرة التغيير فقط"""
     try:
-        with connection.cursor() as cursor:
-            # تحليل الجداول
-            cursor.execute("ANALYZE;")
-            
-            # إعادة بناء الفهارس
-            cursor.execute("REINDEX DATABASE fitness_project;")
-        
-        return "Database optimized successfully"
+        from .maintenance import optimize
+        
+        report = optimize(dry_run=dry_run)
+        
+        return f"Database optimized successfully: {report}"
     except Exception as e:
         return f"Database optimization failed: {str(e)}" 
\ No newline at end of file
@@ -0,0 +1,69 @@
+import shutil
+import tempfile
+from unittest import skipIf
+from django.test import TestCase
+from . import analytics
+from .analytics import ParquetExporter, read_watermark
+from .models import ChangeLog, Student, StudentTest, Test
+from .query_budget import seed_hierarchy
+
+
+@skipIf(analytics.pa is None, 'pyarrow is not installed')
+class ParquetExporterTests(TestCase):
+    """مجموعة البيانات بعد التصدير التزايدي تطابق النتائج الحالية"""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_hierarchy(regions=2, departments=1, institutes=2, students=5)
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir)
+
+    def export(self, **kwargs):
+        return ParquetExporter(self.output_dir, batch_size=7).run(**kwargs)
+
+    def assertDatasetMatches(self):
+        table = analytics.pq.read_table(self.output_dir)
+        exported = sorted(zip(*(table.column(name).to_pylist() for name in ('id', 'score', 'test', 'region_id'))))
+        expected = sorted(StudentTest.objects.values_list('id', 'score', 'test__name', 'region_id'))
+        self.assertEqual(exported, expected)
+
+    def test_incremental_export_rewrites_changed_results(self):
+        self.export()
+        self.assertDatasetMatches()
+
+        result = StudentTest.objects.order_by('id').first()
+        result.score = 1
+        result.save()
+        StudentTest.objects.order_by('id').last().delete()
+        test = Test.objects.order_by('id').first()
+        test.name = 'اختبار معدل'
+        test.save()
+        # طالب ينتقل لمعهد في منطقة أخرى فتنتقل نتائجه لقسم آخر
+        student = Student.objects.filter(region=result.region).order_by('id').last()
+        student.institute = Student.objects.exclude(region=result.region).first().institute
+        student.save()
+        StudentTest.objects.create(student=student, test=Test.objects.exclude(
+            id__in=student.studenttest_set.values('test_id')
+        ).first(), score=3, test_date=result.test_date)
+
+        exported, _ = self.export()
+        self.assertLess(exported, StudentTest.objects.count())
+        self.assertGreater(read_watermark(self.output_dir)['last_run_replaced_files'], 0)
+        self.assertDatasetMatches()
+
+        self.assertEqual(self.export()[0], 0)
+        self.assertDatasetMatches()
+
+    def test_purged_changes_rebuild_the_dataset(self):
+        self.export()
+        result = StudentTest.objects.order_by('id').first()
+        result.score = 2
+        result.save()
+        # نسخة كاملة حذفت سجل التغييرات قبل التصدير التالي
+        ChangeLog.objects.all().delete()
+
+        exported, _ = self.export()
+        self.assertEqual(exported, StudentTest.objects.count())
+        self.assertDatasetMatches()
@@ -0,0 +1,44 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from .arabic import normalize_arabic, prefix_q
+from .models import Institute, Student
+from .query_budget import seed_hierarchy
+
+
+class NormalizeArabicTests(TestCase):
+    """توحيد الهمزات والتاء المربوطة والألف المقصورة وحذف التشكيل"""
+
+    def test_normalize_arabic(self):
+        self.assertEqual(normalize_arabic('أحمد'), 'احمد')
+        self.assertEqual(normalize_arabic('إبراهيم  آل   مُحَمَّد'), 'ابراهيم ال محمد')
+        self.assertEqual(normalize_arabic('فاطمة مصطفى'), 'فاطمه مصطفي')
+        self.assertEqual(normalize_arabic('عـــلي'), 'علي')
+        self.assertEqual(normalize_arabic(None), '')
+
+
+class NormalizedNameTests(TestCase):
+    """الاسم الموحد يُحفظ مع الاسم ويُستخدم في البحث بالبداية"""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_hierarchy(regions=1, departments=1, institutes=1, students=3)
+
+    def test_save_keeps_normalized_name(self):
+        student = Student.objects.first()
+        student.name = 'إيمان مُصطفى'
+        student.save(update_fields=['name'])
+        student.refresh_from_db()
+        self.assertEqual(student.name_normalized, 'ايمان مصطفي')
+        self.assertEqual(list(Student.objects.filter(prefix_q('name_normalized', normalize_arabic('ايمان')))), [student])
+
+        duplicate = Student(name='ايمان مصطفى', institute=student.institute)
+        self.assertEqual(list(duplicate.possible_duplicates()), [student])
+
+    def test_backfill_normalized_names(self):
+        # update لا يستدعي save فتبقى الأسماء الموحدة قديمة حتى يعمل الأمر
+        Student.objects.update(name='أسماء', name_normalized='')
+        Institute.objects.update(name='معهد الأزهر', name_normalized='')
+        call_command('backfill_normalized_names', batch_size=2, stdout=StringIO())
+        self.assertEqual(set(Student.objects.values_list('name_normalized', flat=True)), {'اسماء'})
+        self.assertEqual(set(Institute.objects.values_list('name_normalized', flat=True)), {'معهد الازهر'})
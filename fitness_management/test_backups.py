@@ -0,0 +1,152 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from .backups import (
+    DELETIONS_FILE, MANIFEST_FILE, RESTORE_MARKER, BackupEngine, BackupError, backup_models, file_checksum,
+    read_manifest, zstandard
+)
+from .models import Region, Student, StudentTest
+from .query_budget import seed_hierarchy
+from .tasks import cleanup_old_backups
+
+
+class FullBackupTests(TestCase):
+    """النسخة الكاملة ملف مضغوط لكل نموذج وبيان بعدد الصفوف وبصمة كل ملف"""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_hierarchy(regions=1, departments=2, institutes=2, students=5)
+
+    def setUp(self):
+        self.backup_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.backup_dir)
+
+    def test_manifest_matches_database_and_files(self):
+        path, manifest = BackupEngine(self.backup_dir, compression='gzip', engine='json', chunk_size=7).run('full')
+        self.assertEqual(read_manifest(path), manifest)
+        self.assertEqual(sorted(os.listdir(self.backup_dir)), [os.path.basename(path)])
+
+        counts = {model._meta.label_lower: model._base_manager.count() for model in backup_models()}
+        self.assertEqual({entry['model']: entry['rows'] for entry in manifest['models']}, counts)
+        self.assertGreater(counts['fitness_management.studenttest'], 0)
+        self.assertEqual(manifest['total_rows'], sum(counts.values()))
+
+        self.assertEqual(sorted(os.listdir(path)), sorted([MANIFEST_FILE, *manifest['files']]))
+        for entry in manifest['models']:
+            with self.subTest(model=entry['model']):
+                file_path = os.path.join(path, entry['file'])
+                self.assertEqual(manifest['files'][entry['file']], {
+                    'bytes': os.path.getsize(file_path), 'sha256': file_checksum(file_path),
+                })
+                with gzip.open(file_path, 'rt', encoding='utf-8') as f:
+                    rows = [json.loads(line) for line in f]
+                self.assertEqual(len(rows), entry['rows'])
+                self.assertTrue(all(row['model'] == entry['model'] for row in rows))
+
+    @skipUnless(zstandard, 'zstandard is not installed')
+    def test_zstd_compression(self):
+        path, manifest = BackupEngine(self.backup_dir, compression='zstd', engine='json').run('full')
+        self.assertTrue(all(filename.endswith('.zst') for filename in manifest['files']))
+
+
+def later(seconds):
+    """تقديم الوقت حتى لا تتطابق أسماء النسخ المأخوذة في نفس الثانية"""
+    now = timezone.now() + timedelta(seconds=seconds)
+    return mock.patch('django.utils.timezone.now', return_value=now)
+
+
+# بيانات الاختبار أُنشئت قبل ثوانٍ فيشملها هامش وقت النسخة السابقة
+@override_settings(BACKUP_WATERMARK_OVERLAP=0)
+class IncrementalBackupTests(TestCase):
+    """النسخة التزايدية تحتوي الصفوف المعدلة والمحذوفة منذ النسخة السابقة فقط"""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_hierarchy(regions=1, departments=2, institutes=2, students=5)
+
+    def setUp(self):
+        self.backup_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.backup_dir)
+        self.engine = BackupEngine(self.backup_dir, compression='gzip', engine='json')
+
+    def read_rows(self, path, filename):
+        with gzip.open(os.path.join(path, filename), 'rt', encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def test_captures_saves_and_deletes(self):
+        _, full = self.engine.run('full')
+        self.assertEqual(self.engine.plan('auto'), ('incremental', full))
+
+        student = Student.objects.first()
+        student.name = 'اسم معدل'
+        student.save()
+        # نتائج الاختبارات بدون updated_at وتُتبع بسجل التغييرات
+        result = StudentTest.objects.exclude(student=student).first()
+        result.score = Decimal('1.25')
+        result.save()
+        deleted = Student.objects.exclude(pk=student.pk).exclude(pk=result.student_id).first()
+        deleted_pk = deleted.pk
+        deleted_results = set(StudentTest.objects.filter(student=deleted).values_list('pk', flat=True))
+        deleted.delete()
+        region = Region.objects.create(name='منطقة جديدة', code='NEW')
+
+        with later(1):
+            path, manifest = self.engine.run('auto')
+        self.assertEqual(manifest['kind'], 'incremental')
+        self.assertEqual(manifest['chain'], [full['name'], manifest['name']])
+
+        files = {entry['model']: entry['file'] for entry in manifest['models']}
+        saved = {
+            label: {row['pk'] for row in self.read_rows(path, files[label])}
+            for label in ('fitness_management.student', 'fitness_management.studenttest', 'fitness_management.region')
+        }
+        self.assertEqual(saved['fitness_management.student'], {student.pk})
+        self.assertEqual(saved['fitness_management.studenttest'], {result.pk})
+        self.assertEqual(saved['fitness_management.region'], {region.pk})
+
+        deletions = self.read_rows(path, DELETIONS_FILE + '.gz')
+        self.assertEqual(
+            {(row['model'], row['pk']) for row in deletions},
+            {('fitness_management.student', deleted_pk)}
+            | {('fitness_management.studenttest', pk) for pk in deleted_results},
+        )
+
+    def test_full_backup_required(self):
+        with self.assertRaises(BackupError):
+            self.engine.run('incremental')
+        self.engine.run('full')
+        # بعد الاستعادة لا يصف سجل التغييرات الفرق عن آخر نسخة
+        open(os.path.join(self.backup_dir, RESTORE_MARKER), 'w').close()
+        self.assertEqual(self.engine.plan('auto'), ('full', None))
+        with self.assertRaises(BackupError):
+            self.engine.run('incremental')
+
+
+class CleanupOldBackupsTests(TestCase):
+    """حذف النسخ المنتهية دون المساس بما يحفظه التطبيق في مجلد النسخ"""
+
+    def setUp(self):
+        self.backup_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.backup_dir)
+
+    def test_only_backups_are_removed(self):
+        with override_settings(BACKUP_DIR=self.backup_dir):
+            backup_path, _ = BackupEngine().run('full')
+        for directory in ('analytics', 'reports', 'backup_20200101_000000.part'):
+            os.makedirs(os.path.join(self.backup_dir, directory))
+        for filename in (RESTORE_MARKER, 'backup_20200101_000000.json.zip', 'notes.txt'):
+            open(os.path.join(self.backup_dir, filename), 'w').close()
+
+        # مدة احتفاظ سالبة تجعل كل ما في المجلد أقدم من الحد
+        with override_settings(BACKUP_DIR=self.backup_dir, BACKUP_RETENTION_DAYS=-1):
+            cleanup_old_backups()
+
+        self.assertFalse(os.path.exists(backup_path))
+        self.assertEqual(sorted(os.listdir(self.backup_dir)), sorted([RESTORE_MARKER, 'analytics', 'notes.txt', 'reports']))
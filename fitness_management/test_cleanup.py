@@ -0,0 +1,68 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from .cleanup import archive_news, purge
+from .models import ArchivedEvent, ArchivedNews, ChangeLog, Event, News
+from .tasks import cleanup_database
+
+
+class PurgeTests(TestCase):
+    """الحذف على دفعات يؤرشف الصفوف القديمة ويحذف صورها ولا يمس الحديثة"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        now = timezone.now()
+        self.old_news = []
+        for n in range(7):
+            image = default_storage.save(f'news/old_{n}.jpg', ContentFile(b'image')) if n % 2 else ''
+            self.old_news.append(News.objects.create(title=f'خبر قديم {n}', content='محتوى', image=image))
+        News.objects.filter(pk__in=[news.pk for news in self.old_news]).update(created_at=now - timedelta(days=400))
+        self.recent_news = News.objects.create(title='خبر حديث', content='محتوى')
+        for n in range(4):
+            Event.objects.create(
+                title=f'فعالية {n}', description='وصف', location='القاهرة',
+                start_date=now - timedelta(days=10), end_date=now + timedelta(days=n - 2, hours=1),
+            )
+
+    def old_news_queryset(self):
+        return News.objects.filter(created_at__lt=timezone.now() - timedelta(days=365))
+
+    def test_purge_in_batches_with_archive(self):
+        images = [news.image.name for news in self.old_news if news.image]
+        reports = []
+        result = purge(
+            self.old_news_queryset(), archive=archive_news, file_fields=['image'], batch_size=3, progress=reports.append,
+        )
+        self.assertEqual((result.deleted, result.archived, result.files, result.batches), (7, 7, len(images), 3))
+        self.assertEqual(len(reports), 3)
+        self.assertEqual(list(News.objects.values_list('pk', flat=True)), [self.recent_news.pk])
+        self.assertEqual(
+            sorted(ArchivedNews.objects.values_list('original_id', 'title')),
+            sorted((news.pk, news.title) for news in self.old_news),
+        )
+        self.assertFalse(any(default_storage.exists(name) for name in images))
+        self.assertEqual(
+            set(ChangeLog.objects.filter(model='fitness_management.news', action='delete').values_list('object_id', flat=True)),
+            {news.pk for news in self.old_news},
+        )
+
+    def test_purge_nothing(self):
+        result = purge(News.objects.none(), archive=archive_news)
+        self.assertEqual((result.deleted, result.batches), (0, 0))
+
+    def test_task_without_archive(self):
+        message = cleanup_database(archive=False, batch_size=2)
+        self.assertIn('fitness_management.news: 7 deleted, 0 archived', message)
+        self.assertIn('fitness_management.event: 2 deleted, 0 archived', message)
+        self.assertEqual(Event.objects.count(), 2)
+        self.assertFalse(Event.objects.filter(end_date__lt=timezone.now()).exists())
+        self.assertFalse(ArchivedNews.objects.exists() or ArchivedEvent.objects.exists())
@@ -0,0 +1,59 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from .dashboard import LATEST_STUDENTS, build_dashboard_summary, get_dashboard_summary
+from .hierarchy import get_hierarchy, invalidate_hierarchy
+from .models import Department, Institute, Region, Student, StudentTest
+from .query_budget import create_users, seed_hierarchy
+
+
+class DashboardSummaryTests(TestCase):
+    """ملخص لوحة التحكم يطابق العد المباشر ويُحسب بعدد ثابت من الاستعلامات"""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_hierarchy(regions=2, departments=2, institutes=2, students=4)
+        cls.users = create_users()
+
+    def setUp(self):
+        cache.clear()
+        invalidate_hierarchy()
+
+    def test_totals_match_counts(self):
+        for user_type, user in self.users.items():
+            profile = user.userprofile
+            stats = get_dashboard_summary(profile)['stats']
+            with self.subTest(user_type=user_type):
+                self.assertEqual(stats, {
+                    'total_students': Student.objects.for_profile(profile).count(),
+                    'total_tests': StudentTest.objects.for_profile(profile).count(),
+                    'total_regions': Region.objects.for_profile(profile).count(),
+                    'total_departments': Department.objects.for_profile(profile).count(),
+                    'total_institutes': Institute.objects.for_profile(profile).count(),
+                })
+
+    def test_latest_students(self):
+        profile = self.users['department_admin'].userprofile
+        latest = get_dashboard_summary(profile)['latest_students']
+        expected = Student.objects.for_profile(profile).order_by('-created_at', '-id')[:LATEST_STUDENTS]
+        self.assertEqual([row['id'] for row in latest], [student.id for student in expected])
+
+    def test_constant_query_count(self):
+        # العدد لا يتغير بين النطاق الوطني ونطاق معهد واحد
+        hierarchy = get_hierarchy()
+        for user_type, user in self.users.items():
+            with self.subTest(user_type=user_type), self.assertNumQueries(2):
+                build_dashboard_summary(user.userprofile, hierarchy)
+
+    def test_summary_shared_by_scope(self):
+        profile = self.users['region_admin'].userprofile
+        summary = get_dashboard_summary(profile)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_dashboard_summary(profile), summary)
+
+    def test_dashboard_view(self):
+        for user_type, user in self.users.items():
+            self.client.force_login(user)
+            with self.subTest(user_type=user_type):
+                response = self.client.get(reverse('fitness_management:dashboard'))
+                self.assertEqual(response.status_code, 200)
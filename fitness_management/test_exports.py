@@ -0,0 +1,121 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from .exports import STUDENT_EXPORT_COLUMNS, export_students, iter_rows, student_queryset
+from .models import Institute, Student, StudentTest
+from .query_budget import create_users, seed_hierarchy
+from .tasks import export_student_data
+
+
+class StudentExportTests(TestCase):
+    """التصدير يكتب كل الطلاب المطابقين للمواصفات تدريجياً في ملف واحد"""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_hierarchy(regions=2, departments=1, institutes=2, students=10)
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir)
+
+    def export(self, format, spec=None, **kwargs):
+        path = os.path.join(self.output_dir, f'students.{format}')
+        exported = export_students(student_queryset(spec), format, path, **kwargs)
+        return exported, path
+
+    def test_formats_contain_every_student(self):
+        expected = list(Student.objects.order_by('id').values_list('id', flat=True))
+        for format in ('csv', 'ndjson', 'json'):
+            with self.subTest(format=format):
+                exported, path = self.export(format, chunk_size=7)
+                with open(path, encoding='utf-8') as f:
+                    if format == 'csv':
+                        ids = [int(row['ID']) for row in csv.DictReader(f)]
+                    elif format == 'ndjson':
+                        ids = [json.loads(line)['id'] for line in f]
+                    else:
+                        ids = [row['pk'] for row in json.load(f)]
+                self.assertEqual(exported, len(expected))
+                self.assertEqual(ids, expected)
+                self.assertFalse(os.path.exists(path + '.part'))
+
+    def test_spec_filters(self):
+        institute = Institute.objects.first()
+        spec = {'institute': institute.id, 'gender': 'male'}
+        exported, path = self.export('ndjson', spec)
+        with open(path, encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual(exported, Student.objects.filter(institute=institute, gender='male').count())
+        self.assertEqual({row['institute'] for row in rows}, {institute.name})
+        self.assertTrue(rows)
+        self.assertEqual({row['gender'] for row in rows}, {dict(Student.GENDER_CHOICES)['male']})
+
+    def test_progress_reported_per_chunk(self):
+        done = []
+        exported, _ = self.export('csv', chunk_size=7, progress=done.append)
+        self.assertEqual(done[-1], exported)
+        self.assertEqual(done[:-1], list(range(7, exported + 1, 7)))
+
+    def test_rows_read_in_one_query(self):
+        with self.assertNumQueries(1):
+            rows = list(iter_rows(student_queryset(), STUDENT_EXPORT_COLUMNS, chunk_size=7))
+        self.assertEqual(len(rows), Student.objects.count())
+
+    def test_task_accepts_spec_and_id_list(self):
+        region_id = Student.objects.first().region_id
+        ids = list(Student.objects.values_list('id', flat=True)[:3])
+        with override_settings(BACKUP_DIR=self.output_dir):
+            message = export_student_data({'region': region_id}, 'csv')
+            self.assertIn(f'({Student.objects.filter(region_id=region_id).count()} students)', message)
+            # قائمة المعرفات القديمة ما زالت مقبولة
+            self.assertIn('(3 students)', export_student_data(ids, 'ndjson'))
+        self.assertEqual(len(os.listdir(os.path.join(self.output_dir, 'exports'))), 2)
+
+
+class ExportViewTests(TestCase):
+    """تنزيل البيانات يتبع نطاق المستخدم وتصفية قائمة الطلاب ويُرسل تدريجياً"""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_hierarchy(regions=2, departments=1, institutes=2, students=10)
+        cls.users = create_users()
+
+    def download(self, user_type, **params):
+        self.client.force_login(self.users[user_type])
+        response = self.client.get(reverse('fitness_management:export_data'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_csv_respects_scope(self):
+        for user_type, user in self.users.items():
+            with self.subTest(user_type=user_type):
+                content = self.download(user_type)
+                self.assertTrue(content.startswith('\ufeff'))
+                ids = [int(row['ID']) for row in csv.DictReader(content[1:].splitlines())]
+                expected = Student.objects.for_profile(user.userprofile).order_by('id')
+                self.assertEqual(ids, list(expected.values_list('id', flat=True)))
+
+    def test_ndjson_filters(self):
+        content = self.download('region_admin', format='ndjson', gender='female', education_level='primary')
+        rows = [json.loads(line) for line in content.splitlines()]
+        expected = Student.objects.for_profile(self.users['region_admin'].userprofile).filter(
+            gender='female', education_level='primary'
+        )
+        self.assertEqual(sorted(row['id'] for row in rows), sorted(expected.values_list('id', flat=True)))
+
+    def test_test_results_dataset(self):
+        content = self.download('institute_admin', format='ndjson', dataset='tests', search='احمد')
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertTrue(rows)
+        institute_id = self.users['institute_admin'].userprofile.institute_id
+        self.assertEqual(
+            {row['id'] for row in rows},
+            set(StudentTest.objects.filter(
+                student__institute_id=institute_id, student__name_normalized__contains='احمد'
+            ).values_list('id', flat=True)),
+        )
@@ -0,0 +1,86 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from django.test import TestCase, override_settings
+from .exports import export_students, student_queryset
+from .fanout import merge_export_parts, part_path, slice_specs
+from .models import Institute, Student
+from .query_budget import seed_hierarchy
+from .tasks import export_student_data_fanout, generate_student_reports_fanout
+
+
+class FanoutTests(TestCase):
+    """التصدير الموزع على المعاهد يعطي نفس الصفوف التي يعطيها التصدير الواحد"""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_hierarchy(regions=2, departments=1, institutes=3, students=4)
+        # معهد بلا طلاب لا يحصل على جزء
+        Student.objects.filter(institute=Institute.objects.order_by('id').last()).delete()
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir)
+        settings = override_settings(BACKUP_DIR=self.output_dir)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        # الأجزاء والدمج تُنفذ فوراً دون وسيط رسائل
+        conf = export_student_data_fanout.app.conf
+        eager = conf.task_always_eager
+        conf.task_always_eager = True
+        self.addCleanup(setattr, conf, 'task_always_eager', eager)
+
+    def test_slice_specs(self):
+        region_id = Student.objects.first().region_id
+        slices = slice_specs({'region': region_id, 'gender': 'male'})
+        self.assertEqual(slices, [
+            {'region': region_id, 'gender': 'male', 'institute': institute_id}
+            for institute_id in Student.objects.filter(region_id=region_id, gender='male')
+            .order_by('institute_id').values_list('institute_id', flat=True).distinct()
+        ])
+        with self.assertRaises(ValueError):
+            slice_specs(by='region')
+
+    def test_merge_matches_single_export(self):
+        for format in ('csv', 'ndjson', 'json'):
+            with self.subTest(format=format):
+                path = os.path.join(self.output_dir, f'merged.{format}')
+                parts = []
+                for index, spec in enumerate(slice_specs(by='department')):
+                    parts.append(part_path(path, index, format))
+                    export_students(student_queryset(spec), format, parts[-1])
+                merge_export_parts(parts, path, format)
+                single = os.path.join(self.output_dir, f'single.{format}')
+                export_students(student_queryset().order_by('department_id', 'id'), format, single)
+                with open(path, encoding='utf-8') as merged, open(single, encoding='utf-8') as expected:
+                    if format == 'json':
+                        self.assertEqual(json.load(merged), json.load(expected))
+                    else:
+                        self.assertEqual(merged.read(), expected.read())
+                self.assertFalse(os.path.exists(path + '.parts'))
+
+    def test_export_chord(self):
+        message = export_student_data_fanout({'gender': 'female'}, 'csv')
+        self.assertIn('slices by institute', message)
+        exports_dir = os.path.join(self.output_dir, 'exports')
+        [filename] = os.listdir(exports_dir)
+        with open(os.path.join(exports_dir, filename), encoding='utf-8') as f:
+            ids = [int(row['ID']) for row in csv.DictReader(f)]
+        self.assertEqual(
+            ids, list(Student.objects.filter(gender='female').order_by('institute_id', 'id').values_list('id', flat=True))
+        )
+
+    def test_report_chord(self):
+        message = generate_student_reports_fanout(by='department')
+        self.assertIn('slices by department', message)
+        reports_dir = os.path.join(self.output_dir, 'reports')
+        [filename] = os.listdir(reports_dir)
+        with zipfile.ZipFile(os.path.join(reports_dir, filename)) as bundle:
+            names = sorted(bundle.namelist())
+        self.assertEqual(names, sorted(
+            f'institute_{institute_id}.zip'
+            for institute_id in Student.objects.values_list('institute_id', flat=True).distinct()
+        ))
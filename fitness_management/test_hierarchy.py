@@ -0,0 +1,75 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from .hierarchy import VERSION_KEY, get_hierarchy, invalidate_hierarchy
+from .models import Department, Institute, Region
+from .query_budget import seed_hierarchy
+
+
+@override_settings(HIERARCHY_CACHE_CHECK_INTERVAL=0)
+class HierarchyCacheTests(TestCase):
+    """نسخة الهيكل في الذاكرة تتبع قاعدة البيانات بعد كل حفظ أو حذف"""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_hierarchy(regions=2, departments=2, institutes=2, students=1)
+
+    def setUp(self):
+        invalidate_hierarchy()
+
+    def assertMatchesDatabase(self):
+        hierarchy = get_hierarchy()
+        self.assertEqual(
+            {node.id: (node.name, node.region_id) for node in hierarchy.departments.values()},
+            {d.id: (d.name, d.region_id) for d in Department.objects.all()},
+        )
+        self.assertEqual(
+            {node.id: (node.name, node.department_id, node.region_id) for node in hierarchy.institutes.values()},
+            {i.id: (i.name, i.department_id, i.department.region_id) for i in Institute.objects.select_related('department')},
+        )
+        self.assertEqual(set(hierarchy.regions), set(Region.objects.values_list('id', flat=True)))
+
+    def test_lookups_without_queries(self):
+        institute = Institute.objects.select_related('department').first()
+        get_hierarchy()
+        with self.assertNumQueries(0):
+            hierarchy = get_hierarchy()
+            self.assertEqual(
+                hierarchy.ancestors(institute_id=institute.id),
+                (institute.department.region_id, institute.department_id, institute.id),
+            )
+            self.assertIn(institute.id, [node.id for node in hierarchy.institutes_by_region[institute.department.region_id]])
+
+    def test_changes_refresh_after_commit(self):
+        get_hierarchy()
+        institute = Institute.objects.first()
+        other_region = Region.objects.exclude(department=institute.department_id).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            institute.name = 'معهد جديد الاسم'
+            institute.department = Department.objects.filter(region=other_region).first()
+            institute.save()
+        self.assertMatchesDatabase()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            department = Department.objects.create(name='إدارة جديدة', code='NEWD', region=other_region)
+        self.assertIn(department.id, get_hierarchy().departments)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            department.delete()
+        self.assertNotIn(department.id, get_hierarchy().departments)
+        self.assertMatchesDatabase()
+
+    def test_version_change_from_another_process(self):
+        hierarchy = get_hierarchy()
+        # عملية أخرى غيرت الهيكل ورفعت رقم النسخة في الذاكرة المشتركة
+        Region.objects.filter(pk=Region.objects.first().pk).update(name='منطقة معدلة')
+        cache.set(VERSION_KEY, 'other-process', None)
+        reloaded = get_hierarchy()
+        self.assertIsNot(reloaded, hierarchy)
+        self.assertIn('منطقة معدلة', [node.name for node in reloaded.regions.values()])
+
+    @override_settings(HIERARCHY_CACHE_CHECK_INTERVAL=3600)
+    def test_version_checked_at_interval(self):
+        hierarchy = get_hierarchy()
+        cache.set(VERSION_KEY, 'other-process', None)
+        with self.assertNumQueries(0):
+            self.assertIs(get_hierarchy(), hierarchy)
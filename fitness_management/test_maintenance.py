@@ -0,0 +1,38 @@
+from unittest import skipUnless
+from django.db import connection
+from django.test import TestCase
+from .maintenance import get_maintenance_backend
+from .models import News
+
+NEWS_TABLE = News._meta.db_table
+
+
+@skipUnless(connection.vendor == 'sqlite', 'SQLite maintenance plan')
+class SQLiteMaintenancePlanTests(TestCase):
+    """تحليل الجداول التي تغير عدد صفوفها فقط"""
+
+    def setUp(self):
+        self.backend = get_maintenance_backend(churn_threshold=0.5)
+
+    def news_steps(self):
+        return [(operation, reason) for operation, table, reason, _ in self.backend.plan() if table == NEWS_TABLE]
+
+    def add_news(self, count):
+        News.objects.bulk_create(News(title=f'خبر {n}', content='محتوى') for n in range(count))
+
+    def test_plan_follows_row_count_drift(self):
+        self.assertEqual(self.news_steps(), [])
+        self.add_news(10)
+        self.assertEqual(self.news_steps(), [('ANALYZE', 'never analyzed')])
+
+        self.backend.execute(f'ANALYZE {NEWS_TABLE}')
+        self.assertEqual(self.news_steps(), [])
+        # التعديل في المكان لا يغير عدد الصفوف فلا يُحسب تغييراً
+        News.objects.update(title='خبر معدل')
+        self.add_news(4)
+        self.assertEqual(self.news_steps(), [])
+
+        self.add_news(30)
+        self.assertEqual(self.news_steps(), [('ANALYZE', 'churn over 60%')])
+        News.objects.filter(id__in=list(News.objects.values_list('id', flat=True)[:40])).delete()
+        self.assertEqual(self.news_steps(), [('ANALYZE', 'churn 60%')])
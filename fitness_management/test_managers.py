@@ -0,0 +1,67 @@
+from accounts.models import UserProfile
+from django.test import TestCase
+from .models import Department, Institute, Region, Student, StudentTest
+from .query_budget import create_users, seed_hierarchy
+
+
+class ForProfileTests(TestCase):
+    """كل نوع مستخدم يرى سجلات نطاقه فقط في كل النماذج"""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_hierarchy(regions=2, departments=2, institutes=2, students=3)
+        cls.profiles = {
+            user_type: user.userprofile for user_type, user in create_users().items()
+        }
+
+    def expected(self, profile):
+        """السجلات المتوقعة لكل نموذج مع ربط الجداول بدلاً من الحقول المخزنة"""
+        if profile.user_type == 'region_admin':
+            institutes = Institute.objects.filter(department__region_id=profile.region_id)
+        elif profile.user_type == 'department_admin':
+            institutes = Institute.objects.filter(department_id=profile.department_id)
+        elif profile.user_type == 'institute_admin':
+            institutes = Institute.objects.filter(id=profile.institute_id)
+        else:
+            institutes = Institute.objects.all()
+        return {
+            Region: Region.objects.filter(department__institute__in=institutes),
+            Department: Department.objects.filter(institute__in=institutes),
+            Institute: institutes,
+            Student: Student.objects.filter(institute__in=institutes),
+            StudentTest: StudentTest.objects.filter(student__institute__in=institutes),
+        }
+
+    def ids(self, queryset):
+        return set(queryset.values_list('id', flat=True))
+
+    def test_scopes_match_hierarchy(self):
+        for user_type, profile in self.profiles.items():
+            for model, expected in self.expected(profile).items():
+                with self.subTest(user_type=user_type, model=model.__name__):
+                    scoped = self.ids(model.objects.for_profile(profile))
+                    self.assertTrue(scoped)
+                    self.assertEqual(scoped, self.ids(expected))
+
+    def test_narrower_scopes_see_less(self):
+        counts = [
+            Student.objects.for_profile(self.profiles[user_type]).count()
+            for user_type in ('super_admin', 'region_admin', 'department_admin', 'institute_admin')
+        ]
+        self.assertEqual(counts, sorted(counts, reverse=True))
+        self.assertGreater(counts[0], counts[-1])
+
+    def test_missing_scope_sees_nothing(self):
+        user = self.profiles['super_admin'].user
+        for user_type in ('region_admin', 'department_admin', 'institute_admin', 'unknown'):
+            profile = UserProfile(user=user, user_type=user_type)
+            for model in (Region, Department, Institute, Student, StudentTest):
+                with self.subTest(user_type=user_type, model=model.__name__):
+                    self.assertFalse(model.objects.for_profile(profile).exists())
+        self.assertFalse(Student.objects.for_profile(None).exists())
+
+    def test_listing_is_one_query(self):
+        profile = self.profiles['region_admin']
+        with self.assertNumQueries(1):
+            for student in Student.objects.for_profile(profile).for_listing():
+                str(student.institute.name)
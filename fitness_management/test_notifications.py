@@ -0,0 +1,89 @@
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from .notifications import create_notification, deliver
+
+
+class CountingBackend(EmailBackend):
+    """يحسب مرات فتح الاتصال"""
+
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return super().open()
+
+
+class RejectingBackend(EmailBackend):
+    """يرفض الرسائل الموجهة إلى عناوين rejected@"""
+
+    def send_messages(self, messages):
+        if any(address.startswith('rejected@') for message in messages for address in message.to):
+            raise ValueError('recipient rejected')
+        return super().send_messages(messages)
+
+
+class UnreachableBackend(EmailBackend):
+    """خادم لا يمكن الاتصال به"""
+
+    def open(self):
+        raise ConnectionRefusedError('connection refused')
+
+
+class DeliverTests(TestCase):
+    """إرسال الإشعارات على اتصال واحد مع تسجيل حالة كل مستلم"""
+
+    def setUp(self):
+        CountingBackend.opened = 0
+        self.notification = create_notification(
+            'مرحباً {{ name }}', 'رسالة إلى {{ email }}',
+            [('a@example.com', 'أحمد'), 'B@example.com', 'b@example.com', 'rejected@example.com', 'c@example.com'],
+        )
+
+    def statuses(self):
+        return dict(self.notification.deliveries.values_list('recipient', 'status'))
+
+    @override_settings(EMAIL_BACKEND='fitness_management.test_notifications.CountingBackend')
+    def test_messages_share_one_connection(self):
+        result = deliver(self.notification, batch_size=2)
+
+        self.assertEqual((result.sent, result.failed, result.batches), (4, 0, 2))
+        self.assertEqual(CountingBackend.opened, 1)
+        self.assertEqual(len(mail.outbox), 4)
+        self.assertEqual(mail.outbox[0].subject, 'مرحباً أحمد')
+        self.assertEqual(mail.outbox[0].body, 'رسالة إلى a@example.com')
+        self.assertEqual(set(self.statuses().values()), {'sent'})
+        self.assertEqual(deliver(self.notification).sent, 0)
+
+    @override_settings(EMAIL_BACKEND='fitness_management.test_notifications.RejectingBackend')
+    def test_failed_recipients_are_retried(self):
+        result = deliver(self.notification)
+        self.assertEqual((result.sent, result.failed), (3, 1))
+        delivery = self.notification.deliveries.get(recipient='rejected@example.com')
+        self.assertEqual((delivery.status, delivery.attempts, delivery.error), ('failed', 1, 'recipient rejected'))
+
+        # بدون retry_failed لا تُعاد المحاولة، ومعه تتوقف بعد max_attempts
+        self.assertEqual(deliver(self.notification).failed, 0)
+        self.assertEqual(deliver(self.notification, retry_failed=True, max_attempts=2).failed, 1)
+        self.assertEqual(deliver(self.notification, retry_failed=True, max_attempts=2).failed, 0)
+        self.assertEqual(len(mail.outbox), 3)
+
+        with self.settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'):
+            result = deliver(self.notification, retry_failed=True)
+        self.assertEqual(result.sent, 1)
+        self.assertEqual(set(self.statuses().values()), {'sent'})
+
+    @override_settings(EMAIL_BACKEND='fitness_management.test_notifications.UnreachableBackend')
+    def test_unreachable_server_marks_deliveries_failed(self):
+        result = deliver(self.notification)
+
+        self.assertEqual((result.sent, result.failed), (0, 4))
+        self.assertEqual(result.error, 'connection refused')
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(
+            set(self.notification.deliveries.values_list('status', 'attempts', 'error')),
+            {('failed', 1, 'connection refused')},
+        )
+
+        with self.settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'):
+            self.assertEqual(deliver(self.notification, retry_failed=True).sent, 4)
@@ -0,0 +1,82 @@
+from django.test import TestCase
+from django.urls import reverse
+from .models import Student
+from .pagination import KeysetPaginator
+from .query_budget import create_users, seed_hierarchy
+from .views import STUDENT_LIST_ORDERINGS
+
+
+class KeysetPaginatorTests(TestCase):
+    """التنقل بين الصفحات يمر على كل الصفوف مرة واحدة في الاتجاهين"""
+
+    @classmethod
+    def setUpTestData(cls):
+        # أسماء البذور مكررة، فيُختبر الترتيب عند تساوي المفتاح الأول
+        seed_hierarchy(regions=1, departments=1, institutes=2, students=25)
+
+    def walk_forward(self, paginator):
+        pages = [paginator.get_page()]
+        while pages[-1].has_next:
+            pages.append(paginator.get_page(pages[-1].next_cursor))
+        return pages
+
+    def test_pages_cover_every_row_once(self):
+        for sort, ordering in STUDENT_LIST_ORDERINGS.items():
+            with self.subTest(sort=sort):
+                expected = list(Student.objects.order_by(*ordering).values_list('id', flat=True))
+                paginator = KeysetPaginator(Student.objects.all(), 7, ordering)
+                pages = self.walk_forward(paginator)
+                ids = [student.id for page in pages for student in page]
+                self.assertEqual(ids, expected)
+                self.assertFalse(pages[0].has_previous)
+                self.assertTrue(all(len(page) == 7 for page in pages[:-1]))
+
+    def test_previous_pages_match_forward_pages(self):
+        for sort, ordering in STUDENT_LIST_ORDERINGS.items():
+            with self.subTest(sort=sort):
+                paginator = KeysetPaginator(Student.objects.all(), 7, ordering)
+                pages = self.walk_forward(paginator)
+                page = pages[-1]
+                for expected in reversed(pages[:-1]):
+                    page = paginator.get_page(page.previous_cursor)
+                    self.assertEqual([s.id for s in page], [s.id for s in expected])
+                self.assertFalse(page.has_previous)
+                self.assertTrue(page.has_next)
+
+    def test_bad_cursor_returns_first_page(self):
+        paginator = KeysetPaginator(Student.objects.all(), 7, STUDENT_LIST_ORDERINGS['name'])
+        first = [s.id for s in paginator.get_page()]
+        for cursor in ('garbage', paginator.encode_cursor(Student.objects.first(), True) + 'x'):
+            with self.subTest(cursor=cursor):
+                self.assertEqual([s.id for s in paginator.get_page(cursor)], first)
+
+
+class StudentListPaginationTests(TestCase):
+    """قائمة الطلاب تعرض كل طالب في صفحة واحدة فقط"""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_hierarchy(regions=1, departments=1, institutes=2, students=25)
+        cls.users = create_users()
+
+    def setUp(self):
+        self.client.force_login(self.users['super_admin'])
+
+    def test_walk_all_pages(self):
+        url = reverse('fitness_management:student_list')
+        for sort in STUDENT_LIST_ORDERINGS:
+            with self.subTest(sort=sort):
+                ids, cursor = [], None
+                while True:
+                    params = {'sort': sort}
+                    if cursor:
+                        params['cursor'] = cursor
+                    response = self.client.get(url, params)
+                    self.assertEqual(response.status_code, 200)
+                    page = response.context['page_obj']
+                    ids.extend(student.id for student in page)
+                    if not page.has_next:
+                        break
+                    cursor = page.next_cursor
+                self.assertEqual(len(ids), len(set(ids)))
+                self.assertEqual(set(ids), set(Student.objects.values_list('id', flat=True)))
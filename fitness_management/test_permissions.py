@@ -0,0 +1,86 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from .hierarchy import get_hierarchy, invalidate_hierarchy
+from .models import Department, Institute, Region, Student
+from .permissions import ProfileScope
+from .query_budget import create_users, seed_hierarchy
+
+
+class ProfileScopeTests(TestCase):
+    """صلاحيات الإدارة تطابق نطاق المستخدم دون أي استعلام"""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_hierarchy(regions=2, departments=2, institutes=2, students=2)
+        cls.users = create_users()
+
+    def setUp(self):
+        invalidate_hierarchy()
+
+    def test_matches_scoped_querysets(self):
+        objects = {
+            'region': (Region.objects.all(), Region),
+            'department': (Department.objects.all(), Department),
+            'institute': (Institute.objects.all(), Institute),
+            'student': (Student.objects.all(), Student),
+        }
+        for user_type, user in self.users.items():
+            profile = user.userprofile
+            scope = ProfileScope(profile)
+            for name, (queryset, model) in objects.items():
+                allowed = set(model.objects.for_profile(profile).values_list('id', flat=True))
+                rows = list(queryset)
+                check = getattr(scope, f'can_manage_{name}')
+                with self.subTest(user_type=user_type, model=name), self.assertNumQueries(0):
+                    self.assertEqual({row.id for row in rows if check(row)}, allowed)
+
+    def test_student_without_scope_columns(self):
+        scope = ProfileScope(self.users['department_admin'].userprofile)
+        student = Student.objects.filter(department_id=scope.department_id).first()
+        student.department_id = student.region_id = None
+        self.assertTrue(scope.can_manage_student(student))
+
+    def test_can_view_scope(self):
+        hierarchy = get_hierarchy()
+        profile = self.users['department_admin'].userprofile
+        scope = ProfileScope(profile, hierarchy)
+        own = hierarchy.departments[profile.department_id]
+        other = next(node for node in hierarchy.departments.values() if node.region_id != own.region_id)
+        self.assertTrue(scope.can_view_scope('department', own.id))
+        self.assertTrue(scope.can_view_scope('institute', hierarchy.institutes_by_department[own.id][0].id))
+        self.assertFalse(scope.can_view_scope('region', own.region_id))
+        self.assertFalse(scope.can_view_scope('department', other.id))
+        self.assertFalse(scope.can_view_scope('national', 0))
+
+
+class StudentPermissionViewTests(TestCase):
+    """صفحات الطلاب تمنع التعديل خارج النطاق وتحسب الصلاحيات دون استعلام لكل صف"""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_hierarchy(regions=2, departments=2, institutes=2, students=15)
+        cls.users = create_users()
+
+    def test_edit_outside_scope_redirects(self):
+        user = self.users['institute_admin']
+        self.client.force_login(user)
+        outside = Student.objects.exclude(institute_id=user.userprofile.institute_id).first()
+        response = self.client.get(reverse('fitness_management:edit_student', args=[outside.id]))
+        self.assertRedirects(response, reverse('fitness_management:student_list'))
+        inside = Student.objects.filter(institute_id=user.userprofile.institute_id).first()
+        response = self.client.get(reverse('fitness_management:edit_student', args=[inside.id]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_list_flags_without_extra_queries(self):
+        self.client.force_login(self.users['region_admin'])
+        url = reverse('fitness_management:student_list')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        page = response.context['page_obj']
+        self.assertEqual(len(page), 20)
+        self.assertTrue(all(student.can_manage for student in page))
+        # عدد الاستعلامات لا يزيد مع عدد الصفوف المعروضة
+        self.assertLess(len(queries), len(page))
@@ -0,0 +1,18 @@
+from django.test import TestCase, override_settings
+from .query_budget import TEST_CACHES, budget_urls, create_users, measure, sample_kwargs, seed_hierarchy
+
+
+@override_settings(CACHES=TEST_CACHES)
+class QueryBudgetTests(TestCase):
+    """كل صفحة تعمل لكل نوع حساب في حدود ميزانية الاستعلامات"""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_hierarchy()
+        cls.users = create_users()
+
+    def test_views_within_budget(self):
+        results = measure(self.users, budget_urls(sample_kwargs()))
+        self.assertTrue(results)
+        self.assertEqual([str(result) for result in results if result.status >= 500], [])
+        self.assertEqual([str(result) for result in results if result.over_budget], [])
@@ -0,0 +1,29 @@
+from django.db import connection
+from django.test import TestCase
+from .query_budget import seed_hierarchy
+from .query_plans import check_plans
+
+
+class QueryPlanTests(TestCase):
+    """استعلامات الصفحات الرئيسية تبحث في الفهارس ولا تقرأ الجداول كاملة"""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_hierarchy()
+
+    def assertPlansUseIndexes(self):
+        results = check_plans()
+        self.assertTrue(results)
+        failures = {label: problems for label, plan, problems in results if problems}
+        self.assertEqual(failures, {}, '\n\n'.join(plan for label, plan, problems in results if problems))
+
+    def test_plans_use_indexes(self):
+        self.assertPlansUseIndexes()
+
+    def test_plans_use_indexes_after_analyze(self):
+        # بعد جمع الإحصائيات يختار المخطط بين الفهارس حسب انتقائيتها
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            self.skipTest('ANALYZE needs a table list on this backend')
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.assertPlansUseIndexes()
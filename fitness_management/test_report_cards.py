@@ -0,0 +1,61 @@
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from django.test import TestCase
+from .models import Institute, Student, StudentTest
+from .query_budget import seed_hierarchy
+from .report_cards import generate_reports, student_report
+
+
+class ReportCardTests(TestCase):
+    """تقارير المعاهد المجمعة تطابق التقرير الفردي لكل طالب"""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_hierarchy(regions=2, departments=1, institutes=2, students=5)
+        # طالب بلا نتائج في أول معهد
+        StudentTest.objects.filter(student=Student.objects.order_by('id').first()).delete()
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir)
+
+    def read_archive(self, path):
+        with zipfile.ZipFile(path) as archive:
+            return {name: json.loads(archive.read(name)) for name in archive.namelist()}
+
+    def test_archives_match_single_reports(self):
+        region_id = Student.objects.first().region_id
+        with self.assertNumQueries(2):
+            summary = generate_reports({'region': region_id}, output_dir=self.output_dir, workers=1)
+
+        institutes = Institute.objects.filter(department__region_id=region_id)
+        self.assertEqual(
+            sorted(os.path.basename(path) for path in summary['archives']),
+            sorted(f'institute_{institute.pk}.zip' for institute in institutes),
+        )
+        self.assertEqual(summary['students'], Student.objects.filter(region_id=region_id).count())
+        self.assertEqual(summary['tests'], StudentTest.objects.filter(region_id=region_id).count())
+
+        for path in summary['archives']:
+            files = self.read_archive(path)
+            summary_file = files.pop('summary.json')
+            with self.subTest(institute=summary_file['institute_id']):
+                students = Student.objects.filter(institute_id=summary_file['institute_id'])
+                self.assertEqual(summary_file['total_students'], students.count())
+                self.assertEqual(files, {
+                    f'student_{student.pk}.json': json.loads(json.dumps(student_report(student.pk)))
+                    for student in students
+                })
+
+    def test_parallel_workers(self):
+        serial = generate_reports(output_dir=os.path.join(self.output_dir, 'serial'), workers=1)
+        parallel = generate_reports(output_dir=os.path.join(self.output_dir, 'parallel'), workers=2)
+        self.assertEqual((parallel['students'], parallel['tests']), (serial['students'], serial['tests']))
+        self.assertEqual(
+            [self.read_archive(path) for path in sorted(parallel['archives'])],
+            [self.read_archive(path) for path in sorted(serial['archives'])],
+        )
+        self.assertFalse([name for name in os.listdir(parallel['path']) if name.endswith('.part')])
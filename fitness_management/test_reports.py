@@ -0,0 +1,36 @@
+from django.db.models import Max, Sum
+from django.test import TestCase
+from django.urls import reverse
+from .models import StatisticsRollup, Student, StudentTest
+from .query_budget import create_users, seed_hierarchy
+from .statistics import rollup_statistics, test_statistics
+
+
+class ReportStatisticsTests(TestCase):
+    """إحصائيات التقارير تطابق التجميع المباشر للجداول"""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_hierarchy(regions=2, departments=2, institutes=1, students=8)
+        cls.users = create_users()
+
+    def test_test_statistics(self):
+        stats = test_statistics(StudentTest.objects.all())
+        totals = StudentTest.objects.aggregate(score_sum=Sum('score'), highest=Max('score'))
+        self.assertEqual(stats['total_tests'], StudentTest.objects.count())
+        self.assertEqual(stats['score_sum'], totals['score_sum'])
+        self.assertEqual(stats['highest_score'], totals['highest'])
+        self.assertEqual(sum(row['count'] for row in stats['by_test']), stats['total_tests'])
+
+    def test_rollup_statistics(self):
+        stats = rollup_statistics(StatisticsRollup.objects.all())
+        self.assertEqual(stats['total_students'], Student.objects.count())
+        self.assertEqual(stats['male_students'], Student.objects.filter(gender='male').count())
+        self.assertEqual(stats['score_sum'], StudentTest.objects.aggregate(total=Sum('score'))['total'])
+
+    def test_reports_view_shows_score_sum(self):
+        self.client.force_login(self.users['super_admin'])
+        response = self.client.get(reverse('fitness_management:reports'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'مجموع الدرجات')
+        self.assertEqual(response.context['test_stats']['score_sum'], StudentTest.objects.aggregate(total=Sum('score'))['total'])
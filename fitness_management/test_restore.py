@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from django.test import TransactionTestCase, override_settings
+from .backups import RESTORE_MARKER, BackupEngine, BackupError, backup_models
+from .models import Institute, Region, StatisticsRollup, Student, StudentTest
+from .query_budget import seed_hierarchy
+from .restore import Restorer
+from .test_backups import later
+
+
+class RestoreTests(TransactionTestCase):
+    """استعادة نسخة كاملة ثم تزايدية تعيد نفس البيانات بنفس عدد الصفوف"""
+
+    def setUp(self):
+        self.backup_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.backup_dir)
+        settings = override_settings(BACKUP_DIR=self.backup_dir, BACKUP_WATERMARK_OVERLAP=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        seed_hierarchy(regions=1, departments=2, institutes=2, students=5)
+
+    def state(self):
+        return {
+            'counts': {model._meta.label_lower: model._base_manager.count() for model in backup_models()},
+            'students': sorted(Student.objects.values_list('id', 'name', 'institute_id', 'region_id')),
+            'results': sorted(StudentTest.objects.values_list('id', 'student_id', 'score')),
+            'rollups': sorted(StatisticsRollup.objects.values_list('institute_id', 'gender', 'student_count', 'test_count')),
+        }
+
+    def test_full_and_incremental_chain(self):
+        engine = BackupEngine(compression='gzip', engine='json')
+        engine.run('full')
+
+        student = Student.objects.first()
+        student.name = 'اسم معدل'
+        student.institute = Institute.objects.exclude(pk=student.institute_id).first()
+        student.save()
+        result = StudentTest.objects.exclude(student=student).first()
+        result.score = Decimal('3.50')
+        result.save()
+        Student.objects.exclude(pk__in=[student.pk, result.student_id]).first().delete()
+        Region.objects.create(name='منطقة جديدة', code='NEW')
+        with later(1):
+            path, manifest = engine.run('incremental')
+        expected = self.state()
+
+        # تعديلات بعد النسخة تختفي بالاستعادة
+        Student.objects.all().delete()
+        summary = Restorer(path, workers=1, batch_size=7, flush=True).run()
+
+        self.assertEqual(summary['backups'], manifest['chain'])
+        self.assertEqual(self.state(), expected)
+        self.assertTrue(os.path.exists(os.path.join(self.backup_dir, RESTORE_MARKER)))
+        # معرفات الصفوف الجديدة تبدأ بعد المستعادة
+        self.assertGreater(Region.objects.create(name='بعد الاستعادة', code='AFTER').pk, max(
+            Region.objects.exclude(code='AFTER').values_list('pk', flat=True)
+        ))
+
+    def test_refuses_changed_files_and_filled_tables(self):
+        path, manifest = BackupEngine(compression='gzip', engine='json').run('full')
+        with self.assertRaisesMessage(BackupError, 'not empty'):
+            Restorer(path, workers=1).run()
+
+        filename = next(iter(manifest['files']))
+        with open(os.path.join(path, filename), 'ab') as f:
+            f.write(b'x')
+        count = Student.objects.count()
+        with self.assertRaisesMessage(BackupError, 'checksum mismatch'):
+            Restorer(path, workers=1, flush=True).run()
+        self.assertEqual(Student.objects.count(), count)
@@ -0,0 +1,86 @@
+from datetime import date
+from decimal import Decimal
+from django.test import TestCase
+from . import rollups
+from .models import Department, Institute, StatisticsRollup, Student, StudentTest, Test
+from .query_budget import seed_hierarchy
+
+
+class StatisticsRollupTests(TestCase):
+    """الإحصائيات المجمعة بعد كل تعديل تساوي إعادة بنائها من البيانات"""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_hierarchy(regions=2, departments=2, institutes=2, students=6)
+
+    def snapshot(self):
+        # المجموعات التي لم يبق فيها طلاب لا تظهر في إعادة البناء
+        return sorted(
+            StatisticsRollup.objects.filter(student_count__gt=0).values_list(
+                *rollups.KEY_FIELDS, 'department_id', 'region_id',
+                'student_count', 'test_count', 'score_sum', 'score_min', 'score_max',
+            )
+        )
+
+    def assertMatchesRebuild(self):
+        incremental = self.snapshot()
+        rollups.rebuild()
+        self.assertEqual(incremental, self.snapshot())
+
+    def new_result(self, student, score):
+        test = Test.objects.exclude(studenttest__student=student).first()
+        return StudentTest.objects.create(student=student, test=test, score=score, test_date=date(2025, 3, 1))
+
+    def test_add_student_and_result(self):
+        student = Student.objects.first()
+        copy = Student.objects.create(
+            name='طالب جديد', national_id='30001010100011', gender=student.gender,
+            education_level=student.education_level, grade='1', institute_id=student.institute_id,
+            academic_year_id=student.academic_year_id,
+        )
+        self.new_result(copy, Decimal('0.50'))
+        self.new_result(student, Decimal('19.75'))
+        self.assertMatchesRebuild()
+
+    def test_edit_score(self):
+        result = StudentTest.objects.order_by('-score').first()
+        # خفض أعلى درجة يتطلب إعادة حساب حد المجموعة
+        result.score = Decimal('0')
+        result.save()
+        self.assertMatchesRebuild()
+
+    def test_move_student(self):
+        student = Student.objects.filter(studenttest__isnull=False).first()
+        student.institute = Institute.objects.exclude(pk=student.institute_id).last()
+        student.gender = 'female' if student.gender == 'male' else 'male'
+        student.save()
+        self.assertMatchesRebuild()
+
+    def test_move_result_to_another_student(self):
+        result = StudentTest.objects.first()
+        result.student = Student.objects.exclude(institute_id=result.student.institute_id).exclude(
+            studenttest__test_id=result.test_id
+        ).first()
+        result.save()
+        self.assertMatchesRebuild()
+
+    def test_delete_results(self):
+        StudentTest.objects.order_by('score')[:1].get().delete()
+        StudentTest.objects.filter(pk__in=StudentTest.objects.order_by('-score').values('pk')[:5]).delete()
+        self.assertMatchesRebuild()
+
+    def test_delete_student_with_results(self):
+        Student.objects.filter(studenttest__isnull=False).first().delete()
+        Student.objects.filter(pk__in=Student.objects.order_by('-id').values('pk')[:3]).delete()
+        self.assertMatchesRebuild()
+
+    def test_delete_institute_and_department(self):
+        Institute.objects.first().delete()
+        Department.objects.last().delete()
+        self.assertMatchesRebuild()
+
+    def test_move_department_to_another_region(self):
+        department = Department.objects.first()
+        department.region = Department.objects.exclude(region=department.region_id).first().region
+        department.save()
+        self.assertMatchesRebuild()
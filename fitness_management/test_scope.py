@@ -0,0 +1,73 @@
+from io import StringIO
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase
+from .models import Department, Institute, Student, StudentTest
+from .query_budget import seed_hierarchy
+
+
+class ScopeColumnsTests(TestCase):
+    """حقول الإدارة والمنطقة المخزنة تتبع المعهد بعد كل نقل"""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_hierarchy(regions=2, departments=2, institutes=2, students=5)
+
+    def assertScopesMatch(self):
+        students = Student.objects.exclude(
+            department_id=F('institute__department_id'), region_id=F('institute__department__region_id'),
+        )
+        self.assertFalse(students.values_list('id', flat=True))
+        tests = StudentTest.objects.exclude(
+            department_id=F('student__institute__department_id'),
+            region_id=F('student__institute__department__region_id'),
+        )
+        self.assertFalse(tests.values_list('id', flat=True))
+
+    def test_seeded_scopes(self):
+        self.assertScopesMatch()
+
+    def test_student_moves_institute(self):
+        student = Student.objects.filter(studenttest__isnull=False).first()
+        target = Institute.objects.exclude(department__region_id=student.region_id).first()
+        student.institute = target
+        student.save()
+        self.assertScopesMatch()
+
+    def test_student_moves_with_update_fields(self):
+        student = Student.objects.filter(studenttest__isnull=False).first()
+        target = Institute.objects.exclude(department__region_id=student.region_id).first()
+        student.institute = target
+        student.save(update_fields=['institute'])
+        student.refresh_from_db()
+        self.assertEqual(student.region_id, target.department.region_id)
+        self.assertScopesMatch()
+
+    def test_institute_moves_department(self):
+        institute = Institute.objects.first()
+        institute.department = Department.objects.exclude(region_id=institute.department.region_id).first()
+        institute.save()
+        self.assertScopesMatch()
+
+    def test_department_moves_region(self):
+        department = Department.objects.first()
+        department.region_id = Department.objects.exclude(region_id=department.region_id).values_list(
+            'region_id', flat=True
+        ).first()
+        department.save()
+        self.assertScopesMatch()
+
+    def test_result_moves_student(self):
+        result = StudentTest.objects.first()
+        other = Student.objects.exclude(region_id=result.region_id).exclude(
+            studenttest__test_id=result.test_id
+        ).first()
+        result.student = other
+        result.save()
+        self.assertScopesMatch()
+
+    def test_backfill_command(self):
+        Student.objects.update(department_id=None, region_id=None)
+        StudentTest.objects.update(department_id=None, region_id=None)
+        call_command('backfill_student_scope', chunk_size=7, stdout=StringIO())
+        self.assertScopesMatch()
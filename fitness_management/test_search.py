@@ -0,0 +1,41 @@
+from unittest import mock
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from .query_budget import create_users, seed_hierarchy
+from .search import SEARCH_TABLE, get_search_backend
+
+
+class StudentListSearchTests(TestCase):
+    """البحث في قائمة الطلاب لا يفشل مهما كان نص البحث أو حالة الفهرس"""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_hierarchy(regions=1, departments=1, institutes=2, students=10)
+        cls.users = create_users()
+
+    def setUp(self):
+        self.client.force_login(self.users['super_admin'])
+
+    def search(self, query):
+        return self.client.get(reverse('fitness_management:student_list'), {'search': query})
+
+    def test_search_by_name(self):
+        response = self.search('احمد')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['page_obj'])
+
+    def test_search_without_words(self):
+        for query in ('!!!', '"', '   '):
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query).status_code, 200)
+
+    def test_search_without_index_table(self):
+        backend = get_search_backend()
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE {SEARCH_TABLE}')
+        # حالة الفهرس تُحفظ في المحرك، فتُعاد قراءتها بعد حذف الجدول
+        with mock.patch.object(backend, '_available', None):
+            response = self.search('احمد')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['page_obj'])
@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from django.db.models import Sum
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from .models import Region, StatisticsSnapshot, Student, StudentTest
+from .query_budget import create_users, seed_hierarchy
+from .snapshots import capture_snapshot, downsample, period_start, series
+
+
+class SnapshotTests(TestCase):
+    """اللقطات الدورية تطابق البيانات وتُدمج القديمة منها مع الاحتفاظ بآخر قيمة"""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_hierarchy(regions=2, departments=2, institutes=1, students=4)
+        cls.users = create_users()
+
+    def test_capture_matches_data(self):
+        capture_snapshot()
+        capture_snapshot()
+        national = StatisticsSnapshot.objects.get(scope='national')
+        self.assertEqual(national.student_count, Student.objects.count())
+        self.assertEqual(national.test_count, StudentTest.objects.count())
+        self.assertEqual(national.score_sum, StudentTest.objects.aggregate(total=Sum('score'))['total'])
+        self.assertEqual(national.male_students + national.female_students, national.student_count)
+        for region in Region.objects.all():
+            with self.subTest(region=region.pk):
+                snapshot = StatisticsSnapshot.objects.get(scope='region', scope_id=region.pk)
+                self.assertEqual(snapshot.student_count, Student.objects.filter(region=region).count())
+        # لقطة واحدة لكل نطاق في الساعة مهما تكرر التسجيل
+        self.assertEqual(StatisticsSnapshot.objects.filter(scope='region').count(), Region.objects.count())
+
+    def add_points(self, resolution, start, step, count):
+        for n in range(count):
+            StatisticsSnapshot.objects.create(
+                scope='national', scope_id=0, resolution=resolution, timestamp=start + step * n,
+                student_count=n, test_count=n * 2, score_sum=Decimal(n * 10),
+            )
+
+    def test_downsample_keeps_last_value(self):
+        now = timezone.now()
+        day = period_start(now - timedelta(days=10), 'day')
+        self.add_points('hour', day, timedelta(hours=1), 24)
+        week = period_start(now - timedelta(days=400), 'week')
+        self.add_points('day', week, timedelta(days=1), 7)
+        recent = period_start(now, 'hour')
+        self.add_points('hour', recent, timedelta(hours=1), 1)
+
+        self.assertEqual(downsample(now), 2)
+        points = list(StatisticsSnapshot.objects.order_by('timestamp').values_list('resolution', 'timestamp', 'student_count'))
+        self.assertEqual(points, [('week', week, 6), ('day', day, 23), ('hour', recent, 0)])
+
+    def test_series(self):
+        start = period_start(timezone.now() - timedelta(days=2), 'hour')
+        self.add_points('hour', start, timedelta(hours=1), 3)
+        data = series('national', start=start, metrics=('student_count', 'test_count'))
+        self.assertEqual(data['student_count'], [0, 1, 2])
+        self.assertEqual(data['average_score'], [0, 5.0, 5.0])
+        self.assertEqual(
+            [datetime.fromisoformat(timestamp) for timestamp in data['timestamps']],
+            [start + timedelta(hours=n) for n in range(3)],
+        )
+        empty = series('region', 999)
+        self.assertEqual((empty['timestamps'], empty['student_count'], empty['average_score']), ([], [], []))
+
+    def test_trend_endpoint_scope(self):
+        capture_snapshot()
+        url = reverse('fitness_management:statistics_trend')
+        user = self.users['region_admin']
+        self.client.force_login(user)
+        data = self.client.get(url).json()
+        self.assertEqual((data['scope'], data['scope_id']), ('region', user.userprofile.region_id))
+        self.assertEqual(data['student_count'], [Student.objects.filter(region_id=user.userprofile.region_id).count()])
+
+        other = Region.objects.exclude(pk=user.userprofile.region_id).first()
+        self.assertEqual(self.client.get(url, {'scope': 'region', 'scope_id': other.pk}).status_code, 403)
+        self.assertEqual(self.client.get(url, {'scope': 'national'}).status_code, 403)
+        self.assertEqual(self.client.get(url, {'scope': 'region', 'scope_id': 'x'}).status_code, 400)
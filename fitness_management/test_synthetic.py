@@ -0,0 +1,71 @@
+import shutil
+import tempfile
+from datetime import date
+from io import StringIO
+from django.core.management import CommandError, call_command
+from django.db.models import Count, F, Sum
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from .models import Department, Institute, Region, StatisticsRollup, Student, StudentTest
+from .synthetic import TEST_BATTERY, generate, is_valid_national_id, national_id
+
+
+class NationalIdTests(SimpleTestCase):
+    """الأرقام القومية المولدة صحيحة البنية والتحقق ويظهر فيها النوع"""
+
+    def test_generated_ids_are_valid(self):
+        for birth_date, governorate, serial, gender in (
+            (date(2012, 3, 4), 1, 0, 'male'), (date(1999, 12, 31), 35, 4999, 'female'), (date(2010, 1, 1), 88, 7, 'male'),
+        ):
+            with self.subTest(birth_date=birth_date, serial=serial):
+                value = national_id(birth_date, governorate, serial, gender)
+                self.assertTrue(is_valid_national_id(value))
+                self.assertEqual(value[1:7], f'{birth_date:%y%m%d}')
+                self.assertEqual(int(value[12]) % 2, 1 if gender == 'male' else 0)
+
+    def test_invalid_ids(self):
+        value = national_id(date(2012, 3, 4), 1, 0, 'male')
+        wrong_digit = value[:13] + str((int(value[13]) + 1) % 10)
+        for invalid in (wrong_digit, '3121304' + value[7:], value[:7] + '99' + value[9:], value[:13], 'x' * 14):
+            with self.subTest(value=invalid):
+                self.assertFalse(is_valid_national_id(invalid))
+        with self.assertRaises(ValueError):
+            national_id(date(2012, 3, 4), 1, 5000, 'male')
+
+
+class GenerateDatasetTests(TransactionTestCase):
+    """البيانات المولدة بالحجم المطلوب ومتسقة مع قيود النظام"""
+
+    def setUp(self):
+        backup_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, backup_dir)
+        settings = override_settings(BACKUP_DIR=backup_dir)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_generate(self):
+        summary = generate(regions=3, departments=6, institutes=12, students=400, results=1500, batch_size=70, seed=1)
+        counts = (Region.objects.count(), Department.objects.count(), Institute.objects.count(), Student.objects.count())
+        self.assertEqual(counts, (3, 6, 12, 400))
+        self.assertEqual(summary.results, StudentTest.objects.count())
+        self.assertLessEqual(summary.results, 400 * len(TEST_BATTERY))
+        self.assertAlmostEqual(summary.results, 1500, delta=300)
+
+        national_ids = list(Student.objects.values_list('national_id', flat=True))
+        self.assertEqual(len(set(national_ids)), len(national_ids))
+        self.assertTrue(all(is_valid_national_id(value) for value in national_ids))
+
+        self.assertFalse(Student.objects.exclude(
+            department_id=F('institute__department_id'), region_id=F('institute__department__region_id')
+        ).exists())
+        self.assertFalse(StudentTest.objects.exclude(region_id=F('student__region_id')).exists())
+        # أحجام المعاهد غير متساوية
+        sizes = Institute.objects.annotate(students=Count('student')).values_list('students', flat=True)
+        self.assertGreater(max(sizes), min(sizes))
+        self.assertEqual(StatisticsRollup.objects.aggregate(total=Sum('student_count'))['total'], 400)
+
+        with self.assertRaises(CommandError):
+            call_command('generate_dataset', regions=1, departments=1, institutes=1, students=1, stdout=StringIO())
+
+    def test_levels_need_parents(self):
+        with self.assertRaises(ValueError):
+            generate(regions=3, departments=2, institutes=5, students=10, results=10)
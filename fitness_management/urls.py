@@ -12,6 +12,7 @@ urlpatterns = [
     
     # إدارة الطلاب
     path('students/', views.student_list, name='student_list'),
+    path('students/export/', views.export_data, name='export_data'),
     path('students/add/', views.add_student, name='add_student'),
     path('students/<int:student_id>/', views.student_detail, name='student_detail'),
     path('students/<int:student_id>/edit/', views.edit_student, name='edit_student'),
@@ -42,6 +43,7 @@ path('api/institutes/<int:department_id>/', views.get_institutes_by_department,
     
     # التقارير والإحصائيات
     path('reports/', views.reports, name='reports'),
+    path('api/statistics/trend/', views.statistics_trend, name='statistics_trend'),
     
     # الأخبار
     path('news/', views.news_list, name='news_list'),
@@ -1,15 +1,34 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.db.models import Q, Sum, Avg
-from django.http import JsonResponse
+from django.db.models import Sum
+from django.http import JsonResponse, StreamingHttpResponse
 from django.core.paginator import Paginator
 from django.utils import timezone
 from .models import *
 from .forms import *
+from .dashboard import get_dashboard_summary
+from .exports import (
+    STUDENT_EXPORT_COLUMNS, TEST_EXPORT_COLUMNS, format_lines, iter_rows, student_queryset, student_test_queryset
+)
+from .hierarchy import get_hierarchy
+from .pagination import KeysetPaginator
+from .permissions import get_profile_scope
+from .search import search_students
+from .snapshots import METRICS as SNAPSHOT_METRICS, profile_scope, series as snapshot_series
+from .statistics import rollup_statistics, test_statistics
 from accounts.models import UserProfile
+from datetime import timedelta
+from urllib.parse import urlencode
+import itertools
 import json
 
+# ترتيبات قائمة الطلاب، وكل منها مدعوم بفهرس مركب ينتهي بالمعرف
+STUDENT_LIST_ORDERINGS = {
+    'name': ('name_normalized', 'id'),
+    'recent': ('-created_at', '-id'),
+}
+
 def is_super_admin(user):
     try:
         return user.userprofile.user_type == 'super_admin'
@@ -38,110 +57,55 @@ def can_manage_student(user_profile, student):
     """
     التحقق من صلاحيات المستخدم في إدارة الطالب
     """
-    if user_profile.user_type == 'super_admin':
-        return True
-    elif user_profile.user_type == 'region_admin':
-        return student.institute.department.region == user_profile.region
-    elif user_profile.user_type == 'department_admin':
-        return student.institute.department == user_profile.department
-    elif user_profile.user_type == 'institute_admin':
-        return student.institute == user_profile.institute
-    return False
+    return get_profile_scope(user_profile).can_manage_student(student)
 
 def get_available_institutes(user_profile):
     """
     الحصول على المعاهد المتاحة للمستخدم حسب صلاحياته
     """
-    if user_profile.user_type == 'super_admin':
-        return Institute.objects.all()
-    elif user_profile.user_type == 'region_admin':
-        return Institute.objects.filter(department__region=user_profile.region)
-    elif user_profile.user_type == 'department_admin':
-        return Institute.objects.filter(department=user_profile.department)
-    elif user_profile.user_type == 'institute_admin':
-        return Institute.objects.filter(id=user_profile.institute.id)
-    return Institute.objects.none()
+    return Institute.objects.for_profile(user_profile)
 
 def get_available_departments(user_profile):
     """
     الحصول على الإدارات المتاحة للمستخدم حسب صلاحياته
     """
-    if user_profile.user_type == 'super_admin':
-        return Department.objects.all()
-    elif user_profile.user_type == 'region_admin':
-        return Department.objects.filter(region=user_profile.region)
-    elif user_profile.user_type == 'department_admin':
-        return Department.objects.filter(id=user_profile.department.id)
-    elif user_profile.user_type == 'institute_admin':
-        return Department.objects.filter(id=user_profile.institute.department.id)
-    return Department.objects.none()
+    return Department.objects.for_profile(user_profile)
 
 def get_available_regions(user_profile):
     """
     الحصول على المناطق المتاحة للمستخدم حسب صلاحياته
     """
-    if user_profile.user_type == 'super_admin':
-        return Region.objects.all()
-    elif user_profile.user_type == 'region_admin':
-        return Region.objects.filter(id=user_profile.region.id)
-    elif user_profile.user_type == 'department_admin':
-        return Region.objects.filter(id=user_profile.department.region.id)
-    elif user_profile.user_type == 'institute_admin':
-        return Region.objects.filter(id=user_profile.institute.department.region.id)
-    return Region.objects.none()
+    return Region.objects.for_profile(user_profile)
 
 def can_manage_region(user_profile, region):
     """
     التحقق من صلاحيات المستخدم في إدارة المنطقة
     """
-    if user_profile.user_type == 'super_admin':
-        return True
-    elif user_profile.user_type == 'region_admin':
-        return region == user_profile.region
-    elif user_profile.user_type == 'department_admin':
-        return region == user_profile.department.region
-    elif user_profile.user_type == 'institute_admin':
-        return region == user_profile.institute.department.region
-    return False
+    return get_profile_scope(user_profile).can_manage_region(region)
 
 def can_manage_department(user_profile, department):
     """
     التحقق من صلاحيات المستخدم في إدارة الإدارة
     """
-    if user_profile.user_type == 'super_admin':
-        return True
-    elif user_profile.user_type == 'region_admin':
-        return department.region == user_profile.region
-    elif user_profile.user_type == 'department_admin':
-        return department == user_profile.department
-    elif user_profile.user_type == 'institute_admin':
-        return department == user_profile.institute.department
-    return False
+    return get_profile_scope(user_profile).can_manage_department(department)
 
 def can_manage_institute(user_profile, institute):
     """
     التحقق من صلاحيات المستخدم في إدارة المعهد
     """
-    if user_profile.user_type == 'super_admin':
-        return True
-    elif user_profile.user_type == 'region_admin':
-        return institute.department.region == user_profile.region
-    elif user_profile.user_type == 'department_admin':
-        return institute.department == user_profile.department
-    elif user_profile.user_type == 'institute_admin':
-        return institute == user_profile.institute
-    return False
+    return get_profile_scope(user_profile).can_manage_institute(institute)
 
 def home(request):
     """الصفحة الرئيسية"""
+    hierarchy = get_hierarchy()
     context = {
         'news': News.objects.filter(is_published=True)[:5],
         'events': Event.objects.filter(is_active=True)[:3],
         'stats': {
-            'total_students': Student.objects.count(),
-            'total_regions': Region.objects.count(),
-            'total_departments': Department.objects.count(),
-            'total_institutes': Institute.objects.count(),
+            'total_students': StatisticsRollup.objects.aggregate(total=Sum('student_count'))['total'] or 0,
+            'total_regions': len(hierarchy.regions),
+            'total_departments': len(hierarchy.departments),
+            'total_institutes': len(hierarchy.institutes),
         }
     }
     return render(request, 'fitness_management/home.html', context)
@@ -158,32 +122,13 @@ def dashboard(request):
             user_type='super_admin'  # افتراضياً كإدارة عليا
         )
     
-    if user_profile.user_type == 'super_admin':
-        students = Student.objects.all()
-        regions = Region.objects.all()
-        departments = Department.objects.all()
-        institutes = Institute.objects.all()
-    elif user_profile.user_type == 'region_admin':
-        students = Student.objects.filter(institute__department__region=user_profile.region)
-        regions = Region.objects.filter(id=user_profile.region.id)
-        departments = Department.objects.filter(region=user_profile.region)
-        institutes = Institute.objects.filter(department__region=user_profile.region)
-    elif user_profile.user_type == 'department_admin':
-        students = Student.objects.filter(institute__department=user_profile.department)
-        regions = Region.objects.filter(id=user_profile.department.region.id)
-        departments = Department.objects.filter(id=user_profile.department.id)
-        institutes = Institute.objects.filter(department=user_profile.department)
-    else:  # institute_admin
-        students = Student.objects.filter(institute=user_profile.institute)
-        regions = Region.objects.filter(id=user_profile.institute.department.region.id)
-        departments = Department.objects.filter(id=user_profile.institute.department.id)
-        institutes = Institute.objects.filter(id=user_profile.institute.id)
+    # ملخص محسوب مسبقاً ومخزن مؤقتاً لكل نطاق
+    summary = get_dashboard_summary(user_profile)
     
     context = {
-        'students': students,
-        'regions': regions,
-        'departments': departments,
-        'institutes': institutes,
+        'stats': summary['stats'],
+        'latest_students': summary['latest_students'],
+        'summary': summary,
         'user_profile': user_profile,
         'today': timezone.now().date(),
         'now': timezone.now(),
@@ -202,23 +147,16 @@ def student_list(request):
             user_type='super_admin'  # افتراضياً كإدارة عليا
         )
     
-    if user_profile.user_type == 'super_admin':
-        students = Student.objects.all()
-    elif user_profile.user_type == 'region_admin':
-        students = Student.objects.filter(institute__department__region=user_profile.region)
-    elif user_profile.user_type == 'department_admin':
-        students = Student.objects.filter(institute__department=user_profile.department)
-    else:  # institute_admin
-        students = Student.objects.filter(institute=user_profile.institute)
+    students = Student.objects.for_profile(user_profile)
     
     # البحث والتصفية
     search = request.GET.get('search')
-    if search:
-        students = students.filter(
-            Q(name__icontains=search) |
-            Q(national_id__icontains=search) |
-            Q(institute__name__icontains=search)
-        )
+    sort = request.GET.get('sort')
+    if sort not in STUDENT_LIST_ORDERINGS:
+        sort = 'name'
+    students, ordering = search_students(students, search)
+    if ordering is None:
+        ordering = STUDENT_LIST_ORDERINGS[sort]
     
     gender = request.GET.get('gender')
     if gender:
@@ -228,19 +166,63 @@ def student_list(request):
     if education_level:
         students = students.filter(education_level=education_level)
     
-    # الترقيم
-    paginator = Paginator(students, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # الترقيم باستخدام مفتاح الترتيب بدلاً من OFFSET و COUNT
+    paginator = KeysetPaginator(students.for_listing(), 20, ordering)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
+    get_profile_scope(user_profile).annotate_students(page_obj)
+    
+    filters = {
+        key: value for key, value in (
+            ('search', search), ('gender', gender), ('education_level', education_level), ('sort', sort),
+        ) if value
+    }
     
     context = {
         'page_obj': page_obj,
         'search': search,
         'gender': gender,
         'education_level': education_level,
+        'sort': sort,
+        'query_string': urlencode(filters),
     }
     return render(request, 'fitness_management/student_list.html', context)
 
+@login_required
+def export_data(request):
+    """
+    تنزيل الطلاب أو نتائج اختباراتهم بنفس نطاق وتصفية قائمة الطلاب
+
+    يُولَّد الملف تدريجياً أثناء الإرسال فيبدأ التنزيل فوراً دون تحميل النتائج في الذاكرة.
+    """
+    user_profile = request.user.userprofile
+    
+    export_format = request.GET.get('format')
+    if export_format not in ('csv', 'ndjson'):
+        export_format = 'csv'
+    dataset = request.GET.get('dataset')
+    if dataset not in ('students', 'tests'):
+        dataset = 'students'
+    
+    spec = {key: request.GET.get(key) for key in ('search', 'gender', 'education_level')}
+    if dataset == 'tests':
+        queryset, columns = student_test_queryset(spec, user_profile), TEST_EXPORT_COLUMNS
+    else:
+        queryset, columns = student_queryset(spec, user_profile), STUDENT_EXPORT_COLUMNS
+    
+    lines = format_lines(iter_rows(queryset, columns), columns, export_format)
+    if export_format == 'csv':
+        # علامة BOM ليتعرف Excel على الترميز ويعرض العربية بشكل صحيح
+        content_type = 'text/csv; charset=utf-8'
+        lines = itertools.chain(['\ufeff'], lines)
+    else:
+        content_type = 'application/x-ndjson; charset=utf-8'
+    
+    extension = 'jsonl' if export_format == 'ndjson' else 'csv'
+    filename = f'{dataset}_{timezone.now().strftime("%Y%m%d_%H%M%S")}.{extension}'
+    response = StreamingHttpResponse(lines, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
 @login_required
 def add_student(request):
     """إضافة طالب جديد - متاح لجميع المستخدمين حسب صلاحياتهم"""
@@ -258,6 +240,8 @@ def add_student(request):
             
             student.save()
             messages.success(request, 'تم إضافة الطالب بنجاح!')
+            if student.possible_duplicates().exists():
+                messages.warning(request, 'يوجد طالب آخر بنفس الاسم في هذا المعهد، يرجى التأكد من عدم تكرار التسجيل.')
             return redirect('fitness_management:student_detail', student.id)
     else:
         form = StudentForm(user_profile=user_profile)
@@ -287,8 +271,10 @@ def edit_student(request, student_id):
                 messages.error(request, 'لا تملك الصلاحيات لتعديل الطالب لهذا المعهد!')
                 return render(request, 'fitness_management/student_form.html', {'form': form, 'user_profile': user_profile})
             
-            form.save()
+            student = form.save()
             messages.success(request, 'تم تعديل الطالب بنجاح!')
+            if student.possible_duplicates().exists():
+                messages.warning(request, 'يوجد طالب آخر بنفس الاسم في هذا المعهد، يرجى التأكد من عدم تكرار التسجيل.')
             return redirect('fitness_management:student_detail', student.id)
     else:
         form = StudentForm(instance=student, user_profile=user_profile)
@@ -360,33 +346,9 @@ def reports(request):
     """التقارير والإحصائيات"""
     user_profile = request.user.userprofile
     
-    # تحديد نطاق البيانات حسب نوع المستخدم
-    if user_profile.user_type == 'super_admin':
-        students = Student.objects.all()
-    elif user_profile.user_type == 'region_admin':
-        students = Student.objects.filter(institute__department__region=user_profile.region)
-    elif user_profile.user_type == 'department_admin':
-        students = Student.objects.filter(institute__department=user_profile.department)
-    else:  # institute_admin
-        students = Student.objects.filter(institute=user_profile.institute)
-    
-    # إحصائيات عامة
-    stats = {
-        'total_students': students.count(),
-        'male_students': students.filter(gender='male').count(),
-        'female_students': students.filter(gender='female').count(),
-        'primary_students': students.filter(education_level='primary').count(),
-        'middle_students': students.filter(education_level='middle').count(),
-        'secondary_students': students.filter(education_level='secondary').count(),
-    }
-    
-    # إحصائيات الاختبارات
-    tests = StudentTest.objects.filter(student__in=students)
-    test_stats = {
-        'total_tests': tests.count(),
-        'average_score': tests.aggregate(Avg('score'))['score__avg'] or 0,
-        'max_score': tests.aggregate(Sum('score'))['score__sum'] or 0,
-    }
+    # إحصائيات الطلاب من الجدول المجمع، ونتائج كل اختبار في استعلام واحد
+    stats = rollup_statistics(StatisticsRollup.objects.for_profile(user_profile))
+    test_stats = test_statistics(StudentTest.objects.for_profile(user_profile))
     
     context = {
         'stats': stats,
@@ -395,6 +357,32 @@ def reports(request):
     }
     return render(request, 'fitness_management/reports.html', context)
 
+@login_required
+def statistics_trend(request):
+    """بيانات الرسم البياني لتطور الإحصائيات من اللقطات الدورية"""
+    user_profile = request.user.userprofile
+    scope, scope_id = profile_scope(user_profile)
+    requested_scope = request.GET.get('scope')
+    if requested_scope:
+        try:
+            requested_id = int(request.GET.get('scope_id') or 0)
+        except ValueError:
+            return JsonResponse({'error': 'invalid scope_id'}, status=400)
+        if (requested_scope, requested_id) != (scope, scope_id):
+            if not get_profile_scope(user_profile).can_view_scope(requested_scope, requested_id):
+                return JsonResponse({'error': 'forbidden'}, status=403)
+            scope, scope_id = requested_scope, requested_id
+    
+    try:
+        days = min(max(int(request.GET.get('days', 365)), 1), 3650)
+    except ValueError:
+        days = 365
+    metrics = [metric for metric in request.GET.get('metrics', '').split(',') if metric in SNAPSHOT_METRICS]
+    data = snapshot_series(
+        scope, scope_id, start=timezone.now() - timedelta(days=days), metrics=metrics or SNAPSHOT_METRICS
+    )
+    return JsonResponse({'scope': scope, 'scope_id': scope_id, 'days': days, **data})
+
 def news_list(request):
     """قائمة الأخبار"""
     news = News.objects.filter(is_published=True)
@@ -697,7 +685,7 @@ def region_list(request):
     user_profile = request.user.userprofile
     
     # تحديد المناطق المتاحة حسب نوع المستخدم
-    regions = get_available_regions(user_profile)
+    regions = get_available_regions(user_profile).with_counts()
     
     context = {
         'regions': regions,
@@ -778,7 +766,7 @@ def department_list(request):
     user_profile = request.user.userprofile
     
     # تحديد الإدارات المتاحة حسب نوع المستخدم
-    departments = get_available_departments(user_profile)
+    departments = get_available_departments(user_profile).with_counts()
     
     context = {
         'departments': departments,
@@ -871,7 +859,7 @@ def institute_list(request):
     user_profile = request.user.userprofile
     
     # تحديد المعاهد المتاحة حسب نوع المستخدم
-    institutes = get_available_institutes(user_profile)
+    institutes = get_profile_scope(user_profile).annotate_institutes(list(get_available_institutes(user_profile).with_counts()))
     
     context = {
         'institutes': institutes,
@@ -966,15 +954,19 @@ from django.http import JsonResponse
 def get_departments_by_region(request, region_id):
     """API للحصول على الإدارات حسب المنطقة المختارة"""
     try:
-        departments = Department.objects.filter(region_id=region_id).values('id', 'name', 'code')
-        return JsonResponse({'departments': list(departments)})
+        departments = get_hierarchy().departments_by_region.get(region_id, [])
+        return JsonResponse({'departments': [
+            {'id': node.id, 'name': node.name, 'code': node.code} for node in departments
+        ]})
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
 def get_institutes_by_department(request, department_id):
     """API للحصول على المعاهد حسب الإدارة المختارة"""
     try:
-        institutes = Institute.objects.filter(department_id=department_id).values('id', 'name', 'code')
-        return JsonResponse({'institutes': list(institutes)})
+        institutes = get_hierarchy().institutes_by_department.get(department_id, [])
+        return JsonResponse({'institutes': [
+            {'id': node.id, 'name': node.name, 'code': node.code} for node in institutes
+        ]})
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400) 
\ No newline at end of file
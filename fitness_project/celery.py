@@ -49,6 +49,10 @@ app.conf.update(
             'task': 'fitness_management.tasks.generate_periodic_reports',
             'schedule': 3600.0,  # 1 hour
         },
+        'export-analytics-weekly': {
+            'task': 'fitness_management.tasks.export_test_results_parquet',
+            'schedule': 604800.0,  # 7 days
+        },
     },
     
     # Task routing
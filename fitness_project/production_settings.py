@@ -64,6 +64,8 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'noreply@your-domain.com')
+# Stay under the SMTP provider's sending limits
+NOTIFICATION_RATE = int(os.environ.get('NOTIFICATION_RATE', 10))
 
 # Logging
 LOGGING = {
@@ -104,6 +104,43 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Backups
+BACKUP_DIR = BASE_DIR / 'backups'
+BACKUP_RETENTION_DAYS = 30
+# gzip or zstd (requires the zstandard package)
+BACKUP_COMPRESSION = 'gzip'
+# 'auto' uses pg_dump on PostgreSQL and the streaming JSON engine elsewhere
+BACKUP_ENGINE = 'auto'
+# Days between full backups; the daily backups in between are incremental
+BACKUP_FULL_INTERVAL_DAYS = 7
+
+# Cleanup: rows per delete batch, seconds to pause between batches, archive deleted rows
+CLEANUP_BATCH_SIZE = 500
+CLEANUP_BATCH_PAUSE = 0
+CLEANUP_ARCHIVE = True
+
+# Statistics snapshots: keep hourly points for a week and daily points for a year, then weekly
+SNAPSHOT_HOURLY_DAYS = 7
+SNAPSHOT_DAILY_DAYS = 365
+
+# Student report cards: processes writing per-institute archives (None picks up to 4 by CPU count)
+REPORT_WORKERS = None
+
+# Email: the defaults point at a local debugging server
+# (pip install aiosmtpd && python -m aiosmtpd -n -l localhost:1025)
+EMAIL_HOST = config('EMAIL_HOST', default='localhost')
+EMAIL_PORT = config('EMAIL_PORT', default=1025, cast=int)
+DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='noreply@localhost')
+
+# Bulk notifications: messages per status update batch, messages per second (0 for no limit)
+NOTIFICATION_BATCH_SIZE = 100
+NOTIFICATION_RATE = 0
+
+# Maintenance: changed share of rows before a table is analyzed/vacuumed, and the
+# free space or index bloat share before VACUUM, REINDEX or OPTIMIZE
+MAINTENANCE_CHURN_THRESHOLD = 0.1
+MAINTENANCE_BLOAT_THRESHOLD = 0.3
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 